@@ -0,0 +1,538 @@
+#!/usr/bin/env python3
+"""
+Generates a production-sized TnT Mart data set for local benchmarking.
+
+script.sql seeds a handful of customers, products and warehouses, which never
+exercises the bots' query patterns at realistic volumes. This script adds synthetic
+customers (with addresses), products, warehouses and their stock, orders with
+their items, payments, refunds, shopping carts and regular items on top of it.
+
+The volume is set by --scale; scale 1 is about 100k customers, 1M orders, 2.5M
+order items and 1M payments (see ROWS_PER_SCALE). The data is skewed the way a shop's
+data is: product popularity and customer activity follow Zipf distributions, so a
+few products appear in most orders and a few customers place most of them. Older
+orders are mostly delivered (some late, some cancelled or returned), recent ones
+are spread over the fulfilment pipeline, and payments and refunds follow from the
+order's status. The same --seed always produces the same data.
+
+Rows are bulk-loaded with COPY in one transaction, with ids continuing after the
+rows already present, so the script can run against a freshly seeded database or
+be run again to grow it. The maintenance triggers of migrations 001 and 002 are
+switched off during the load and their tables rebuilt once at the end. With
+--csv-dir the rows are written to CSV files instead, one per table.
+
+Example:
+    python generate_synthetic_data.py --scale 0.1 --seed 7 --env-file ../../src/Chapter10/agentframework/.env
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import os
+import pathlib
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from dotenv import load_dotenv
+
+ROWS_PER_SCALE = {
+    "customer": 100_000,
+    "product": 2_000,
+    "warehouse": 40,
+    "orders": 1_000_000,
+}
+ORDER_BATCH = 50_000
+COPY_CHUNK = 100_000
+
+PRODUCT_ZIPF = 1.1
+CUSTOMER_ZIPF = 0.8
+
+# (city, state, latitude, longitude, PIN prefix, relative share of customers)
+CITIES = [
+    ("Mumbai", "Maharashtra", 19.0760, 72.8777, "400", 14),
+    ("Pune", "Maharashtra", 18.5204, 73.8567, "411", 7),
+    ("New Delhi", "Delhi", 28.6139, 77.2090, "110", 14),
+    ("Bengaluru", "Karnataka", 12.9716, 77.5946, "560", 12),
+    ("Hyderabad", "Telangana", 17.3850, 78.4867, "500", 9),
+    ("Chennai", "Tamil Nadu", 13.0827, 80.2707, "600", 9),
+    ("Kolkata", "West Bengal", 22.5726, 88.3639, "700", 8),
+    ("Ahmedabad", "Gujarat", 23.0225, 72.5714, "380", 6),
+    ("Jaipur", "Rajasthan", 26.9124, 75.7873, "302", 5),
+    ("Lucknow", "Uttar Pradesh", 26.8467, 80.9462, "226", 5),
+    ("Kochi", "Kerala", 9.9312, 76.2673, "682", 4),
+    ("Chandigarh", "Punjab", 30.7333, 76.7794, "160", 3),
+]
+AREAS = ["Industrial Area", "Logistics Park", "MIDC", "Ring Road", "Phase II", "Bypass Road", "SEZ"]
+STREETS = ["MG Road", "Station Road", "Main Road", "Park Street", "Lake View", "Temple Road", "Market Lane"]
+LANDMARKS = ["Near Metro Station", "Opposite City Mall", "Behind Post Office", "Near Bus Depot", None, None]
+
+FIRST_NAMES = [
+    "Aarav", "Vivaan", "Aditya", "Arjun", "Rohan", "Karan", "Ishaan", "Kabir", "Siddharth", "Manish",
+    "Ananya", "Diya", "Isha", "Kavya", "Meera", "Neha", "Pooja", "Riya", "Sneha", "Tanvi",
+]
+LAST_NAMES = [
+    "Sharma", "Iyer", "Verma", "Kamath", "Patel", "Reddy", "Nair", "Gupta", "Singh", "Mehta",
+    "Rao", "Das", "Joshi", "Menon", "Bose", "Kulkarni", "Chopra", "Pillai", "Shah", "Mishra",
+]
+
+# category: (items, price range, share of staples)
+CATALOGUE = {
+    "Groceries": (["Basmati Rice 5kg", "Whole Wheat Atta 10kg", "Groundnut Oil 1L", "Tur Dal 2kg", "Rock Salt 1kg",
+                   "Moong Dal 1kg", "Jaggery 500g", "Poha 1kg"], (60, 900), 0.8),
+    "Personal Care": (["Herbal Shampoo 500ml", "Face Wash 100ml", "Toothpaste 120g", "Hair Serum 100ml",
+                       "Body Lotion 250ml", "Cold Cream 100g"], (80, 600), 0.6),
+    "Household": (["Garbage Bags 30pcs", "Floor Cleaner 1L", "Laundry Detergent 2kg", "Dishwash Gel 750ml",
+                   "Bamboo Toothbrush Pack of 4"], (90, 500), 0.6),
+    "Gourmet": (["Dark Chocolate 100g", "Arabica Coffee Beans 500g", "Kashmiri Saffron 1g", "Almond Butter 250g",
+                 "Green Tea 50 bags"], (150, 1500), 0.2),
+}
+BRANDS = ["Organic", "Premium", "Natural", "Farm Fresh", "Everyday", "Classic", "Pure", "Select"]
+
+# Orders younger than RECENT_DAYS are still moving through fulfilment.
+RECENT_DAYS = 10
+RECENT_STATUSES = (
+    ["Received", "Confirmed", "Being processed", "Ready to dispatch", "Dispatched", "Out for delivery", "Delivered",
+     "Cancelled"],
+    [8, 8, 10, 14, 18, 10, 28, 4],
+)
+SETTLED_STATUSES = (["Delivered", "Cancelled", "Returned"], [90, 6, 4])
+PAYMENT_MODES = (["UPI", "Credit Card", "Debit Card", "Net Banking", "COD"], [45, 20, 15, 8, 12])
+REFUND_REASONS = [
+    "Order cancelled by customer before shipping",
+    "Product returned by customer after delivery",
+    "Damaged item reported",
+    "Incorrect item delivered",
+    "Delayed delivery",
+]
+
+
+class Ids:
+    """Hands out ids that continue after the largest id already in each table."""
+
+    def __init__(self, start: dict[str, int]):
+        self._next = {table: value + 1 for table, value in start.items()}
+
+    def take(self, table: str, count: int = 1) -> range:
+        first = self._next[table]
+        self._next[table] = first + count
+        return range(first, first + count)
+
+
+def zipf_cum_weights(n: int, exponent: float) -> list[float]:
+    return list(itertools.accumulate(1.0 / (rank + 1) ** exponent for rank in range(n)))
+
+
+def zipf_population(rng: random.Random, ids: list[int]) -> list[int]:
+    """Randomly assigns popularity ranks, so popular rows are not simply the lowest ids."""
+    ranked = list(ids)
+    rng.shuffle(ranked)
+    return ranked
+
+
+def at(day: date, hour: int, minute: int = 0) -> datetime:
+    return datetime(day.year, day.month, day.day, hour, minute)
+
+
+class Generator:
+    """Produces the rows of every table, in an order that satisfies the foreign keys."""
+
+    def __init__(self, scale: float, seed: int, end_date: date, days: int, ids: Ids):
+        self.rng = random.Random(seed)
+        self.counts = {table: max(1, round(rows * scale)) for table, rows in ROWS_PER_SCALE.items()}
+        self.end_date = end_date
+        self.days = days
+        self.ids = ids
+        self.city_weights = list(itertools.accumulate(city[5] for city in CITIES))
+
+    # --- Reference data ---
+    def products(self):
+        rng = self.rng
+        self.product_price = {}
+        staples = []
+        for product_id in self.ids.take("product", self.counts["product"]):
+            category = rng.choice(list(CATALOGUE))
+            items, (low, high), staple_share = CATALOGUE[category]
+            price = round(rng.uniform(low, high), 0) - 0.01 * rng.choice([0, 0, 1])
+            staple = rng.random() < staple_share
+            self.product_price[product_id] = price
+            if staple:
+                staples.append(product_id)
+            yield (
+                product_id,
+                f"SYN{product_id:07d}",
+                category,
+                f"{rng.choice(BRANDS)} {rng.choice(items)}",
+                f"{price:.2f}",
+                "Y" if rng.random() < 0.97 else "N",
+                staple,
+            )
+        ranked = zipf_population(rng, list(self.product_price))
+        self.popular_products = (ranked, zipf_cum_weights(len(ranked), PRODUCT_ZIPF))
+        self.staple_products = staples or ranked
+
+    def warehouses(self):
+        rng = self.rng
+        self.warehouse_ids = []
+        for warehouse_id in self.ids.take("warehouse", self.counts["warehouse"]):
+            city, state, lat, lon, _, _ = rng.choices(CITIES, cum_weights=self.city_weights)[0]
+            self.warehouse_ids.append(warehouse_id)
+            yield (
+                warehouse_id,
+                f"{city[:3].upper()}-WH-{warehouse_id:03d}",
+                f"{rng.choice(AREAS)}, {city}, {state}",
+                f"{lat + rng.uniform(-0.2, 0.2):.2f}",
+                f"{lon + rng.uniform(-0.2, 0.2):.2f}",
+                "Y" if rng.random() < 0.95 else "N",
+            )
+
+    def warehouse_products(self):
+        # Popular products are stocked almost everywhere, the long tail in a few places.
+        rng = self.rng
+        ranked, _ = self.popular_products
+        top = max(1, len(ranked) // 10)
+        for warehouse_id in self.warehouse_ids:
+            for rank, product_id in enumerate(ranked):
+                if rng.random() < (0.9 if rank < top else 0.25):
+                    quantity = 0 if rng.random() < 0.1 else rng.randint(1, 500)
+                    yield (warehouse_id, product_id, quantity)
+
+    # --- Customers ---
+    def customers(self):
+        rng = self.rng
+        self.customer_ids = list(self.ids.take("customer", self.counts["customer"]))
+        for customer_id in self.customer_ids:
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            yield (
+                customer_id,
+                f"{first} {last}",
+                f"{first.lower()}.{last.lower()}.{customer_id}@example.com",
+                f"+91-9{rng.randrange(10**9):09d}",
+                "Wholesale" if rng.random() < 0.15 else "Retail",
+                self.end_date - timedelta(days=int(rng.expovariate(1 / 30))),
+                rng.choice([0, 0, 0, 100, 300, 500, 1200]),
+            )
+        ranked = zipf_population(rng, self.customer_ids)
+        self.active_customers = (ranked, zipf_cum_weights(len(ranked), CUSTOMER_ZIPF))
+
+    def addresses(self):
+        rng = self.rng
+        for customer_id in self.customer_ids:
+            # Most customers have one delivery address, some a second one.
+            for _ in range(1 if rng.random() < 0.85 else 2):
+                city, state, lat, lon, pin, _ = rng.choices(CITIES, cum_weights=self.city_weights)[0]
+                yield (
+                    self.ids.take("address")[0],
+                    customer_id,
+                    f"Flat {rng.randint(1, 1200)}, {rng.choice(LAST_NAMES)} Residency",
+                    rng.choice(STREETS),
+                    city,
+                    state,
+                    f"{pin}{rng.randint(1, 99):03d}",
+                    "India",
+                    f"{lat + rng.uniform(-0.15, 0.15):.6f}",
+                    f"{lon + rng.uniform(-0.15, 0.15):.6f}",
+                    rng.choice(LANDMARKS),
+                )
+
+    def carts(self):
+        rng = self.rng
+        products, weights = self.popular_products
+        for customer_id in self.customer_ids:
+            if rng.random() >= 0.15:
+                continue
+            picked = set(rng.choices(products, cum_weights=weights, k=rng.randint(1, 6)))
+            for product_id in picked:
+                added = self.end_date - timedelta(days=rng.randint(0, 30), minutes=rng.randint(0, 1439))
+                yield (
+                    self.ids.take("shopping_cart")[0],
+                    rng.randint(1, 4),
+                    f"{self.product_price[product_id]:.2f}",
+                    added,
+                    customer_id,
+                    product_id,
+                )
+
+    def regular_items(self):
+        rng = self.rng
+        for customer_id in self.customer_ids:
+            if rng.random() >= 0.25:
+                continue
+            for product_id in rng.sample(self.staple_products, min(len(self.staple_products), rng.randint(2, 6))):
+                yield (self.ids.take("customer_regular_items")[0], customer_id, product_id, rng.randint(1, 5))
+
+    # --- Orders ---
+    def order_batches(self):
+        """Yields (orders, order_items, payments, refunds) row lists, ORDER_BATCH orders at a time."""
+        remaining = self.counts["orders"]
+        while remaining:
+            size = min(ORDER_BATCH, remaining)
+            remaining -= size
+            yield self._order_batch(size)
+
+    def _order_batch(self, size: int):
+        rng = self.rng
+        customers, customer_weights = self.active_customers
+        products, product_weights = self.popular_products
+        orders, items, payments, refunds = [], [], [], []
+        buyers = rng.choices(customers, cum_weights=customer_weights, k=size)
+        for order_id, customer_id in zip(self.ids.take("orders", size), buyers):
+            age = int(self.days * rng.random() ** 1.5)  # recent days are busier
+            ordered = at(self.end_date - timedelta(days=age), rng.randint(7, 22), rng.randint(0, 59))
+            status = rng.choices(*(RECENT_STATUSES if age < RECENT_DAYS else SETTLED_STATUSES))[0]
+            expected = at((ordered + timedelta(days=rng.randint(2, 6))).date(), rng.choice([12, 18, 20]))
+            delivered = None
+            if status in ("Delivered", "Returned"):
+                delay = rng.choices([0, rng.randint(1, 3), rng.randint(4, 10)], [80, 15, 5])[0]
+                delivered = expected + timedelta(days=delay, minutes=-rng.randint(0, 300))
+
+            total = 0.0
+            picked = set(rng.choices(products, cum_weights=product_weights, k=min(8, 1 + int(rng.expovariate(1 / 1.5)))))
+            for product_id in picked:
+                quantity = rng.choices([1, 2, 3, 4], [55, 25, 12, 8])[0]
+                amount = round(self.product_price[product_id] * quantity, 2)
+                total += amount
+                items.append((self.ids.take("order_item")[0], order_id, product_id, quantity, f"{amount:.2f}", status))
+            total = round(total, 2)
+            orders.append(
+                (order_id, ordered, customer_id, f"{total:.2f}", status, expected, delivered, rng.random() < 0.3)
+            )
+
+            mode = rng.choices(*PAYMENT_MODES)[0]
+            paid_at = ordered + timedelta(minutes=rng.randint(1, 15))
+            if mode == "COD":
+                if status in ("Delivered", "Returned"):
+                    payments.append(self._payment(order_id, total, mode, "Successful", delivered))
+                elif status != "Cancelled":
+                    payments.append(self._payment(order_id, total, mode, "Pending", paid_at))
+                continue
+            if rng.random() < 0.03:
+                payments.append(self._payment(order_id, total, mode, "Failed", paid_at))
+                paid_at += timedelta(minutes=rng.randint(1, 30))
+            refunded = status in ("Cancelled", "Returned") or (status == "Delivered" and rng.random() < 0.01)
+            payment = self._payment(order_id, total, mode, "Refunded" if refunded else "Successful", paid_at)
+            payments.append(payment)
+            if refunded:
+                refunds.append(self._refund(payment[0], order_id, status, age, paid_at, delivered))
+        return orders, items, payments, refunds
+
+    def _payment(self, order_id: int, amount: float, mode: str, status: str, paid_at: datetime) -> tuple:
+        payment_id = self.ids.take("payment")[0]
+        return (payment_id, order_id, 50_000_000 + payment_id, f"{amount:.2f}", mode, status, paid_at)
+
+    def _refund(self, payment_id, order_id, status, age, paid_at, delivered) -> tuple:
+        rng = self.rng
+        if status == "Cancelled":
+            reason = REFUND_REASONS[0]
+        elif status == "Returned":
+            reason = REFUND_REASONS[1]
+        else:
+            reason = rng.choice(REFUND_REASONS[2:])
+        state = rng.choices(["Pending", "Approved", "Processed"], [60, 30, 10] if age < 14 else [2, 3, 95])[0]
+        requested = (delivered or paid_at) + timedelta(hours=rng.randint(1, 72))
+        return (self.ids.take("refund")[0], payment_id, order_id, reason, state, requested)
+
+
+# --- Sinks ---
+COLUMNS = {
+    "product": "product_id, product_code, product_category, description, price, active, regularly_purchased",
+    "warehouse": "warehouse_id, warehouse_code, address, latitude, longitude, active",
+    "warehouse_product": "warehouse_id, product_id, product_quantity",
+    "customer": "customer_id, name, email, phone, type, last_active, credits_available",
+    "address": "address_id, user_id, address_line_1, address_line_2, city, state, postal_cd, country, "
+    "latitude, longitude, landmark",
+    "shopping_cart": "item_id, quantity, unit_price, added_at, customer_id, product_id",
+    "customer_regular_items": "item_id, customer_id, product_id, quantity",
+    "orders": "order_id, order_date, customer_id, total_amount, status, expected_delivery_date, "
+    "actual_delivery_date, delay_handling_preference",
+    "order_item": "order_item_id, order_id, product_id, quantity, amount, status",
+    "payment": "payment_id, order_id, transaction_id, amount, payment_mode, status, payment_time",
+    "refund": "refund_id, payment_id, order_id, reason, status, refund_time",
+}
+# Tables whose id column has a sequence that must move past the loaded ids.
+SEQUENCES = {"refund": "refund_id", "shopping_cart": "item_id"}
+# Tables whose maintenance triggers (migrations 001 and 002) are paused during the load.
+TRIGGER_TABLES = ["product", "warehouse", "warehouse_product", "address", "orders", "order_item", "payment"]
+REFRESH_FUNCTIONS = ["refresh_product_locality", "refresh_order_summary"]
+
+
+def _csv_chunks(rows, chunk: int = COPY_CHUNK):
+    """Renders rows as CSV text, `chunk` rows at a time; None becomes an empty (NULL) field."""
+    rows = iter(rows)
+    while True:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        count = 0
+        for row in itertools.islice(rows, chunk):
+            writer.writerow(row)
+            count += 1
+        if not count:
+            return
+        buffer.seek(0)
+        yield buffer, count
+
+
+class CopySink:
+    """Streams rows into the database with COPY."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def write(self, table: str, rows) -> int:
+        total = 0
+        for buffer, count in _csv_chunks(rows):
+            self.cursor.copy_expert(f"COPY {table} ({COLUMNS[table]}) FROM STDIN WITH (FORMAT csv)", buffer)
+            total += count
+        return total
+
+
+class CsvSink:
+    """Appends rows to one <table>.csv file per table, with a header line."""
+
+    def __init__(self, directory: pathlib.Path):
+        self.directory = directory
+        directory.mkdir(parents=True, exist_ok=True)
+        self._started = set()
+
+    def write(self, table: str, rows) -> int:
+        path = self.directory / f"{table}.csv"
+        total = 0
+        with open(path, "a" if table in self._started else "w", encoding="utf-8", newline="") as out:
+            if table not in self._started:
+                out.write(COLUMNS[table].replace(" ", "") + "\n")
+                self._started.add(table)
+            for buffer, count in _csv_chunks(rows):
+                out.write(buffer.getvalue())
+                total += count
+        return total
+
+
+def generate(generator: Generator, sink) -> dict[str, int]:
+    """Writes every table to `sink` in foreign-key order; returns the row count per table."""
+    written = dict.fromkeys(COLUMNS, 0)
+
+    def write(table, rows):
+        started = time.perf_counter()
+        count = sink.write(table, rows)
+        written[table] += count
+        print(f"  {table:<24} {count:>10,} rows in {time.perf_counter() - started:6.1f}s", flush=True)
+
+    write("product", generator.products())
+    write("warehouse", generator.warehouses())
+    write("warehouse_product", generator.warehouse_products())
+    write("customer", generator.customers())
+    write("address", generator.addresses())
+    write("shopping_cart", generator.carts())
+    write("customer_regular_items", generator.regular_items())
+    for orders, items, payments, refunds in generator.order_batches():
+        write("orders", orders)
+        write("order_item", items)
+        write("payment", payments)
+        write("refund", refunds)
+    return written
+
+
+# --- Database ---
+_ID_COLUMNS = {
+    "product": "product_id",
+    "warehouse": "warehouse_id",
+    "customer": "customer_id",
+    "address": "address_id",
+    "shopping_cart": "item_id",
+    "customer_regular_items": "item_id",
+    "orders": "order_id",
+    "order_item": "order_item_id",
+    "payment": "payment_id",
+    "refund": "refund_id",
+}
+
+
+def connect():
+    import psycopg2
+
+    return psycopg2.connect(
+        dbname=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST"),
+        port=os.getenv("DB_PORT"),
+    )
+
+
+def existing_ids(cursor) -> dict[str, int]:
+    ids = {}
+    for table, column in _ID_COLUMNS.items():
+        cursor.execute(f"select coalesce(max({column}), 0) from {table};")
+        ids[table] = cursor.fetchone()[0]
+    return ids
+
+
+def load(generator: Generator, conn) -> dict[str, int]:
+    """Loads everything in one transaction; a failure leaves the database untouched."""
+    with conn.cursor() as cursor:
+        for table in TRIGGER_TABLES:
+            cursor.execute(f"alter table {table} disable trigger user;")
+        written = generate(generator, CopySink(cursor))
+        for table in TRIGGER_TABLES:
+            cursor.execute(f"alter table {table} enable trigger user;")
+        for table, column in SEQUENCES.items():
+            cursor.execute(
+                f"select setval(seq, (select max({column}) from {table})) "
+                f"from pg_get_serial_sequence(%s, %s) as seq where seq is not null;",
+                (table, column),
+            )
+        for function in REFRESH_FUNCTIONS:
+            cursor.execute("select to_regproc(%s) is not null;", (function,))
+            if cursor.fetchone()[0]:
+                print(f"  rebuilding with {function}() ...", flush=True)
+                cursor.execute(f"select {function}();")
+    conn.commit()
+    # Fresh statistics, so that benchmarks see realistic plans straight away.
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute(f"analyze {', '.join(COLUMNS)};")
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="scale factor; 1 is about 1M orders")
+    parser.add_argument("--seed", type=int, default=42, help="random seed; the same seed gives the same data")
+    parser.add_argument(
+        "--end-date", type=date.fromisoformat, default=date(2025, 8, 31), help="date of the newest orders"
+    )
+    parser.add_argument("--days", type=int, default=730, help="days of order history to generate")
+    parser.add_argument("--csv-dir", type=pathlib.Path, help="write CSV files here instead of loading the database")
+    parser.add_argument(
+        "--env-file", type=pathlib.Path, default=pathlib.Path(".env"), help="an .env file with the DB_* variables"
+    )
+    args = parser.parse_args()
+    if args.scale <= 0:
+        parser.error("--scale must be positive")
+
+    started = time.perf_counter()
+    if args.csv_dir:
+        generator = Generator(args.scale, args.seed, args.end_date, args.days, Ids(dict.fromkeys(_ID_COLUMNS, 0)))
+        print(f"Writing scale {args.scale} data to {args.csv_dir} ...")
+        written = generate(generator, CsvSink(args.csv_dir))
+    else:
+        load_dotenv(dotenv_path=args.env_file)
+        conn = connect()
+        try:
+            with conn.cursor() as cursor:
+                ids = Ids(existing_ids(cursor))
+            generator = Generator(args.scale, args.seed, args.end_date, args.days, ids)
+            print(f"Loading scale {args.scale} data into {os.getenv('DB_NAME')} ...")
+            written = load(generator, conn)
+        finally:
+            conn.close()
+    print(f"{sum(written.values()):,} rows in {time.perf_counter() - started:.1f}s.")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        sys.exit(130)
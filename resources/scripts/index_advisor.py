@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Recommends indexes from the PGSQL MCP server's query log.
+
+Run the MCP server with QUERY_LOG_PATH set and it appends the shape of every
+statement it executes (literals replaced by $n; parameters passed separately keep
+their %(name)s or %s placeholders), its duration and the tables it touched to a
+JSON Lines file. This script aggregates that log per shape, extracts
+the columns each shape filters and joins on, and proposes one index per table
+access pattern: equality columns first, then at most one range column.
+
+Each candidate is weighted by the total time of the shapes that would use it
+(calls x average duration), so the list starts with the indexes that save the most.
+A candidate that is a prefix of a longer one is folded into it, since the longer
+index serves both.
+
+If the DB_* variables are set (from the environment or --env-file), candidates
+already covered by an existing index are dropped and columns written without a
+table alias are resolved against the catalog. Without a database the log alone is
+used and every candidate is printed.
+
+Example:
+    python index_advisor.py /var/log/tnt-mart/queries.jsonl --env-file ../../src/Chapter10/agentframework/.env
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import re
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from dotenv import load_dotenv
+
+_KEYWORDS = {
+    "where", "join", "on", "using", "group", "order", "limit", "having", "union", "intersect",
+    "except", "left", "right", "inner", "full", "cross", "natural", "outer", "offset", "fetch",
+    "for", "window", "returning", "set", "values", "select", "lateral", "and", "or", "not",
+}
+_FROM_CLAUSE = re.compile(
+    r"\bfrom\s+([^()]+?)(?=\b(?:where|group|order|limit|having|union|intersect|except|returning"
+    r"|offset|fetch|for|window)\b|\)|;|$)"
+)
+_JOIN_SEPARATOR = re.compile(r"\b(?:(?:left|right|full)(?:\s+outer)?\s+|inner\s+|cross\s+|natural\s+)?join\b|,")
+_JOINED_TABLE = re.compile(r"\bjoin\s+(?:lateral\s+)?([\w.\"]+)(?:\s+(?:as\s+)?([a-z_]\w*))?")
+_UPDATED_TABLE = re.compile(r"^\s*update\s+(?:only\s+)?([\w.\"]+)(?:\s+(?:as\s+)?([a-z_]\w*))?")
+_CTE_NAME = re.compile(r"(?:\bwith(?:\s+recursive)?|,)\s+([a-z_]\w*)\s+as\s*(?:not\s+)?(?:materialized\s*)?\(")
+_SET_CLAUSE = re.compile(r"\bset\b.*?(?=\bwhere\b|\breturning\b|$)")
+
+_COLUMN = r"(?:([a-z_]\w*)\.)?([a-z_]\w*)"
+_JOIN_PREDICATE = re.compile(rf"(?<![\w.$]){_COLUMN}\s*=\s*{_COLUMN}(?![\w.(])")
+# A bound value: a literal the server replaced by $n, or a psycopg2 parameter the
+# caller passed as %(name)s or %s (those statements are logged as written).
+_PARAMETER = r"(?:\$\d+|%\(\w+\)s|%s)"
+_EQUALITY = re.compile(rf"(?<![\w.$]){_COLUMN}\s*(?:=\s*(?:any\s*\(\s*)?{_PARAMETER}|\bin\s*\(\s*{_PARAMETER})")
+_RANGE = re.compile(rf"(?<![\w.$]){_COLUMN}\s*(?:<=|>=|<|>|\bbetween\b)\s*{_PARAMETER}")
+_ORDER_BY = re.compile(r"\border\s+by\s+([^()]+?)(?=\blimit\b|\boffset\b|\bfetch\b|\bfor\b|\)|;|$)")
+
+
+@dataclass
+class ShapeStats:
+    calls: int = 0
+    total_ms: float = 0.0
+
+
+@dataclass
+class Candidate:
+    """A proposed index and the workload it would serve."""
+
+    table: str
+    columns: tuple[str, ...]
+    total_ms: float = 0.0
+    calls: int = 0
+    shapes: list[str] = field(default_factory=list)
+
+    @property
+    def name(self) -> str:
+        return f"{self.table}_{'_'.join(self.columns)}_idx"[:63]
+
+    def statement(self) -> str:
+        return (
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {self.name} "
+            f"ON {self.table} ({', '.join(self.columns)});"
+        )
+
+
+def read_log(paths: list[pathlib.Path]) -> dict[str, ShapeStats]:
+    """Aggregates the query log per shape; malformed lines are skipped."""
+    shapes: dict[str, ShapeStats] = defaultdict(ShapeStats)
+    for path in paths:
+        with open(path, encoding="utf-8") as log:
+            for line in log:
+                try:
+                    entry = json.loads(line)
+                    stats = shapes[entry["shape"]]
+                    stats.calls += 1
+                    stats.total_ms += float(entry["ms"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+    return shapes
+
+
+def _table(token: str) -> str:
+    return token.split(".")[-1].strip('"')
+
+
+def table_aliases(shape: str) -> dict[str, str]:
+    """Maps every table name and alias of a shape to its table; CTEs are left out."""
+    ctes = set(_CTE_NAME.findall(shape))
+    aliases: dict[str, str] = {}
+
+    def add(name: str, alias: str | None) -> None:
+        table = _table(name)
+        if table in ctes or not re.fullmatch(r"[\w.\"]+", name):
+            return
+        aliases[table] = table
+        if alias and alias not in _KEYWORDS:
+            aliases[alias] = table
+
+    for clause in _FROM_CLAUSE.findall(shape):
+        for item in _JOIN_SEPARATOR.split(clause):
+            words = re.split(r"\b(?:on|using)\b", item, maxsplit=1)[0].split()
+            if words:
+                alias = words[2] if len(words) > 2 and words[1] == "as" else (words[1] if len(words) > 1 else None)
+                add(words[0], alias)
+    for name, alias in _JOINED_TABLE.findall(shape) + _UPDATED_TABLE.findall(shape):
+        add(name, alias or None)
+    return aliases
+
+
+def access_patterns(shape: str, columns_of: dict[str, set[str]]) -> list[tuple[str, tuple[str, ...]]]:
+    """
+    Returns the (table, columns) indexes a shape would use.
+
+    A table filtered by the shape wants its equality columns in order of appearance,
+    followed by one range or ORDER BY column. A table that is only joined to is
+    looked up by its join column, once per row of the table that drives the join.
+    """
+    aliases = table_aliases(shape)
+    tables = set(aliases.values())
+    # With a CTE in play, an unqualified column may belong to the CTE instead.
+    has_ctes = bool(_CTE_NAME.search(shape))
+    body = _SET_CLAUSE.sub(" ", shape)
+
+    def resolve(qualifier: str | None, column: str) -> str | None:
+        if qualifier:
+            return aliases.get(qualifier)
+        if len(tables) == 1 and not has_ctes:
+            return next(iter(tables))
+        owners = [t for t in tables if column in columns_of.get(t, ())]
+        return owners[0] if len(owners) == 1 else None
+
+    equality: dict[str, list[str]] = defaultdict(list)
+    joined: dict[str, list[str]] = defaultdict(list)
+    trailing: dict[str, str] = {}
+
+    for match in _JOIN_PREDICATE.finditer(body):
+        left_q, left_c, right_q, right_c = match.groups()
+        if left_q and right_q:
+            for qualifier, column in ((left_q, left_c), (right_q, right_c)):
+                table = resolve(qualifier, column)
+                if table and column not in joined[table]:
+                    joined[table].append(column)
+    for qualifier, column in _EQUALITY.findall(body):
+        table = resolve(qualifier, column)
+        if table and column not in equality[table]:
+            equality[table].append(column)
+    for qualifier, column in _RANGE.findall(body):
+        table = resolve(qualifier, column)
+        if table:
+            trailing.setdefault(table, column)
+    for clause in _ORDER_BY.findall(body):
+        first = clause.split(",")[0].split()
+        match = re.fullmatch(_COLUMN, first[0]) if first else None
+        if match:
+            table = resolve(*match.groups())
+            if table:
+                trailing.setdefault(table, match.group(2))
+
+    patterns = []
+    for table in tables:
+        columns = list(equality.get(table, []))
+        if table in trailing and trailing[table] not in columns:
+            columns.append(trailing[table])
+        if columns:
+            patterns.append((table, tuple(columns)))
+        else:
+            patterns.extend((table, (column,)) for column in joined.get(table, []))
+    return patterns
+
+
+def is_covered(columns: tuple[str, ...], indexes: list[tuple[str, ...]]) -> bool:
+    """True if an existing index leads with the same columns, in any order."""
+    return any(set(index[: len(columns)]) == set(columns) for index in indexes)
+
+
+def recommend(
+    shapes: dict[str, ShapeStats],
+    columns_of: dict[str, set[str]],
+    indexes: dict[str, list[tuple[str, ...]]] | None,
+    min_calls: int = 1,
+) -> list[Candidate]:
+    candidates: dict[tuple[str, tuple[str, ...]], Candidate] = {}
+    for shape, stats in shapes.items():
+        if stats.calls < min_calls:
+            continue
+        for table, columns in access_patterns(shape, columns_of):
+            if columns_of and table not in columns_of:
+                continue  # not a table of this database, e.g. a view or a catalog
+            key = (table, columns)
+            candidate = candidates.setdefault(key, Candidate(table, columns))
+            candidate.total_ms += stats.total_ms
+            candidate.calls += stats.calls
+            candidate.shapes.append(shape)
+
+    # An index on (a, b) also serves lookups on (a): fold prefixes into the longest.
+    ordered = sorted(candidates.values(), key=lambda c: len(c.columns), reverse=True)
+    kept: list[Candidate] = []
+    for candidate in ordered:
+        wider = next(
+            (k for k in kept if k.table == candidate.table and k.columns[: len(candidate.columns)] == candidate.columns),
+            None,
+        )
+        if wider:
+            wider.total_ms += candidate.total_ms
+            wider.calls += candidate.calls
+            wider.shapes.extend(candidate.shapes)
+        else:
+            kept.append(candidate)
+
+    if indexes is not None:
+        kept = [c for c in kept if not is_covered(c.columns, indexes.get(c.table, []))]
+    return sorted(kept, key=lambda c: c.total_ms, reverse=True)
+
+
+_CATALOG_COLUMNS = """
+    select table_name, column_name from information_schema.columns
+    where table_schema = current_schema();
+"""
+_CATALOG_INDEXES = """
+    select t.relname, array_agg(a.attname order by k.ord)
+    from pg_index i
+    join pg_class t on t.oid = i.indrelid
+    join pg_namespace n on n.oid = t.relnamespace
+    cross join lateral unnest(i.indkey) with ordinality as k(attnum, ord)
+    join pg_attribute a on a.attrelid = t.oid and a.attnum = k.attnum
+    where n.nspname = current_schema() and i.indpred is null and i.indisvalid
+    group by i.indexrelid, t.relname;
+"""
+
+
+def load_catalog() -> tuple[dict[str, set[str]], dict[str, list[tuple[str, ...]]]] | None:
+    """Reads the tables' columns and indexes, or returns None if no database is reachable."""
+    if not os.getenv("DB_NAME"):
+        return None
+    try:
+        import psycopg2
+    except ImportError:
+        print("psycopg2 is not installed; existing indexes are not checked.", file=sys.stderr)
+        return None
+    try:
+        conn = psycopg2.connect(
+            dbname=os.getenv("DB_NAME"),
+            user=os.getenv("DB_USER"),
+            password=os.getenv("DB_PASSWORD"),
+            host=os.getenv("DB_HOST"),
+            port=os.getenv("DB_PORT"),
+        )
+    except psycopg2.OperationalError as e:
+        print(f"Could not connect to the database; existing indexes are not checked: {e}", file=sys.stderr)
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute(_CATALOG_COLUMNS)
+            columns_of: dict[str, set[str]] = defaultdict(set)
+            for table, column in cur.fetchall():
+                columns_of[table].add(column)
+            cur.execute(_CATALOG_INDEXES)
+            indexes: dict[str, list[tuple[str, ...]]] = defaultdict(list)
+            for table, columns in cur.fetchall():
+                indexes[table].append(tuple(columns))
+        return dict(columns_of), dict(indexes)
+    finally:
+        conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("logs", nargs="+", type=pathlib.Path, help="query log file(s) written by the MCP server")
+    parser.add_argument(
+        "--env-file", type=pathlib.Path, default=pathlib.Path(".env"), help="an .env file with the DB_* variables"
+    )
+    parser.add_argument("--no-db", action="store_true", help="do not check the database for existing indexes")
+    parser.add_argument("--min-calls", type=int, default=1, help="ignore shapes seen fewer times than this")
+    parser.add_argument("--top", type=int, default=10, help="number of recommendations to print")
+    args = parser.parse_args()
+
+    load_dotenv(dotenv_path=args.env_file)
+    shapes = read_log(args.logs)
+    if not shapes:
+        print("The query log is empty.")
+        return
+    catalog = None if args.no_db else load_catalog()
+    columns_of, indexes = catalog if catalog else ({}, None)
+
+    candidates = recommend(shapes, columns_of, indexes, args.min_calls)[: args.top]
+    calls = sum(s.calls for s in shapes.values())
+    print(f"-- {calls} statement(s) in {len(shapes)} shape(s) analysed.")
+    if not candidates:
+        print("-- No missing indexes found.")
+    for candidate in candidates:
+        print()
+        print(
+            f"-- {candidate.total_ms / 1000:.2f} s over {candidate.calls} call(s) "
+            f"in {len(candidate.shapes)} shape(s), e.g.: {candidate.shapes[0][:160]}"
+        )
+        print(candidate.statement())
+
+
+if __name__ == "__main__":
+    main()
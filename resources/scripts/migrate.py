@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Applies the schema migrations in resources/scripts/migrations to a TnT Mart database.
+
+Migrations are the NNN_*.sql files of that folder and run in order of their number,
+each in its own transaction. Applied migrations are recorded in schema_migrations
+(version, name, checksum, applied_at), so running the script again only applies the
+new ones. A migration whose file changed after it was applied is reported and stops
+the run: write a new migration instead of editing an applied one.
+
+The migrations are idempotent, so a database that already had some of them applied
+by hand with psql is brought under tracking by simply running this script.
+
+Connection parameters are the DB_NAME, DB_USER, DB_PASSWORD, DB_HOST and DB_PORT
+variables the bots use, read from the environment or an .env file.
+
+Example:
+    python migrate.py --env-file ../../src/Chapter10/agentframework/.env
+    python migrate.py --status
+"""
+
+import argparse
+import hashlib
+import os
+import pathlib
+import re
+import sys
+
+import psycopg2
+from dotenv import load_dotenv
+
+MIGRATIONS_DIR = pathlib.Path(__file__).resolve().parent / "migrations"
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+# Serializes concurrent runs, e.g. several app instances migrating on deploy.
+ADVISORY_LOCK_KEY = 0x746E74  # "tnt"
+
+_CREATE_TABLE = """
+    create table if not exists schema_migrations (
+        version    int primary key,
+        name       varchar(255) not null,
+        checksum   char(64) not null,
+        applied_at timestamp not null default current_timestamp
+    );
+"""
+
+
+def discover(directory: pathlib.Path = MIGRATIONS_DIR) -> list[tuple[int, str, pathlib.Path]]:
+    """Returns the (version, name, path) of every migration file, ordered by version."""
+    migrations = []
+    for path in directory.glob("*.sql"):
+        match = MIGRATION_FILE.match(path.name)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), path))
+    migrations.sort()
+    versions = [version for version, _, _ in migrations]
+    duplicates = sorted({version for version in versions if versions.count(version) > 1})
+    if duplicates:
+        raise SystemExit(f"Duplicate migration versions: {duplicates}")
+    return migrations
+
+
+def checksum(path: pathlib.Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def connect():
+    return psycopg2.connect(
+        dbname=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST"),
+        port=os.getenv("DB_PORT"),
+    )
+
+
+def applied_migrations(conn) -> dict[int, str]:
+    """Maps the version of every applied migration to its recorded checksum."""
+    with conn.cursor() as cur:
+        cur.execute(_CREATE_TABLE)
+        cur.execute("select version, checksum from schema_migrations;")
+        rows = cur.fetchall()
+    conn.commit()
+    return dict(rows)
+
+
+def changed_migrations(migrations, applied: dict[int, str]) -> list[str]:
+    return [
+        path.name
+        for version, _, path in migrations
+        if version in applied and applied[version] != checksum(path)
+    ]
+
+
+def status(conn, migrations) -> None:
+    applied = applied_migrations(conn)
+    for version, _, path in migrations:
+        if version not in applied:
+            state = "pending"
+        elif applied[version] != checksum(path):
+            state = "changed since applied"
+        else:
+            state = "applied"
+        print(f"{path.name:<45} {state}")
+
+
+def migrate(conn, migrations) -> int:
+    """Applies the pending migrations; returns how many were applied."""
+    with conn.cursor() as cur:
+        cur.execute("select pg_advisory_lock(%s);", (ADVISORY_LOCK_KEY,))
+    conn.commit()
+    try:
+        applied = applied_migrations(conn)
+        changed = changed_migrations(migrations, applied)
+        if changed:
+            raise SystemExit(f"Applied migrations were modified: {', '.join(changed)}")
+
+        count = 0
+        for version, name, path in migrations:
+            if version in applied:
+                continue
+            print(f"Applying {path.name} ...", flush=True)
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(path.read_text())
+                    cur.execute(
+                        "insert into schema_migrations (version, name, checksum) values (%s, %s, %s);",
+                        (version, name, checksum(path)),
+                    )
+                conn.commit()
+            except psycopg2.Error as e:
+                conn.rollback()
+                raise SystemExit(f"{path.name} failed and was rolled back: {e}")
+            count += 1
+        return count
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("select pg_advisory_unlock(%s);", (ADVISORY_LOCK_KEY,))
+        conn.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--env-file", type=pathlib.Path, default=pathlib.Path(".env"), help="an .env file with the DB_* variables"
+    )
+    parser.add_argument("--status", action="store_true", help="list the migrations and whether they are applied")
+    args = parser.parse_args()
+
+    load_dotenv(dotenv_path=args.env_file)
+    migrations = discover()
+    conn = connect()
+    try:
+        if args.status:
+            status(conn, migrations)
+            return
+        count = migrate(conn, migrations)
+        print(f"{count} migration(s) applied." if count else "Database is up to date.")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except psycopg2.OperationalError as e:
+        print(f"Could not connect to the database: {e}", file=sys.stderr)
+        sys.exit(1)
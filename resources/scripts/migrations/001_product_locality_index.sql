@@ -0,0 +1,149 @@
+-- Migration 001: precomputed product locality index for order ETAs.
+--
+-- For every product and every state that customers live in, product_locality stores
+-- the nearest active warehouse holding the product in stock and the resulting ETA
+-- class. The order tracking bots look an order's ETA up with one indexed read
+-- (get_order_eta) instead of comparing warehouse and customer addresses in the prompt.
+--
+-- A warehouse in the customer's state is "Local" (ETA 5 days), any other warehouse
+-- is "Non-Local" (ETA 10 days), as in getETA. Among several candidates, a Local one
+-- wins, then the one closest to the centre of the state's customer addresses.
+--
+-- The index is kept up to date by triggers: a stock change refreshes only the rows
+-- of that product, and only when it goes in or out of stock somewhere; a change to
+-- warehouses or to customer locations refreshes all rows.
+--
+-- Apply with: psql -d <database> -f 001_product_locality_index.sql
+
+-- The state is the last comma-separated part of the warehouse address,
+-- e.g. 'Andheri East, Mumbai, Maharashtra' -> 'Maharashtra'.
+ALTER TABLE warehouse
+    ADD COLUMN IF NOT EXISTS state VARCHAR(100)
+    GENERATED ALWAYS AS (btrim(regexp_replace(address, '^.*,', ''))) STORED;
+
+CREATE TABLE IF NOT EXISTS product_locality (
+    product_id     BIGINT NOT NULL,
+    state          VARCHAR(100) NOT NULL,
+    warehouse_id   BIGINT NOT NULL,
+    warehouse_code VARCHAR(50) NOT NULL,
+    distance_km    DECIMAL(8,1) NOT NULL,
+    eta_class      VARCHAR(20) NOT NULL CHECK (eta_class IN ('Local', 'Non-Local')),
+    eta_days       INT NOT NULL,
+    -- Derived data, so no foreign keys: the triggers below remove stale rows.
+    PRIMARY KEY (product_id, state)
+);
+
+-- Great-circle distance between two points, in kilometres.
+CREATE OR REPLACE FUNCTION haversine_km(
+    lat1 DOUBLE PRECISION, lon1 DOUBLE PRECISION, lat2 DOUBLE PRECISION, lon2 DOUBLE PRECISION
+) RETURNS DOUBLE PRECISION
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT 2 * 6371 * asin(sqrt(
+        power(sin(radians(lat2 - lat1) / 2), 2)
+        + cos(radians(lat1)) * cos(radians(lat2)) * power(sin(radians(lon2 - lon1) / 2), 2)
+    ))
+$$;
+
+-- Recomputes the rows of one product, or of all products when called without one.
+-- Rows are upserted rather than rebuilt, so concurrent refreshes do not conflict and
+-- unchanged rows are not rewritten.
+CREATE OR REPLACE FUNCTION refresh_product_locality(p_product_id BIGINT DEFAULT NULL)
+RETURNS VOID
+LANGUAGE plpgsql AS $$
+BEGIN
+    WITH states AS (
+        SELECT state, avg(latitude) AS latitude, avg(longitude) AS longitude
+        FROM address
+        GROUP BY state
+    ),
+    nearest AS (
+        SELECT DISTINCT ON (wp.product_id, s.state)
+            wp.product_id,
+            s.state,
+            w.warehouse_id,
+            w.warehouse_code,
+            round(haversine_km(s.latitude, s.longitude, w.latitude, w.longitude)::numeric, 1) AS distance_km,
+            CASE WHEN w.state = s.state THEN 'Local' ELSE 'Non-Local' END AS eta_class,
+            CASE WHEN w.state = s.state THEN 5 ELSE 10 END AS eta_days
+        FROM warehouse_product wp
+        JOIN warehouse w ON w.warehouse_id = wp.warehouse_id AND w.active = 'Y'
+        CROSS JOIN states s
+        WHERE wp.product_quantity > 0
+            AND (p_product_id IS NULL OR wp.product_id = p_product_id)
+        ORDER BY wp.product_id, s.state, (w.state = s.state) DESC,
+            haversine_km(s.latitude, s.longitude, w.latitude, w.longitude)
+    ),
+    removed AS (
+        -- Products no longer in stock anywhere, or states without customers.
+        DELETE FROM product_locality pl
+        WHERE (p_product_id IS NULL OR pl.product_id = p_product_id)
+            AND NOT EXISTS (
+                SELECT 1 FROM nearest n WHERE n.product_id = pl.product_id AND n.state = pl.state
+            )
+    )
+    INSERT INTO product_locality (product_id, state, warehouse_id, warehouse_code, distance_km, eta_class, eta_days)
+    SELECT product_id, state, warehouse_id, warehouse_code, distance_km, eta_class, eta_days
+    FROM nearest
+    ON CONFLICT (product_id, state) DO UPDATE
+    SET warehouse_id = EXCLUDED.warehouse_id,
+        warehouse_code = EXCLUDED.warehouse_code,
+        distance_km = EXCLUDED.distance_km,
+        eta_class = EXCLUDED.eta_class,
+        eta_days = EXCLUDED.eta_days
+    WHERE (product_locality.warehouse_id, product_locality.distance_km, product_locality.eta_class)
+        IS DISTINCT FROM (EXCLUDED.warehouse_id, EXCLUDED.distance_km, EXCLUDED.eta_class);
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION product_locality_on_stock_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM refresh_product_locality(OLD.product_id);
+    END IF;
+    IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.product_id <> OLD.product_id) THEN
+        PERFORM refresh_product_locality(NEW.product_id);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION product_locality_on_location_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM refresh_product_locality();
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS product_locality_stock_added_or_removed ON warehouse_product;
+CREATE TRIGGER product_locality_stock_added_or_removed
+    AFTER INSERT OR DELETE ON warehouse_product
+    FOR EACH ROW EXECUTE FUNCTION product_locality_on_stock_change();
+
+-- Ordinary stock movements do not change which warehouses can ship a product; only
+-- going in or out of stock (or moving the row) does.
+DROP TRIGGER IF EXISTS product_locality_stock_changed ON warehouse_product;
+CREATE TRIGGER product_locality_stock_changed
+    AFTER UPDATE ON warehouse_product
+    FOR EACH ROW
+    WHEN (
+        OLD.warehouse_id IS DISTINCT FROM NEW.warehouse_id
+        OR OLD.product_id IS DISTINCT FROM NEW.product_id
+        OR (OLD.product_quantity > 0) IS DISTINCT FROM (NEW.product_quantity > 0)
+    )
+    EXECUTE FUNCTION product_locality_on_stock_change();
+
+DROP TRIGGER IF EXISTS product_locality_warehouse_changed ON warehouse;
+CREATE TRIGGER product_locality_warehouse_changed
+    AFTER INSERT OR UPDATE OR DELETE ON warehouse
+    FOR EACH STATEMENT EXECUTE FUNCTION product_locality_on_location_change();
+
+DROP TRIGGER IF EXISTS product_locality_address_changed ON address;
+CREATE TRIGGER product_locality_address_changed
+    AFTER INSERT OR UPDATE OF state, latitude, longitude OR DELETE ON address
+    FOR EACH STATEMENT EXECUTE FUNCTION product_locality_on_location_change();
+
+SELECT refresh_product_locality();
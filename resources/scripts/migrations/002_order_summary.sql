@@ -0,0 +1,157 @@
+-- Migration 002: maintained order summary for the order tracking bots.
+--
+-- order_summary holds one row per order with everything the tracking flow shows a
+-- customer: its items, amounts, status, payment state and expected versus actual
+-- delivery. The get_order_summary tool reads it with one indexed lookup on
+-- (customer_id, status) instead of the model joining orders, order_item, product and
+-- payment on every turn.
+--
+-- It works like a materialized view that refreshes itself incrementally: triggers on
+-- orders, order_item, payment and product recompute only the summaries of the orders
+-- a write touched, in the same transaction.
+--
+-- Apply with: psql -d <database> -f 002_order_summary.sql
+
+CREATE TABLE IF NOT EXISTS order_summary (
+    order_id               BIGINT PRIMARY KEY,
+    customer_id            BIGINT NOT NULL,
+    order_date             TIMESTAMP NOT NULL,
+    status                 VARCHAR(255) NOT NULL,
+    total_amount           DECIMAL(10,2) NOT NULL,
+    item_count             INT NOT NULL,
+    -- [{"product_id", "description", "quantity", "amount", "status"}, ...]
+    items                  JSONB NOT NULL,
+    amount_paid            DECIMAL(10,2) NOT NULL,
+    payment_status         VARCHAR(50) NOT NULL,
+    expected_delivery_date TIMESTAMP NOT NULL,
+    actual_delivery_date   TIMESTAMP NULL,
+    delivery_delay_days    INT NULL
+);
+
+CREATE INDEX IF NOT EXISTS order_summary_customer_status_idx
+    ON order_summary (customer_id, status, order_date DESC);
+
+-- Recomputes the summaries of the given orders; orders that no longer exist are
+-- removed. Without arguments every order is recomputed.
+CREATE OR REPLACE FUNCTION refresh_order_summary(p_order_ids BIGINT[] DEFAULT NULL)
+RETURNS VOID
+LANGUAGE plpgsql AS $$
+BEGIN
+    DELETE FROM order_summary s
+    WHERE (p_order_ids IS NULL OR s.order_id = ANY (p_order_ids))
+        AND NOT EXISTS (SELECT 1 FROM orders o WHERE o.order_id = s.order_id);
+
+    INSERT INTO order_summary (
+        order_id, customer_id, order_date, status, total_amount, item_count, items,
+        amount_paid, payment_status, expected_delivery_date, actual_delivery_date, delivery_delay_days
+    )
+    SELECT
+        o.order_id,
+        o.customer_id,
+        o.order_date,
+        o.status,
+        o.total_amount,
+        coalesce(i.item_count, 0),
+        coalesce(i.items, '[]'::jsonb),
+        coalesce(p.amount_paid, 0),
+        coalesce(p.payment_status, 'Unpaid'),
+        o.expected_delivery_date,
+        o.actual_delivery_date,
+        CASE
+            WHEN o.actual_delivery_date IS NOT NULL
+            THEN o.actual_delivery_date::date - o.expected_delivery_date::date
+        END
+    FROM orders o
+    LEFT JOIN LATERAL (
+        SELECT
+            count(*)::int AS item_count,
+            jsonb_agg(
+                jsonb_build_object(
+                    'product_id', oi.product_id,
+                    'description', pr.description,
+                    'quantity', oi.quantity,
+                    'amount', oi.amount,
+                    'status', oi.status
+                )
+                ORDER BY oi.order_item_id
+            ) AS items
+        FROM order_item oi
+        JOIN product pr ON pr.product_id = oi.product_id
+        WHERE oi.order_id = o.order_id
+    ) i ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT
+            sum(pm.amount) FILTER (WHERE pm.status = 'Successful') AS amount_paid,
+            (array_agg(pm.status ORDER BY pm.payment_time DESC, pm.payment_id DESC))[1] AS payment_status
+        FROM payment pm
+        WHERE pm.order_id = o.order_id
+    ) p ON TRUE
+    WHERE p_order_ids IS NULL OR o.order_id = ANY (p_order_ids)
+    ON CONFLICT (order_id) DO UPDATE
+    SET customer_id = EXCLUDED.customer_id,
+        order_date = EXCLUDED.order_date,
+        status = EXCLUDED.status,
+        total_amount = EXCLUDED.total_amount,
+        item_count = EXCLUDED.item_count,
+        items = EXCLUDED.items,
+        amount_paid = EXCLUDED.amount_paid,
+        payment_status = EXCLUDED.payment_status,
+        expected_delivery_date = EXCLUDED.expected_delivery_date,
+        actual_delivery_date = EXCLUDED.actual_delivery_date,
+        delivery_delay_days = EXCLUDED.delivery_delay_days;
+END;
+$$;
+
+-- orders, order_item and payment all carry order_id; a changed row refreshes the
+-- order it belongs to, and the one it belonged to before if that differs.
+CREATE OR REPLACE FUNCTION order_summary_on_order_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_order_summary(ARRAY[NEW.order_id]);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM refresh_order_summary(ARRAY[OLD.order_id]);
+    ELSE
+        PERFORM refresh_order_summary(ARRAY[NEW.order_id, OLD.order_id]);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Item descriptions are part of the summary, so renaming a product refreshes the
+-- orders that contain it.
+CREATE OR REPLACE FUNCTION order_summary_on_product_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM refresh_order_summary(
+        ARRAY(SELECT DISTINCT order_id FROM order_item WHERE product_id = NEW.product_id)
+    );
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS order_summary_orders_changed ON orders;
+CREATE TRIGGER order_summary_orders_changed
+    AFTER INSERT OR UPDATE OR DELETE ON orders
+    FOR EACH ROW EXECUTE FUNCTION order_summary_on_order_change();
+
+DROP TRIGGER IF EXISTS order_summary_order_item_changed ON order_item;
+CREATE TRIGGER order_summary_order_item_changed
+    AFTER INSERT OR UPDATE OR DELETE ON order_item
+    FOR EACH ROW EXECUTE FUNCTION order_summary_on_order_change();
+
+DROP TRIGGER IF EXISTS order_summary_payment_changed ON payment;
+CREATE TRIGGER order_summary_payment_changed
+    AFTER INSERT OR UPDATE OR DELETE ON payment
+    FOR EACH ROW EXECUTE FUNCTION order_summary_on_order_change();
+
+DROP TRIGGER IF EXISTS order_summary_product_changed ON product;
+CREATE TRIGGER order_summary_product_changed
+    AFTER UPDATE OF description ON product
+    FOR EACH ROW
+    WHEN (OLD.description IS DISTINCT FROM NEW.description)
+    EXECUTE FUNCTION order_summary_on_product_change();
+
+SELECT refresh_order_summary();
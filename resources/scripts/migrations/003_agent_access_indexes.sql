@@ -0,0 +1,68 @@
+-- Migration 003: indexes for the lookups the bots and tools make on every turn.
+--
+-- script.sql gives most tables only a primary key, so every lookup by customer or by
+-- order is a sequential scan. That is invisible with the sample data and expensive
+-- with production volumes. The indexes below cover the predicates the prompts,
+-- tools and triggers actually use:
+--
+--   orders                 customer_id + status   (order tracking, refunds)
+--   order_item             order_id               (order details, ETA, summary refresh)
+--   order_item             product_id             (summary refresh on product change)
+--   payment                order_id               (refunds, summary refresh)
+--   refund                 order_id               (refund bot)
+--   address                user_id                (ETA, nearest warehouse)
+--   warehouse_product      product_id             (locality refresh, warehouse locator)
+--   shopping_cart          customer_id, product_id  (unique; cart tools upsert on it)
+--   customer_regular_items customer_id, product_id  (unique; regular items nudge)
+--
+-- Every statement is idempotent. On a large, busy database the plain CREATE INDEX
+-- below blocks writes to the table while it builds; the same indexes can be created
+-- by hand beforehand with CREATE INDEX CONCURRENTLY, after which this migration skips
+-- them.
+--
+-- Apply with: python ../migrate.py (or psql -d <database> -f 003_agent_access_indexes.sql)
+
+CREATE INDEX IF NOT EXISTS orders_customer_status_idx ON orders (customer_id, status);
+
+CREATE INDEX IF NOT EXISTS order_item_order_id_idx ON order_item (order_id);
+
+CREATE INDEX IF NOT EXISTS order_item_product_id_idx ON order_item (product_id);
+
+CREATE INDEX IF NOT EXISTS payment_order_id_idx ON payment (order_id);
+
+CREATE INDEX IF NOT EXISTS refund_order_id_idx ON refund (order_id);
+
+CREATE INDEX IF NOT EXISTS address_user_id_idx ON address (user_id);
+
+-- The primary key (warehouse_id, product_id) cannot serve lookups by product alone.
+CREATE INDEX IF NOT EXISTS warehouse_product_product_id_idx ON warehouse_product (product_id);
+
+-- script.sql adds this one, but databases created from older copies of it lack it and
+-- the cart tools' ON CONFLICT (customer_id, product_id) needs it. Adding either
+-- constraint fails if the table already holds duplicates; remove those first.
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'shopping_cart'::regclass AND conname = 'unique_customer_product'
+    ) THEN
+        ALTER TABLE shopping_cart
+            ADD CONSTRAINT unique_customer_product UNIQUE (customer_id, product_id);
+    END IF;
+END;
+$$;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'customer_regular_items'::regclass AND conname = 'unique_customer_regular_item'
+    ) THEN
+        ALTER TABLE customer_regular_items
+            ADD CONSTRAINT unique_customer_regular_item UNIQUE (customer_id, product_id);
+    END IF;
+END;
+$$;
+
+-- Fresh statistics, so the planner considers the new indexes straight away.
+ANALYZE orders, order_item, payment, refund, address, warehouse_product, shopping_cart, customer_regular_items;
@@ -0,0 +1,189 @@
+-- Migration 004: refresh only the affected product_locality rows on location changes.
+--
+-- Migration 001 rebuilt the whole index after any statement that touched a warehouse
+-- or a customer address, even an UPDATE that changed nothing it depends on. With
+-- production volumes that is a full product x state recomputation per write.
+--
+-- The triggers below use transition tables, so a bulk statement still refreshes
+-- once, and refresh only what the changed rows can affect:
+--
+--   warehouse  the products stocked at (or currently served from) the warehouses
+--              whose code, address, coordinates or active flag changed
+--   address    the states whose addresses were added or removed, or changed state
+--              or coordinates, since those move the state's centre
+--
+-- Apply with: python ../migrate.py (or psql -d <database> -f 004_product_locality_targeted_refresh.sql)
+
+-- Refreshing a warehouse's products looks up the rows it currently serves.
+CREATE INDEX IF NOT EXISTS product_locality_warehouse_id_idx ON product_locality (warehouse_id);
+
+-- Recomputes the rows of the given products and states; NULL stands for all of them.
+CREATE OR REPLACE FUNCTION refresh_product_locality_rows(p_product_ids BIGINT[], p_states VARCHAR[])
+RETURNS VOID
+LANGUAGE plpgsql AS $$
+BEGIN
+    WITH states AS (
+        SELECT state, avg(latitude) AS latitude, avg(longitude) AS longitude
+        FROM address
+        WHERE p_states IS NULL OR state = ANY (p_states)
+        GROUP BY state
+    ),
+    nearest AS (
+        SELECT DISTINCT ON (wp.product_id, s.state)
+            wp.product_id,
+            s.state,
+            w.warehouse_id,
+            w.warehouse_code,
+            round(haversine_km(s.latitude, s.longitude, w.latitude, w.longitude)::numeric, 1) AS distance_km,
+            CASE WHEN w.state = s.state THEN 'Local' ELSE 'Non-Local' END AS eta_class,
+            CASE WHEN w.state = s.state THEN 5 ELSE 10 END AS eta_days
+        FROM warehouse_product wp
+        JOIN warehouse w ON w.warehouse_id = wp.warehouse_id AND w.active = 'Y'
+        CROSS JOIN states s
+        WHERE wp.product_quantity > 0
+            AND (p_product_ids IS NULL OR wp.product_id = ANY (p_product_ids))
+        ORDER BY wp.product_id, s.state, (w.state = s.state) DESC,
+            haversine_km(s.latitude, s.longitude, w.latitude, w.longitude)
+    ),
+    removed AS (
+        -- Products no longer in stock anywhere, or states without customers.
+        DELETE FROM product_locality pl
+        WHERE (p_product_ids IS NULL OR pl.product_id = ANY (p_product_ids))
+            AND (p_states IS NULL OR pl.state = ANY (p_states))
+            AND NOT EXISTS (
+                SELECT 1 FROM nearest n WHERE n.product_id = pl.product_id AND n.state = pl.state
+            )
+    )
+    INSERT INTO product_locality (product_id, state, warehouse_id, warehouse_code, distance_km, eta_class, eta_days)
+    SELECT product_id, state, warehouse_id, warehouse_code, distance_km, eta_class, eta_days
+    FROM nearest
+    ON CONFLICT (product_id, state) DO UPDATE
+    SET warehouse_id = EXCLUDED.warehouse_id,
+        warehouse_code = EXCLUDED.warehouse_code,
+        distance_km = EXCLUDED.distance_km,
+        eta_class = EXCLUDED.eta_class,
+        eta_days = EXCLUDED.eta_days
+    WHERE (product_locality.warehouse_id, product_locality.distance_km, product_locality.eta_class)
+        IS DISTINCT FROM (EXCLUDED.warehouse_id, EXCLUDED.distance_km, EXCLUDED.eta_class);
+END;
+$$;
+
+-- Kept for the stock trigger and for full rebuilds (e.g. after a bulk load).
+CREATE OR REPLACE FUNCTION refresh_product_locality(p_product_id BIGINT DEFAULT NULL)
+RETURNS VOID
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM refresh_product_locality_rows(
+        CASE WHEN p_product_id IS NOT NULL THEN ARRAY[p_product_id] END, NULL
+    );
+END;
+$$;
+
+-- An UPDATE only counts the rows that actually differ between old_rows and new_rows.
+CREATE OR REPLACE FUNCTION product_locality_on_warehouse_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_warehouse_ids BIGINT[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        v_warehouse_ids := ARRAY(SELECT warehouse_id FROM new_rows);
+    ELSIF TG_OP = 'DELETE' THEN
+        v_warehouse_ids := ARRAY(SELECT warehouse_id FROM old_rows);
+    ELSE
+        v_warehouse_ids := ARRAY(
+            SELECT DISTINCT warehouse_id FROM (
+                (SELECT warehouse_id, warehouse_code, address, latitude, longitude, active FROM old_rows
+                 EXCEPT
+                 SELECT warehouse_id, warehouse_code, address, latitude, longitude, active FROM new_rows)
+                UNION ALL
+                (SELECT warehouse_id, warehouse_code, address, latitude, longitude, active FROM new_rows
+                 EXCEPT
+                 SELECT warehouse_id, warehouse_code, address, latitude, longitude, active FROM old_rows)
+            ) changed
+        );
+    END IF;
+    IF cardinality(v_warehouse_ids) > 0 THEN
+        PERFORM refresh_product_locality_rows(
+            ARRAY(
+                SELECT product_id FROM warehouse_product WHERE warehouse_id = ANY (v_warehouse_ids)
+                UNION
+                SELECT product_id FROM product_locality WHERE warehouse_id = ANY (v_warehouse_ids)
+            ),
+            NULL
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION product_locality_on_address_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_states VARCHAR[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        v_states := ARRAY(SELECT DISTINCT state FROM new_rows);
+    ELSIF TG_OP = 'DELETE' THEN
+        v_states := ARRAY(SELECT DISTINCT state FROM old_rows);
+    ELSE
+        v_states := ARRAY(
+            SELECT DISTINCT state FROM (
+                (SELECT address_id, state, latitude, longitude FROM old_rows
+                 EXCEPT
+                 SELECT address_id, state, latitude, longitude FROM new_rows)
+                UNION ALL
+                (SELECT address_id, state, latitude, longitude FROM new_rows
+                 EXCEPT
+                 SELECT address_id, state, latitude, longitude FROM old_rows)
+            ) changed
+        );
+    END IF;
+    IF cardinality(v_states) > 0 THEN
+        PERFORM refresh_product_locality_rows(NULL, v_states);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- A trigger with transition tables can only fire on one event, hence three per table.
+DROP TRIGGER IF EXISTS product_locality_warehouse_changed ON warehouse;
+DROP TRIGGER IF EXISTS product_locality_warehouse_inserted ON warehouse;
+CREATE TRIGGER product_locality_warehouse_inserted
+    AFTER INSERT ON warehouse
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION product_locality_on_warehouse_change();
+
+DROP TRIGGER IF EXISTS product_locality_warehouse_updated ON warehouse;
+CREATE TRIGGER product_locality_warehouse_updated
+    AFTER UPDATE ON warehouse
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION product_locality_on_warehouse_change();
+
+DROP TRIGGER IF EXISTS product_locality_warehouse_deleted ON warehouse;
+CREATE TRIGGER product_locality_warehouse_deleted
+    AFTER DELETE ON warehouse
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION product_locality_on_warehouse_change();
+
+DROP TRIGGER IF EXISTS product_locality_address_changed ON address;
+DROP TRIGGER IF EXISTS product_locality_address_inserted ON address;
+CREATE TRIGGER product_locality_address_inserted
+    AFTER INSERT ON address
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION product_locality_on_address_change();
+
+DROP TRIGGER IF EXISTS product_locality_address_updated ON address;
+CREATE TRIGGER product_locality_address_updated
+    AFTER UPDATE ON address
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION product_locality_on_address_change();
+
+DROP TRIGGER IF EXISTS product_locality_address_deleted ON address;
+CREATE TRIGGER product_locality_address_deleted
+    AFTER DELETE ON address
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION product_locality_on_address_change();
+
+DROP FUNCTION IF EXISTS product_locality_on_location_change();
@@ -0,0 +1,212 @@
+-- Migration 005: statement-level, serialized order_summary refreshes.
+--
+-- The row-level triggers of migration 002 had two problems:
+--
+-- * Each one recomputed an order from the writer's snapshot. Two transactions
+--   changing the items or payments of the same order could each write a summary
+--   missing the other's change, and the last to commit won until the order changed
+--   again.
+-- * A statement inserting N items of one order recomputed that order N times.
+--
+-- refresh_order_summary now locks the orders it recomputes, so concurrent refreshes
+-- of one order run one after the other, each seeing the changes committed before it.
+-- The triggers use transition tables, like those of migration 004: a statement
+-- refreshes each order it touched once, and an UPDATE only the orders whose rows
+-- actually changed.
+--
+-- Apply with: python ../migrate.py (or psql -d <database> -f 005_order_summary_statement_triggers.sql)
+
+-- Recomputes the summaries of the given orders; orders that no longer exist are
+-- removed. Without arguments every order is recomputed.
+CREATE OR REPLACE FUNCTION refresh_order_summary(p_order_ids BIGINT[] DEFAULT NULL)
+RETURNS VOID
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- One refresh of an order at a time. A refresh that had to wait takes its snapshot
+    -- for the statements below after the other transaction committed, so it sees that
+    -- transaction's changes too. NO KEY UPDATE does not conflict with the KEY SHARE
+    -- locks that inserting order items and payments takes on their order; a full
+    -- refresh locks nothing and is meant for maintenance, e.g. after a bulk load.
+    PERFORM 1 FROM orders
+    WHERE order_id = ANY (p_order_ids)
+    ORDER BY order_id
+    FOR NO KEY UPDATE;
+
+    DELETE FROM order_summary s
+    WHERE (p_order_ids IS NULL OR s.order_id = ANY (p_order_ids))
+        AND NOT EXISTS (SELECT 1 FROM orders o WHERE o.order_id = s.order_id);
+
+    INSERT INTO order_summary (
+        order_id, customer_id, order_date, status, total_amount, item_count, items,
+        amount_paid, payment_status, expected_delivery_date, actual_delivery_date, delivery_delay_days
+    )
+    SELECT
+        o.order_id,
+        o.customer_id,
+        o.order_date,
+        o.status,
+        o.total_amount,
+        coalesce(i.item_count, 0),
+        coalesce(i.items, '[]'::jsonb),
+        coalesce(p.amount_paid, 0),
+        coalesce(p.payment_status, 'Unpaid'),
+        o.expected_delivery_date,
+        o.actual_delivery_date,
+        CASE
+            WHEN o.actual_delivery_date IS NOT NULL
+            THEN o.actual_delivery_date::date - o.expected_delivery_date::date
+        END
+    FROM orders o
+    LEFT JOIN LATERAL (
+        SELECT
+            count(*)::int AS item_count,
+            jsonb_agg(
+                jsonb_build_object(
+                    'product_id', oi.product_id,
+                    'description', pr.description,
+                    'quantity', oi.quantity,
+                    'amount', oi.amount,
+                    'status', oi.status
+                )
+                ORDER BY oi.order_item_id
+            ) AS items
+        FROM order_item oi
+        JOIN product pr ON pr.product_id = oi.product_id
+        WHERE oi.order_id = o.order_id
+    ) i ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT
+            sum(pm.amount) FILTER (WHERE pm.status = 'Successful') AS amount_paid,
+            (array_agg(pm.status ORDER BY pm.payment_time DESC, pm.payment_id DESC))[1] AS payment_status
+        FROM payment pm
+        WHERE pm.order_id = o.order_id
+    ) p ON TRUE
+    WHERE p_order_ids IS NULL OR o.order_id = ANY (p_order_ids)
+    ON CONFLICT (order_id) DO UPDATE
+    SET customer_id = EXCLUDED.customer_id,
+        order_date = EXCLUDED.order_date,
+        status = EXCLUDED.status,
+        total_amount = EXCLUDED.total_amount,
+        item_count = EXCLUDED.item_count,
+        items = EXCLUDED.items,
+        amount_paid = EXCLUDED.amount_paid,
+        payment_status = EXCLUDED.payment_status,
+        expected_delivery_date = EXCLUDED.expected_delivery_date,
+        actual_delivery_date = EXCLUDED.actual_delivery_date,
+        delivery_delay_days = EXCLUDED.delivery_delay_days;
+END;
+$$;
+
+-- orders, order_item and payment all carry order_id; the orders of the changed rows,
+-- before and after the change, are refreshed.
+CREATE OR REPLACE FUNCTION order_summary_on_order_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_order_ids BIGINT[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        v_order_ids := ARRAY(SELECT DISTINCT order_id FROM new_rows);
+    ELSIF TG_OP = 'DELETE' THEN
+        v_order_ids := ARRAY(SELECT DISTINCT order_id FROM old_rows);
+    ELSE
+        v_order_ids := ARRAY(
+            SELECT DISTINCT order_id FROM (
+                (SELECT * FROM old_rows EXCEPT SELECT * FROM new_rows)
+                UNION ALL
+                (SELECT * FROM new_rows EXCEPT SELECT * FROM old_rows)
+            ) changed
+        );
+    END IF;
+    IF cardinality(v_order_ids) > 0 THEN
+        PERFORM refresh_order_summary(v_order_ids);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Item descriptions are part of the summary, so renaming products refreshes the
+-- orders that contain them.
+CREATE OR REPLACE FUNCTION order_summary_on_product_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_order_ids BIGINT[];
+BEGIN
+    v_order_ids := ARRAY(
+        SELECT DISTINCT oi.order_id
+        FROM new_rows n
+        JOIN old_rows o ON o.product_id = n.product_id
+        JOIN order_item oi ON oi.product_id = n.product_id
+        WHERE o.description IS DISTINCT FROM n.description
+    );
+    IF cardinality(v_order_ids) > 0 THEN
+        PERFORM refresh_order_summary(v_order_ids);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- A trigger with transition tables can only fire on one event, hence three per table.
+DROP TRIGGER IF EXISTS order_summary_orders_changed ON orders;
+DROP TRIGGER IF EXISTS order_summary_orders_inserted ON orders;
+CREATE TRIGGER order_summary_orders_inserted
+    AFTER INSERT ON orders
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION order_summary_on_order_change();
+
+DROP TRIGGER IF EXISTS order_summary_orders_updated ON orders;
+CREATE TRIGGER order_summary_orders_updated
+    AFTER UPDATE ON orders
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION order_summary_on_order_change();
+
+DROP TRIGGER IF EXISTS order_summary_orders_deleted ON orders;
+CREATE TRIGGER order_summary_orders_deleted
+    AFTER DELETE ON orders
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION order_summary_on_order_change();
+
+DROP TRIGGER IF EXISTS order_summary_order_item_changed ON order_item;
+DROP TRIGGER IF EXISTS order_summary_order_item_inserted ON order_item;
+CREATE TRIGGER order_summary_order_item_inserted
+    AFTER INSERT ON order_item
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION order_summary_on_order_change();
+
+DROP TRIGGER IF EXISTS order_summary_order_item_updated ON order_item;
+CREATE TRIGGER order_summary_order_item_updated
+    AFTER UPDATE ON order_item
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION order_summary_on_order_change();
+
+DROP TRIGGER IF EXISTS order_summary_order_item_deleted ON order_item;
+CREATE TRIGGER order_summary_order_item_deleted
+    AFTER DELETE ON order_item
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION order_summary_on_order_change();
+
+DROP TRIGGER IF EXISTS order_summary_payment_changed ON payment;
+DROP TRIGGER IF EXISTS order_summary_payment_inserted ON payment;
+CREATE TRIGGER order_summary_payment_inserted
+    AFTER INSERT ON payment
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION order_summary_on_order_change();
+
+DROP TRIGGER IF EXISTS order_summary_payment_updated ON payment;
+CREATE TRIGGER order_summary_payment_updated
+    AFTER UPDATE ON payment
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION order_summary_on_order_change();
+
+DROP TRIGGER IF EXISTS order_summary_payment_deleted ON payment;
+CREATE TRIGGER order_summary_payment_deleted
+    AFTER DELETE ON payment
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION order_summary_on_order_change();
+
+DROP TRIGGER IF EXISTS order_summary_product_changed ON product;
+CREATE TRIGGER order_summary_product_changed
+    AFTER UPDATE ON product
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION order_summary_on_product_change();
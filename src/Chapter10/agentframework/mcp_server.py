@@ -3,10 +3,10 @@ This module implements a robust and efficient Model Context Protocol (MCP) serve
 for interacting with a PostgreSQL database. It is designed with best practices in
 mind, including structured logging and clear configuration management.
 
-The server provides a single tool, `execute_query`, which allows for the execution
-of SQL queries against the connected database. The tool is designed to be flexible,
-handling both data retrieval (SELECT) and data manipulation (INSERT, UPDATE, DELETE)
-queries.
+The server's main tool, `execute_query`, allows for the execution of SQL queries
+against the connected database, and `execute_batch` runs several of them in one
+round trip. The tools are designed to be flexible, handling both data retrieval
+(SELECT) and data manipulation (INSERT, UPDATE, DELETE) queries.
 
 Key Features:
 - **Structured Logging**: Utilizes Python's built-in logging module to provide
@@ -15,30 +15,58 @@ Key Features:
 - **Configuration Management**: Centralizes all configuration parameters, such as
   database credentials and logging settings, making the server easy to configure and
   maintain.
-- **Asynchronous Operations**: Built on top of an asynchronous framework, allowing for
-  non-blocking I/O operations and improved scalability.
+- **Asynchronous Operations**: Built on top of an asynchronous framework. Blocking
+  database calls run on a bounded thread pool so the event loop keeps serving other
+  requests, and a cancelled tool call cancels its statement on the server.
 - **Error Handling**: Includes comprehensive error handling to gracefully manage
   database-related issues, ensuring the stability of the server.
 - **Dynamic Query Execution**: The `execute_query` tool can execute arbitrary SQL
   queries, returning results in a JSON format that is easy to parse and use by
-  client applications.
+  client applications. Large SELECTs can be read page by page through server-side
+  cursors, so memory stays flat regardless of table size.
+- **Result Caching**: SELECT results are served from an LRU/TTL cache that is
+  invalidated per table whenever a write is committed, by this server or by any
+  other process announcing it on the `tnt_mart_table_changes` channel.
+- **Prepared Statements**: Statements are fingerprinted into query shapes; hot
+  shapes are prepared once per pooled connection and executed with their literals
+  bound as parameters. `get_query_stats` lists the top shapes by calls and time.
+- **Query Log**: With QUERY_LOG_PATH set, every executed statement's shape, duration
+  and tables are appended to a JSON Lines file, which
+  `resources/scripts/index_advisor.py` mines for missing indexes.
+- **Connection Pooling**: Every tool call borrows a connection from a bounded pool
+  (with health checks, idle reaping and an acquire timeout), so overlapping tool
+  calls do not serialize on, or poison, a single shared connection. Pool wait time
+  and utilization are exposed through the `get_server_metrics` tool.
 
 The server is intended to be run as a standalone process, typically managed by a
 parent application that communicates with it over standard input/output. This design
 allows for a clean separation of concerns and makes the server a reusable component
-in a larger system.
+in a larger system. Setting MCP_TRANSPORT=streamable-http instead runs it as one
+long-lived server that all agent sessions in a pod share, so a new chat session no
+longer pays for a process start, its imports and a fresh database connection.
 """
 
+import asyncio
+import hashlib
 import json
 import logging
 import os
+import re
+import select
 import sys
-from dataclasses import dataclass
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
 
 import psycopg2
 from dotenv import load_dotenv
 from mcp.server.fastmcp import Context, FastMCP
 from psycopg2.extras import RealDictCursor
+from pydantic import BaseModel, Field
 
 # Load environment variables from a .env file
 load_dotenv()
@@ -55,6 +83,30 @@ class Settings:
     db_host: str = os.getenv("DB_HOST", "localhost")
     db_port: str = os.getenv("DB_PORT", "5432")
     log_level: str = os.getenv("LOG_LEVEL", "DEBUG").upper()
+    pool_min_size: int = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+    pool_max_size: int = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    pool_acquire_timeout: float = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10"))
+    pool_max_idle: float = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+    pool_health_check_interval: float = float(
+        os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30")
+    )
+    statement_timeout_ms: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+    max_page_size: int = int(os.getenv("DB_MAX_PAGE_SIZE", "200"))
+    max_open_cursors: int = int(os.getenv("DB_MAX_OPEN_CURSORS", "4"))
+    cursor_idle_timeout: float = float(os.getenv("DB_CURSOR_IDLE_TIMEOUT", "120"))
+    result_max_rows: int = int(os.getenv("RESULT_MAX_ROWS", "200"))
+    result_max_bytes: int = int(os.getenv("RESULT_MAX_BYTES", "65536"))
+    result_max_cell_length: int = int(os.getenv("RESULT_MAX_CELL_LENGTH", "1000"))
+    cache_max_entries: int = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "256"))
+    cache_ttl: float = float(os.getenv("QUERY_CACHE_TTL", "60"))
+    batch_max_statements: int = int(os.getenv("BATCH_MAX_STATEMENTS", "20"))
+    prepare_threshold: int = int(os.getenv("PREPARE_THRESHOLD", "5"))
+    max_prepared_per_connection: int = int(os.getenv("MAX_PREPARED_PER_CONNECTION", "100"))
+    query_stats_max_shapes: int = int(os.getenv("QUERY_STATS_MAX_SHAPES", "1000"))
+    query_log_path: str = os.getenv("QUERY_LOG_PATH", "")
+    mcp_transport: str = os.getenv("MCP_TRANSPORT", "stdio")
+    mcp_host: str = os.getenv("MCP_HOST", "127.0.0.1")
+    mcp_port: int = int(os.getenv("MCP_PORT", "8000"))
 
 
 # --- Utility Functions ---
@@ -80,33 +132,1378 @@ def setup_logging(log_level: str) -> logging.Logger:
     return logger
 
 
+# --- Connection Pool ---
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available within the acquire timeout."""
+
+
+@dataclass
+class PoolMetrics:
+    """Counters describing how the connection pool has been used."""
+
+    acquisitions: int = 0
+    timeouts: int = 0
+    connections_created: int = 0
+    connections_closed: int = 0
+    health_check_failures: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+
+class ConnectionPool:
+    """
+    A bounded, thread-safe pool of psycopg2 connections.
+
+    Connections are created lazily up to `max_size` and handed out one per caller.
+    A connection that has been idle for longer than `health_check_interval` is
+    probed with `SELECT 1` before it is handed out, and idle connections beyond
+    `min_size` are closed once they have been unused for `max_idle` seconds.
+    Callers that cannot get a connection within the acquire timeout receive a
+    `PoolTimeoutError` instead of waiting forever.
+    """
+
+    def __init__(
+        self,
+        connect,
+        min_size: int,
+        max_size: int,
+        acquire_timeout: float,
+        max_idle: float,
+        health_check_interval: float,
+    ):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size, max_size >= 1.")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.max_idle = max_idle
+        self.health_check_interval = health_check_interval
+        self.metrics = PoolMetrics()
+        self._idle: list[tuple[psycopg2.extensions.connection, float]] = []
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def open(self) -> None:
+        """Creates the minimum number of connections up front."""
+        for _ in range(self.min_size):
+            conn = self._create()
+            with self._cond:
+                self._size += 1
+                self._idle.append((conn, time.monotonic()))
+
+    def _create(self) -> psycopg2.extensions.connection:
+        conn = self._connect()
+        self.metrics.connections_created += 1
+        return conn
+
+    def _discard(self, conn: psycopg2.extensions.connection) -> None:
+        """Closes a connection and frees its slot. Must be called without the lock held."""
+        try:
+            if not conn.closed:
+                conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self.metrics.connections_closed += 1
+            self._cond.notify()
+
+    def _reap_idle_locked(self, now: float) -> list[psycopg2.extensions.connection]:
+        """Removes connections idle for longer than `max_idle`, keeping `min_size` alive."""
+        expired = []
+        keep = []
+        # The oldest connections sit at the front of the idle list.
+        for conn, last_used in self._idle:
+            surplus = self._size - len(expired) > self.min_size
+            if surplus and now - last_used > self.max_idle:
+                expired.append(conn)
+            else:
+                keep.append((conn, last_used))
+        self._idle = keep
+        return expired
+
+    def _is_healthy(self, conn: psycopg2.extensions.connection, last_used: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def acquire(self, timeout: float | None = None) -> psycopg2.extensions.connection:
+        """
+        Borrows a connection from the pool.
+
+        Args:
+            timeout: Seconds to wait for a free connection. Defaults to the pool's
+                acquire timeout.
+
+        Returns:
+            A healthy connection that must be handed back with `release`.
+
+        Raises:
+            PoolTimeoutError: If no connection became available in time.
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        while True:
+            conn = None
+            last_used = 0.0
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolTimeoutError("Connection pool is closed.")
+                    now = time.monotonic()
+                    expired = self._reap_idle_locked(now)
+                    if expired:
+                        self._size -= len(expired)
+                        self.metrics.connections_closed += len(expired)
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self.metrics.timeouts += 1
+                        raise PoolTimeoutError(
+                            f"Timed out after {timeout}s waiting for a database connection."
+                        )
+                    self._cond.wait(remaining)
+            for stale in expired:
+                try:
+                    stale.close()
+                except psycopg2.Error:
+                    pass
+
+            if conn is None:
+                try:
+                    conn = self._create()
+                except psycopg2.Error:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_healthy(conn, last_used):
+                self.metrics.health_check_failures += 1
+                logger.warning("⚠️ Discarding unhealthy pooled connection.")
+                self._discard(conn)
+                continue
+
+            waited = time.monotonic() - start
+            with self._cond:
+                self.metrics.acquisitions += 1
+                self.metrics.total_wait_seconds += waited
+                self.metrics.max_wait_seconds = max(self.metrics.max_wait_seconds, waited)
+            return conn
+
+    def release(self, conn: psycopg2.extensions.connection, discard: bool = False) -> None:
+        """
+        Returns a connection to the pool.
+
+        Any transaction left open by the caller is rolled back so the next borrower
+        always starts from a clean state. Broken connections are closed instead of
+        being returned.
+        """
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+        if discard or conn.closed or self._closed:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout: float | None = None):
+        """Context manager that borrows a connection and always hands it back."""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self.release(conn, discard=True)
+            raise
+        except BaseException:
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def close(self) -> None:
+        """Closes all idle connections; borrowed ones are closed when released."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self) -> dict:
+        """Returns a snapshot of pool size, utilization and wait-time metrics."""
+        with self._cond:
+            idle = len(self._idle)
+            in_use = self._size - idle
+            metrics = asdict(self.metrics)
+        acquisitions = metrics["acquisitions"]
+        return {
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "size": self._size,
+            "idle": idle,
+            "in_use": in_use,
+            "utilization": round(in_use / self.max_size, 3),
+            "avg_wait_ms": round(
+                1000 * metrics["total_wait_seconds"] / acquisitions, 3
+            )
+            if acquisitions
+            else 0.0,
+            "max_wait_ms": round(1000 * metrics["max_wait_seconds"], 3),
+            **{
+                k: v
+                for k, v in metrics.items()
+                if k not in ("total_wait_seconds", "max_wait_seconds")
+            },
+        }
+
+
+# --- Query Execution ---
+class QueryCancelledError(Exception):
+    """Raised on the worker thread when a query was cancelled before it started."""
+
+
+class QueryHandle:
+    """
+    Tracks the connection a running statement is using so that it can be cancelled.
+
+    The handle is bound to a connection only while the statement runs. Cancelling
+    and unbinding are serialized, so a cancel request can never reach a connection
+    that has already been returned to the pool and handed to another caller.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn: psycopg2.extensions.connection | None = None
+        self.cancelled = False
+
+    def bind(self, conn: psycopg2.extensions.connection) -> None:
+        with self._lock:
+            if self.cancelled:
+                raise QueryCancelledError("Query was cancelled before it started.")
+            self._conn = conn
+
+    def unbind(self) -> None:
+        with self._lock:
+            self._conn = None
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            if self._conn is not None and not self._conn.closed:
+                self._conn.cancel()
+
+
+async def run_cancellable(work, handle: QueryHandle):
+    """
+    Runs the blocking callable `work` on `db_executor` and awaits its result.
+
+    If the awaiting task is cancelled (for example because the MCP client cancelled
+    the request), the statement bound to `handle` is cancelled on the server and the
+    worker thread is left to clean up after itself. Sending the cancel request is a
+    blocking round trip to the server, so it runs on the default executor rather
+    than on the event loop, and is not waited for.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(db_executor, work)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        # Not on db_executor: its workers may all be busy with the statements to cancel.
+        loop.run_in_executor(None, handle.cancel).add_done_callback(
+            lambda f: f.cancelled() or f.exception()
+        )
+        # The worker finishes on its own; make sure its outcome is not reported as
+        # an unretrieved exception.
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        logger.warning("⚠️ Query cancelled by the client.")
+        raise
+
+
+async def run_on_pool(fn, *args):
+    """
+    Runs `fn(conn, *args)` on a pooled connection without blocking the event loop.
+
+    Both acquiring the connection and running the statement happen on the bounded
+    `db_executor`. On cancellation the connection is rolled back and returned to the
+    pool by the worker thread.
+    """
+    handle = QueryHandle()
+
+    def work():
+        with db_pool.connection() as conn:
+            handle.bind(conn)
+            try:
+                return fn(conn, *args)
+            finally:
+                handle.unbind()
+
+    return await run_cancellable(work, handle)
+
+
+# --- Result Budgets ---
+@dataclass
+class ResultLimits:
+    """Upper bounds on the size of a result handed back to the caller."""
+
+    max_rows: int
+    max_bytes: int
+    max_cell_length: int
+
+    @classmethod
+    def resolve(
+        cls,
+        max_rows: int | None = None,
+        max_bytes: int | None = None,
+        max_cell_length: int | None = None,
+    ) -> "ResultLimits":
+        """
+        Combines per-request overrides with the configured limits.
+
+        The configured limits are hard ceilings: an override can tighten a limit but
+        never raise it. Larger results should be read in paged mode instead.
+        """
+
+        def pick(override: int | None, ceiling: int) -> int:
+            return ceiling if override is None else max(1, min(override, ceiling))
+
+        return cls(
+            max_rows=pick(max_rows, settings.result_max_rows),
+            max_bytes=pick(max_bytes, settings.result_max_bytes),
+            max_cell_length=pick(max_cell_length, settings.result_max_cell_length),
+        )
+
+
+READ_KEYWORDS = ("select", "with", "values", "table")
+WRITE_KEYWORDS = re.compile(r"\b(insert|update|delete|merge)\b", re.IGNORECASE)
+
+
+# Quoted text is matched too, so that "--" or "/*" inside a literal is left alone.
+_COMMENT = re.compile(r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|--[^\n]*|/\*.*?\*/""", re.DOTALL)
+
+
+def _strip_sql(query: str) -> str:
+    """
+    Removes comments, surrounding whitespace and trailing semicolons.
+
+    Comments go first, so `SELECT 1; -- note` loses its semicolon as well; the
+    result can be wrapped as a subquery.
+    """
+    query = _COMMENT.sub(lambda m: " " if m.group(0)[0] in "-/" else m.group(0), query)
+    return re.sub(r"[\s;]+$", "", query).strip()
+
+
+def is_read_query(query: str) -> bool:
+    """Returns True for statements that only read data and can be wrapped as a subquery."""
+    body = _strip_sql(query)
+    keyword = body.split(None, 1)[0].lower() if body else ""
+    if keyword not in READ_KEYWORDS:
+        return False
+    return keyword != "with" or not WRITE_KEYWORDS.search(body)
+
+
+def truncate_cells(row: dict, max_cell_length: int) -> tuple[dict, int]:
+    """Returns a copy of `row` with long text/binary cells cut to `max_cell_length`."""
+    row = dict(row)
+    shortened = 0
+    for key, value in row.items():
+        if not isinstance(value, (str, bytes, memoryview)):
+            continue
+        text = value if isinstance(value, str) else bytes(value).hex()
+        if len(text) > max_cell_length:
+            row[key] = text[:max_cell_length] + "…"
+            shortened += 1
+    return row, shortened
+
+
+def apply_result_budget(rows: list, limits: ResultLimits) -> tuple[list, int, bool]:
+    """
+    Trims `rows` to the row, byte and cell-length budgets.
+
+    Long text cells are cut to `max_cell_length` characters, and rows are kept only
+    while the serialized result stays within `max_bytes`.
+
+    Returns:
+        The rows that fit, the number of cells that were shortened, and whether
+        any rows had to be dropped.
+    """
+    kept = []
+    cells_truncated = 0
+    size = 2  # the enclosing brackets
+    for row in rows[: limits.max_rows]:
+        row, shortened = truncate_cells(row, limits.max_cell_length)
+        cells_truncated += shortened
+        row_size = len(json.dumps(row, default=str)) + (2 if kept else 0)
+        if size + row_size > limits.max_bytes:
+            return kept, cells_truncated, True
+        size += row_size
+        kept.append(row)
+    return kept, cells_truncated, len(rows) > limits.max_rows
+
+
+def share_byte_budget(results: list[dict], max_bytes: int) -> list[dict]:
+    """
+    Trims the rows of several results, in order, to one shared byte budget.
+
+    Every result keeps rows while the rows of all results so far fit within
+    `max_bytes`, so bytes a statement does not use are left to the ones after it,
+    and once the budget is spent the remaining results return no rows. A trimmed
+    result is copied rather than modified, as it may be shared with the cache.
+    """
+    remaining = max_bytes
+    shared = []
+    for result in results:
+        rows = result.get("rows")
+        if rows is None:
+            shared.append(result)
+            continue
+        size = 2  # the enclosing brackets
+        kept = 0
+        for row in rows:
+            row_size = len(json.dumps(row, default=str)) + (2 if kept else 0)
+            if size + row_size > remaining:
+                break
+            size += row_size
+            kept += 1
+        if kept < len(rows):
+            result = {**result, "rows": rows[:kept], "rows_returned": kept, "truncated": True}
+        remaining = max(0, remaining - size)
+        shared.append(result)
+    return shared
+
+
+def _execute_statement(
+    conn: psycopg2.extensions.connection,
+    query: str,
+    params: dict | None,
+    limits: ResultLimits,
+    commit: bool = True,
+) -> dict:
+    """
+    Executes a single statement on `conn` within the given result budget.
+
+    Read-only statements are wrapped as `SELECT * FROM (...) LIMIT max_rows + 1`, so
+    the server never sends more rows than the budget allows; the total row count is
+    only computed when the result had to be truncated. Statements that cannot be
+    wrapped, and all other statements, run as is; the latter are committed, and any
+    rows they return (e.g. via RETURNING) are trimmed the same way. With `commit`
+    set to False the statement joins the caller's transaction instead.
+
+    Frequently seen statement shapes are run as prepared statements (see
+    `_execute_prepared`), and every execution is recorded in `query_stats`.
+
+    Returns:
+        A result dict: `rows`, `rows_returned`, `rows_total`, `truncated` and
+        `cells_truncated` for statements that return rows, otherwise `status` and
+        `rows_affected`.
+    """
+    shape = fingerprint_sql(query)
+    started = time.perf_counter()
+    prepared = False
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            rows = None
+            if is_read_query(query):
+                # Newlines keep a trailing line comment from swallowing the wrapper.
+                def wrap(sql: str) -> str:
+                    return f"SELECT * FROM (\n{sql}\n) AS _bounded LIMIT {limits.max_rows + 1}"
+
+                body = _strip_sql(query)
+                if not commit:
+                    cursor.execute("SAVEPOINT bounded_read")
+                try:
+                    prepared = commit and not params and _execute_prepared(conn, cursor, shape, wrap)
+                    if not prepared:
+                        cursor.execute(wrap(body), params)
+                    rows = cursor.fetchall()
+                    rows_total = len(rows)
+                    if rows_total > limits.max_rows:
+                        cursor.execute(
+                            f"SELECT count(*) AS rows_total FROM (\n{body}\n) AS _bounded",
+                            params,
+                        )
+                        rows_total = cursor.fetchone()["rows_total"]
+                    if not commit:
+                        cursor.execute("RELEASE SAVEPOINT bounded_read")
+                except psycopg2.ProgrammingError:
+                    # Not every read statement can be used as a subquery; run it as is.
+                    if commit:
+                        conn.rollback()
+                    else:
+                        cursor.execute("ROLLBACK TO SAVEPOINT bounded_read")
+                    rows = None
+                    prepared = False
+            if rows is None:
+                prepared = commit and not params and _execute_prepared(
+                    conn, cursor, shape, lambda sql: sql
+                )
+                if not prepared:
+                    cursor.execute(query, params)
+                changed = written_tables(query)
+                if not cursor.description:
+                    rowcount = cursor.rowcount
+                    _notify_table_changes(cursor, changed)
+                    if commit:
+                        conn.commit()
+                    return {"status": "success", "rows_affected": rowcount}
+                rows = cursor.fetchmany(limits.max_rows + 1)
+                rows_total = cursor.rowcount
+                _notify_table_changes(cursor, changed)
+                if commit:
+                    conn.commit()
+    finally:
+        elapsed = time.perf_counter() - started
+        query_stats.record(shape.text, elapsed, prepared)
+        query_log.record(shape.text, elapsed, prepared)
+
+    kept, cells_truncated, rows_dropped = apply_result_budget(rows, limits)
+    return {
+        "rows": kept,
+        "rows_returned": len(kept),
+        "rows_total": rows_total,
+        "truncated": rows_dropped or cells_truncated > 0,
+        "cells_truncated": cells_truncated,
+    }
+
+
+# --- Query Result Cache ---
+TABLE_CHANGES_CHANNEL = "tnt_mart_table_changes"
+ALL_TABLES = "*"
+# Tables kept up to date by triggers (resources/scripts/migrations), by the tables they
+# are derived from. A write to a base table changes its derived tables too, without
+# naming them, so invalidating the base table must also drop results read from these.
+DERIVED_TABLES = {
+    "orders": frozenset({"order_summary"}),
+    "order_item": frozenset({"order_summary"}),
+    "payment": frozenset({"order_summary"}),
+    "product": frozenset({"order_summary"}),
+    "warehouse_product": frozenset({"product_locality"}),
+    "warehouse": frozenset({"product_locality"}),
+    "address": frozenset({"product_locality"}),
+}
+
+_CLAUSE_KEYWORDS = (
+    "where|join|on|using|group|order|limit|having|union|intersect|except|left|right|"
+    "inner|full|cross|natural|offset|fetch|for|window"
+)
+_READ_TABLES = re.compile(
+    rf"\b(?:from|join)\s+([^()]+?)(?=\b(?:{_CLAUSE_KEYWORDS})\b|\)|$)", re.IGNORECASE
+)
+_WRITTEN_TABLE = re.compile(
+    r"^\s*(?:with\b.*?\)\s*)?(?:insert\s+into|update|delete\s+from|merge\s+into|truncate(?:\s+table)?)\s+(?:only\s+)?([\w.\"]+)",
+    re.IGNORECASE | re.DOTALL,
+)
+_DDL = re.compile(r"^\s*(?:alter|drop|create|comment|grant|revoke|vacuum|cluster|reindex|refresh)\b", re.IGNORECASE)
+_VOLATILE = re.compile(
+    r"\b(?:now|random|clock_timestamp|statement_timestamp|timeofday|nextval|currval|"
+    r"current_date|current_time|current_timestamp|localtime|localtimestamp|gen_random_uuid)\b"
+    r"|\bfor\s+(?:update|share|no\s+key\s+update|key\s+share)\b",
+    re.IGNORECASE,
+)
+
+
+_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+
+
+def _table_name(token: str) -> str:
+    """Returns the unqualified, unquoted table name of `schema.table` or `"Table"`."""
+    return token.split(".")[-1].strip('"').lower()
+
+
+def normalize_sql(query: str) -> str:
+    """
+    Normalizes a statement for use as a cache key.
+
+    Comments are dropped, whitespace is collapsed, keywords and identifiers are
+    lower-cased and trailing semicolons removed; quoted literals and quoted
+    identifiers are left untouched.
+    """
+    parts = _QUOTED.split(_strip_sql(query))
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r"\s+", " ", parts[i]).lower()
+    return "".join(parts).strip()
+
+
+def read_tables(query: str) -> frozenset[str]:
+    """Returns the tables a read-only statement selects from, as far as they can be parsed."""
+    body = re.sub(r"'(?:[^']|'')*'", "''", _strip_sql(query))
+    tables = set()
+    for match in _READ_TABLES.finditer(body):
+        for item in match.group(1).split(","):
+            words = item.split()
+            if words and re.fullmatch(r'[\w."]+', words[0]):
+                tables.add(_table_name(words[0]))
+    return frozenset(tables)
+
+
+def written_tables(query: str) -> frozenset[str]:
+    """
+    Returns the tables a statement modifies.
+
+    DDL and other statements whose effect cannot be pinned to one table return
+    `ALL_TABLES`; plain reads return an empty set.
+    """
+    body = _strip_sql(query)
+    if _DDL.match(body):
+        return frozenset({ALL_TABLES})
+    match = _WRITTEN_TABLE.match(body)
+    if match:
+        return frozenset({_table_name(match.group(1))})
+    return frozenset() if is_read_query(query) else frozenset({ALL_TABLES})
+
+
+@dataclass
+class CacheMetrics:
+    """Counters describing how the query result cache has been used."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+
+class QueryCache:
+    """
+    A thread-safe LRU cache of SELECT results with a time-to-live.
+
+    Entries are keyed on the normalized SQL, the parameters and the result limits,
+    and remember which tables they were read from. A write to any of those tables
+    (through `execute_query`, or announced by other processes on the
+    `TABLE_CHANGES_CHANNEL` notification channel) drops the entry. The TTL bounds
+    staleness for changes that are not announced, e.g. writes to tables behind a view.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.metrics = CacheMetrics()
+        self._entries: OrderedDict[str, tuple[dict, frozenset[str], float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    @staticmethod
+    def key(query: str, params: dict | None, limits: ResultLimits) -> str:
+        return json.dumps(
+            [normalize_sql(query), params, asdict(limits)], sort_keys=True, default=str
+        )
+
+    @staticmethod
+    def cacheable(query: str) -> frozenset[str]:
+        """Returns the tables `query` reads, or an empty set if it must not be cached."""
+        if not is_read_query(query) or _VOLATILE.search(query):
+            return frozenset()
+        return read_tables(query)
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.metrics.misses += 1
+                return None
+            if entry[2] < time.monotonic():
+                del self._entries[key]
+                self.metrics.expirations += 1
+                self.metrics.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.metrics.hits += 1
+            return entry[0]
+
+    def put(self, key: str, result: dict, tables: frozenset[str]) -> None:
+        with self._lock:
+            self._entries[key] = (result, tables, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.metrics.evictions += 1
+
+    def invalidate(self, tables: frozenset[str] | set[str]) -> int:
+        """
+        Drops every entry that read from one of `tables` or from a table derived from
+        them (all entries for `ALL_TABLES`).
+        """
+        tables = frozenset(tables).union(*(DERIVED_TABLES.get(t, ()) for t in tables))
+        with self._lock:
+            if ALL_TABLES in tables:
+                stale = list(self._entries)
+            else:
+                stale = [k for k, (_, read, _) in self._entries.items() if read & tables]
+            for k in stale:
+                del self._entries[k]
+            self.metrics.invalidations += len(stale)
+        if stale:
+            logger.info(f"Invalidated {len(stale)} cached result(s) for {sorted(tables)}.")
+        return len(stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            metrics = asdict(self.metrics)
+            size = len(self._entries)
+        lookups = metrics["hits"] + metrics["misses"]
+        return {
+            "size": size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hit_ratio": round(metrics["hits"] / lookups, 3) if lookups else 0.0,
+            **metrics,
+        }
+
+
+class TableChangeListener(threading.Thread):
+    """
+    Listens for table-change notifications and invalidates the query cache.
+
+    Writers (this server, `TnTMartTools` and `TnTMartPlugin`) send the name of every
+    table they modify with `pg_notify` inside the writing transaction, so the
+    notification is delivered only once the change is committed.
+    """
+
+    def __init__(self, connect, cache: QueryCache):
+        super().__init__(name="pgsql-table-changes", daemon=True)
+        self._connect = connect
+        self._cache = cache
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                conn = self._connect()
+            except psycopg2.Error as e:
+                logger.warning(f"⚠️ Cache invalidation listener cannot connect: {e}")
+                self._stop_event.wait(5)
+                continue
+            try:
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {TABLE_CHANGES_CHANNEL}")
+                # Anything may have changed while we were not listening.
+                self._cache.invalidate({ALL_TABLES})
+                while not self._stop_event.is_set():
+                    if select.select([conn], [], [], 1.0)[0]:
+                        conn.poll()
+                        tables = {n.payload.lower() for n in conn.notifies}
+                        conn.notifies.clear()
+                        if tables:
+                            self._cache.invalidate(tables)
+            except psycopg2.Error as e:
+                logger.warning(f"⚠️ Cache invalidation listener lost its connection: {e}")
+            finally:
+                conn.close()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+def _notify_table_changes(cursor, tables: frozenset[str]) -> None:
+    """Announces writes to `tables` to every cache; delivered when the transaction commits."""
+    for table in tables:
+        cursor.execute("SELECT pg_notify(%s, %s)", (TABLE_CHANGES_CHANNEL, table))
+
+
+# --- Query Shapes and Prepared Statements ---
+class PooledConnection(psycopg2.extensions.connection):
+    """A psycopg2 connection that remembers the statements prepared on it."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared: dict[str, str] = {}
+
+
+@dataclass
+class QueryShape:
+    """A statement with its literals replaced by `$n` placeholders."""
+
+    text: str
+    literals: list[str]
+    preparable: bool
+
+
+_LITERAL = re.compile(r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|(?<![\w.$])\d+(?:\.\d+)?(?![\w.])""")
+# A placeholder only gets a type from its context: a comparison, LIKE, LIMIT/OFFSET or
+# BETWEEN, an IN list, the VALUES of an INSERT or a cast. Anywhere else (the select
+# list, CASE results, function arguments) PREPARE would type it as text.
+_TYPED_CONTEXT = re.compile(r"(?:[=<>]|\b(?:i?like|limit|offset|between)|\bbetween\s+\S+\s+and)\s*$")
+_IN_LIST = re.compile(r"\bin\s*\([^()]*\)")
+_PARENTHESIZED = re.compile(r"\([^()]*\)")
+_INSERT_VALUES = re.compile(r"\s*insert\b.*?\bvalues\b")
+# ORDER BY 1 / GROUP BY 1 refer to output columns; a placeholder would change that.
+_POSITIONAL_REFERENCE = re.compile(r"\b(?:order|group)\s+by\s+(?:[^;()]*?,\s*)?\d+\b")
+# Typed literals (date '...', interval '...'), escape strings and dollar quoting.
+_UNBINDABLE_LITERAL = re.compile(
+    r"\b(?:date|time|timestamp|timestamptz|interval|int\w*|bigint|smallint|numeric|decimal"
+    r"|real|float\w*|text|varchar|char|bool\w*|jsonb?|uuid|bytea)\s+'|\be'|\$\w*\$"
+)
+
+
+def fingerprint_sql(query: str) -> QueryShape:
+    """
+    Reduces a statement to its shape.
+
+    The normalized statement has its string and numeric literals replaced by `$n`
+    placeholders, so `... where customer_id = 4` and `... where customer_id = 7`
+    share one shape. The literals are kept so that the shape can be executed as a
+    prepared statement with the literals bound as parameters. Only literals whose
+    context gives them a type are replaced: `select 0 as discount` keeps its `0`,
+    which would otherwise come back as the text "0" once the shape is prepared.
+    """
+    normalized = normalize_sql(query)
+    preparable = not (
+        _POSITIONAL_REFERENCE.search(normalized)
+        or _UNBINDABLE_LITERAL.search(normalized)
+    )
+    # The same text with quoted contents blanked out, to look for context in.
+    masked = _QUOTED.sub(lambda m: m.group(0)[0] + " " * (len(m.group(0)) - 2) + m.group(0)[-1], normalized)
+    lists = [m.span() for m in _IN_LIST.finditer(masked)]
+    values = _INSERT_VALUES.match(masked)
+    if values:
+        lists += [m.span() for m in _PARENTHESIZED.finditer(masked, values.end())]
+
+    literals: list[str] = []
+    parts: list[str] = []
+    end = 0
+    for match in _LITERAL.finditer(normalized):
+        start, stop = match.span()
+        token = match.group(0)
+        typed = (
+            _TYPED_CONTEXT.search(masked, max(0, start - 64), start)
+            or masked.startswith("::", stop)
+            or any(first < start and stop < last for first, last in lists)
+        )
+        if token.startswith('"') or not typed:
+            continue
+        literals.append(token[1:-1].replace("''", "'") if token.startswith("'") else token)
+        parts += [normalized[end:start], f"${len(literals)}"]
+        end = stop
+    parts.append(normalized[end:])
+    return QueryShape("".join(parts), literals, preparable)
+
+
+@dataclass
+class ShapeStats:
+    """Execution counters for one query shape."""
+
+    calls: int = 0
+    prepared_calls: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    preparable: bool = True
+
+
+class QueryStats:
+    """
+    Thread-safe execution statistics per query shape.
+
+    Also decides which shapes are hot enough to be prepared: a shape is prepared
+    once it has been executed `prepare_threshold` times, unless preparing it failed
+    before. At most `max_shapes` shapes are tracked; the least-called shape makes
+    room for a new one.
+    """
+
+    def __init__(self, prepare_threshold: int, max_shapes: int):
+        self.prepare_threshold = prepare_threshold
+        self.max_shapes = max_shapes
+        self._shapes: dict[str, ShapeStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, shape: str, seconds: float, prepared: bool) -> None:
+        with self._lock:
+            stats = self._shapes.get(shape)
+            if stats is None:
+                if len(self._shapes) >= self.max_shapes:
+                    coldest = min(self._shapes, key=lambda k: self._shapes[k].calls)
+                    del self._shapes[coldest]
+                stats = self._shapes[shape] = ShapeStats()
+            stats.calls += 1
+            stats.prepared_calls += int(prepared)
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+
+    def should_prepare(self, shape: QueryShape) -> bool:
+        if not shape.preparable or self.prepare_threshold <= 0:
+            return False
+        with self._lock:
+            stats = self._shapes.get(shape.text)
+            return (
+                stats is not None
+                and stats.preparable
+                and stats.calls + 1 >= self.prepare_threshold
+            )
+
+    def mark_unpreparable(self, shape: str) -> None:
+        with self._lock:
+            if shape in self._shapes:
+                self._shapes[shape].preparable = False
+
+    def top(self, limit: int) -> dict:
+        """Returns the top shapes by call count and by total execution time."""
+        with self._lock:
+            rows = [
+                {
+                    "shape": shape,
+                    "calls": s.calls,
+                    "prepared_calls": s.prepared_calls,
+                    "total_ms": round(1000 * s.total_seconds, 3),
+                    "avg_ms": round(1000 * s.total_seconds / s.calls, 3),
+                    "max_ms": round(1000 * s.max_seconds, 3),
+                }
+                for shape, s in self._shapes.items()
+            ]
+        return {
+            "shapes_tracked": len(rows),
+            "by_calls": sorted(rows, key=lambda r: r["calls"], reverse=True)[:limit],
+            "by_total_time": sorted(rows, key=lambda r: r["total_ms"], reverse=True)[:limit],
+        }
+
+
+class QueryLog:
+    """
+    Appends one JSON line per executed statement to a file.
+
+    Only the shape is written, never the literals, so customer data stays out of the
+    log. Each line holds the time, shape, duration in milliseconds, whether it ran
+    prepared and the tables it touched. Logging is off when `path` is empty, and is
+    switched off (with a warning) if the file cannot be written.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def record(self, shape: str, seconds: float, prepared: bool) -> None:
+        if not self.path:
+            return
+        entry = {
+            "ts": round(time.time(), 3),
+            "shape": shape,
+            "ms": round(1000 * seconds, 3),
+            "prepared": prepared,
+            "tables": sorted(read_tables(shape) | written_tables(shape)),
+        }
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            try:
+                if self._file is None:
+                    self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+                self._file.write(line)
+            except OSError as e:
+                logger.warning(f"⚠️ Query log {self.path} disabled: {e}")
+                self.path = ""
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _execute_prepared(conn, cursor, shape: QueryShape, wrap) -> bool:
+    """
+    Runs `wrap(shape.text)` as a prepared statement on `conn` if the shape is hot.
+
+    The statement is prepared once per pooled connection and executed with the
+    shape's literals bound as parameters. Shapes that cannot be prepared (or whose
+    literals do not bind) are remembered and run as plain SQL from then on. If
+    EXECUTE fails otherwise, e.g. with "cached plan must not change result type"
+    after a schema change, the statement is deallocated so that the next call
+    prepares it afresh, and this call runs as plain SQL. Must only be called at the
+    start of a transaction, as a failed PREPARE or EXECUTE rolls it back.
+
+    Returns:
+        True if the statement was executed, False if the caller should run it as is.
+    """
+    if not isinstance(conn, PooledConnection) or not query_stats.should_prepare(shape):
+        return False
+    text = wrap(shape.text)
+    name = conn.prepared.get(text)
+    if name is None:
+        if len(conn.prepared) >= settings.max_prepared_per_connection:
+            return False
+        name = "mcp_" + hashlib.sha1(text.encode()).hexdigest()[:16]
+        try:
+            cursor.execute(f"PREPARE {name} AS {text}")
+        except psycopg2.Error as e:
+            conn.rollback()
+            query_stats.mark_unpreparable(shape.text)
+            logger.info(f"Query shape cannot be prepared, running it as plain SQL: {e}")
+            return False
+        conn.prepared[text] = name
+        logger.info(f"Prepared statement {name} for query shape: {shape.text}")
+    placeholders = ", ".join(["%s"] * len(shape.literals))
+    try:
+        cursor.execute(
+            f"EXECUTE {name} ({placeholders})" if shape.literals else f"EXECUTE {name}",
+            shape.literals or None,
+        )
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        # Cancelled, or the connection is gone: running the statement again would not help.
+        raise
+    except psycopg2.Error as e:
+        conn.rollback()
+        if isinstance(e, psycopg2.DataError):
+            query_stats.mark_unpreparable(shape.text)
+        try:
+            cursor.execute(f"DEALLOCATE {name}")
+        except psycopg2.Error:
+            pass
+        conn.rollback()
+        conn.prepared.pop(text, None)
+        logger.info(f"Prepared statement {name} failed, running it as plain SQL: {e}")
+        return False
+    return True
+
+
+# --- Statement Runners ---
+class BatchStatement(BaseModel):
+    """One statement of an `execute_batch` call."""
+
+    query: str = Field(description="The SQL statement to execute.")
+    params: dict | None = Field(
+        default=None, description="Optional parameters to pass to the statement."
+    )
+
+
+async def run_query(
+    query: str, params: dict | None, limits: ResultLimits
+) -> tuple[dict, bool]:
+    """
+    Runs one statement on its own pooled connection, going through the result cache.
+
+    Returns:
+        The result dict and whether it was served from the cache.
+    """
+    cache_key = None
+    tables = QueryCache.cacheable(query) if query_cache.enabled else frozenset()
+    if tables:
+        cache_key = QueryCache.key(query, params, limits)
+        result = query_cache.get(cache_key)
+        if result is not None:
+            return result, True
+
+    # The pool rolls back any open transaction when the connection is released.
+    result = await run_on_pool(_execute_statement, query, params, limits)
+
+    if cache_key is not None and "rows" in result:
+        query_cache.put(cache_key, result, tables)
+    elif "rows_affected" in result or not is_read_query(query):
+        # Do not wait for the notification round trip to drop our own entries.
+        query_cache.invalidate(written_tables(query))
+    return result, False
+
+
+def _execute_batch_atomic(
+    conn: psycopg2.extensions.connection,
+    statements: list[BatchStatement],
+    limits: ResultLimits,
+) -> tuple[list[dict], bool]:
+    """
+    Executes `statements` in order inside a single transaction on `conn`.
+
+    The transaction is committed only if every statement succeeds. After the first
+    failure it is rolled back, the failing statement reports its error and the
+    remaining statements are reported as skipped.
+
+    Returns:
+        One result per statement and whether the transaction was committed.
+    """
+    results = []
+    for index, statement in enumerate(statements):
+        try:
+            results.append(
+                _execute_statement(conn, statement.query, statement.params, limits, commit=False)
+            )
+        except psycopg2.Error as e:
+            conn.rollback()
+            results.append({"error": str(e)})
+            results.extend(
+                {"error": "Skipped: an earlier statement in the transaction failed."}
+                for _ in statements[index + 1 :]
+            )
+            return results, False
+    conn.commit()
+    return results, True
+
+
+# --- Paged Result Cursors ---
+class UnknownCursorError(Exception):
+    """Raised when a continuation token does not refer to an open cursor."""
+
+
+@dataclass
+class OpenCursor:
+    """A server-side cursor kept open between `execute_query` calls."""
+
+    token: str
+    conn: psycopg2.extensions.connection
+    cursor: psycopg2.extensions.cursor
+    page_size: int
+    rows_estimate: int | None
+    rows_fetched: int = 0
+    last_used: float = 0.0
+
+
+class CursorRegistry:
+    """
+    Keeps track of the open server-side cursors behind continuation tokens.
+
+    Each open cursor pins one pooled connection (the cursor lives inside that
+    connection's transaction), so the number of open cursors is capped and cursors
+    left idle for longer than `idle_timeout` are closed lazily on the next call. A
+    cursor is removed from the registry while a page is being fetched, which keeps
+    two concurrent calls from reading the same cursor.
+    """
+
+    def __init__(self, max_open: int, idle_timeout: float):
+        self.max_open = max_open
+        self.idle_timeout = idle_timeout
+        self._cursors: dict[str, OpenCursor] = {}
+        self._lock = threading.Lock()
+
+    def add(self, entry: OpenCursor) -> list[OpenCursor]:
+        """Registers a cursor and returns the ones evicted to stay within `max_open`."""
+        entry.last_used = time.monotonic()
+        with self._lock:
+            self._cursors[entry.token] = entry
+            evicted = []
+            while len(self._cursors) > self.max_open:
+                oldest = min(self._cursors.values(), key=lambda c: c.last_used)
+                evicted.append(self._cursors.pop(oldest.token))
+        return evicted
+
+    def take(self, token: str) -> OpenCursor | None:
+        with self._lock:
+            return self._cursors.pop(token, None)
+
+    def expired(self) -> list[OpenCursor]:
+        now = time.monotonic()
+        with self._lock:
+            tokens = [
+                t for t, c in self._cursors.items() if now - c.last_used > self.idle_timeout
+            ]
+            return [self._cursors.pop(t) for t in tokens]
+
+    def drain(self) -> list[OpenCursor]:
+        with self._lock:
+            entries = list(self._cursors.values())
+            self._cursors.clear()
+        return entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._cursors)
+
+
+def _close_cursor(entry: OpenCursor) -> None:
+    """Closes a server-side cursor and returns its connection to the pool."""
+    try:
+        entry.cursor.close()
+    except psycopg2.Error:
+        pass
+    db_pool.release(entry.conn)
+
+
+def _estimate_rows(
+    conn: psycopg2.extensions.connection, query: str, params: dict | None
+) -> int | None:
+    """Returns the planner's row estimate for `query`, or None if it cannot be planned."""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except (psycopg2.Error, KeyError, IndexError, TypeError, ValueError):
+        conn.rollback()
+        return None
+
+
+def _read_page(entry: OpenCursor) -> tuple[list, str | None]:
+    """
+    Fetches the next page from `entry`.
+
+    Returns the rows and the continuation token, or None as the token once the
+    cursor is exhausted, in which case the cursor has already been closed.
+    """
+    try:
+        rows = entry.cursor.fetchmany(entry.page_size)
+    except BaseException:
+        _close_cursor(entry)
+        raise
+    entry.rows_fetched += len(rows)
+    if len(rows) < entry.page_size:
+        _close_cursor(entry)
+        return rows, None
+    for evicted in open_cursors.add(entry):
+        _close_cursor(evicted)
+    return rows, entry.token
+
+
+def _page_result(
+    entry: OpenCursor, rows: list, token: str | None, limits: ResultLimits
+) -> dict:
+    trimmed = [truncate_cells(row, limits.max_cell_length) for row in rows]
+    cells_truncated = sum(shortened for _, shortened in trimmed)
+    return {
+        "rows": [row for row, _ in trimmed],
+        "rows_returned": len(rows),
+        "cells_truncated": cells_truncated,
+        "rows_fetched_total": entry.rows_fetched,
+        "rows_estimate": entry.rows_estimate,
+        "cursor_token": token,
+        "has_more": token is not None,
+    }
+
+
+async def open_paged_query(
+    query: str, params: dict | None, page_size: int, limits: ResultLimits
+) -> dict:
+    """Declares a server-side cursor for `query` and returns its first page."""
+    handle = QueryHandle()
+
+    def work():
+        conn = db_pool.acquire()
+        try:
+            handle.bind(conn)
+            rows_estimate = _estimate_rows(conn, query, params)
+            token = uuid.uuid4().hex
+            cursor = conn.cursor(name=f"mcp_{token}", cursor_factory=RealDictCursor)
+            cursor.itersize = page_size
+            cursor.execute(query, params)
+        except BaseException as e:
+            handle.unbind()
+            db_pool.release(
+                conn, discard=isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+            )
+            raise
+        entry = OpenCursor(token, conn, cursor, page_size, rows_estimate)
+        try:
+            rows, token = _read_page(entry)
+        finally:
+            handle.unbind()
+        return _page_result(entry, rows, token, limits)
+
+    return await run_cancellable(work, handle)
+
+
+async def fetch_next_page(
+    cursor_token: str, page_size: int | None, limits: ResultLimits
+) -> dict:
+    """Returns the next page of an open cursor, closing it once it is exhausted."""
+    entry = open_cursors.take(cursor_token)
+    if entry is None:
+        raise UnknownCursorError(f"Unknown or expired cursor_token: {cursor_token}")
+    if page_size:
+        entry.page_size = page_size
+    handle = QueryHandle()
+
+    def work():
+        handle.bind(entry.conn)
+        try:
+            rows, token = _read_page(entry)
+        finally:
+            handle.unbind()
+        return _page_result(entry, rows, token, limits)
+
+    return await run_cancellable(work, handle)
+
+
+async def reap_idle_cursors() -> None:
+    """Closes cursors that have not been read from within the idle timeout."""
+    expired = open_cursors.expired()
+    if expired:
+        logger.info(f"Closing {len(expired)} idle cursor(s).")
+        loop = asyncio.get_running_loop()
+        for entry in expired:
+            await loop.run_in_executor(db_executor, _close_cursor, entry)
+
+
 # --- Global Variables ---
 settings = Settings()
 logger = setup_logging(settings.log_level)
-mcp = FastMCP("PGSQLMCPServer")
-db_conn: psycopg2.extensions.connection | None = None
+mcp = FastMCP("PGSQLMCPServer", host=settings.mcp_host, port=settings.mcp_port)
+db_pool: ConnectionPool | None = None
+open_cursors = CursorRegistry(
+    max_open=settings.max_open_cursors, idle_timeout=settings.cursor_idle_timeout
+)
+query_stats = QueryStats(
+    prepare_threshold=settings.prepare_threshold, max_shapes=settings.query_stats_max_shapes
+)
+query_log = QueryLog(settings.query_log_path)
+query_cache = QueryCache(max_entries=settings.cache_max_entries, ttl=settings.cache_ttl)
+table_change_listener: TableChangeListener | None = None
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.pool_max_size, thread_name_prefix="pgsql-query"
+)
 
 
 # --- MCP Server Lifecycle Events ---
+def _new_connection() -> psycopg2.extensions.connection:
+    """Opens a new database connection using the configured settings."""
+    return psycopg2.connect(
+        dbname=settings.db_name,
+        user=settings.db_user,
+        password=settings.db_password,
+        host=settings.db_host,
+        port=settings.db_port,
+        options=f"-c statement_timeout={settings.statement_timeout_ms}",
+        connection_factory=PooledConnection,
+    )
+
+
 def connect_db(ctx: Context | None = None):
     """
-    Establishes the database connection on server startup.
-    This function is called once when the MCP server starts. It initializes the
-    database connection using the settings provided. If the connection fails, it logs
-    a critical error and exits, signaling the failure to the parent process.
+    Creates the database connection pool on server startup.
+    This function is called once when the MCP server starts. It opens the pool's
+    minimum number of connections using the settings provided. If the connections
+    cannot be established, it logs a critical error and exits, signaling the failure
+    to the parent process.
     """
-    global db_conn
+    global db_pool, table_change_listener
     try:
-        logger.info("Attempting to create database connection...")
-        db_conn = psycopg2.connect(
-            dbname=settings.db_name,
-            user=settings.db_user,
-            password=settings.db_password,
-            host=settings.db_host,
-            port=settings.db_port,
+        logger.info("Attempting to create database connection pool...")
+        db_pool = ConnectionPool(
+            _new_connection,
+            min_size=settings.pool_min_size,
+            max_size=settings.pool_max_size,
+            acquire_timeout=settings.pool_acquire_timeout,
+            max_idle=settings.pool_max_idle,
+            health_check_interval=settings.pool_health_check_interval,
         )
-        logger.info("✅ Database connection established successfully.")
-        
+        db_pool.open()
+        logger.info(
+            f"✅ Database connection pool established "
+            f"(min={settings.pool_min_size}, max={settings.pool_max_size})."
+        )
+        if query_cache.enabled:
+            table_change_listener = TableChangeListener(_new_connection, query_cache)
+            table_change_listener.start()
+
     except psycopg2.Error as e:
         logger.critical(f"❌ Failed to establish database connection: {e}")
         sys.exit(1)
@@ -114,92 +1511,332 @@ def connect_db(ctx: Context | None = None):
 
 def close_db_connection(ctx: Context):
     """
-    Closes the database connection on server shutdown.
+    Closes the database connection pool on server shutdown.
     This function is called when the MCP server is shutting down. It ensures that
-    the database connection is closed gracefully.
+    all pooled connections are closed gracefully.
     """
-    global db_conn
-    if db_conn:
-        db_conn.close()
-        logger.info("✅ Database connection closed.")
+    global db_pool
+    if table_change_listener:
+        table_change_listener.stop()
+    query_log.close()
+    if db_pool:
+        for entry in open_cursors.drain():
+            _close_cursor(entry)
+        db_pool.close()
+        db_executor.shutdown(wait=False, cancel_futures=True)
+        logger.info("✅ Database connection pool closed.")
     else:
-        logger.warning("⚠️ No database connection to close.")
-        
+        logger.warning("⚠️ No database connection pool to close.")
 
 
 # --- MCP Tools ---
 @mcp.tool()
-async def execute_query(query: str, ctx: Context, params: dict | None = None) -> str:
+async def execute_query(
+    query: str,
+    ctx: Context,
+    params: dict | None = None,
+    page_size: int | None = None,
+    cursor_token: str | None = None,
+    max_rows: int | None = None,
+    max_bytes: int | None = None,
+    max_cell_length: int | None = None,
+) -> str:
     """
     Executes a SQL query and returns the result as a JSON string.
 
-    This tool is the primary interface for interacting with the database. It uses
-    the global database connection to execute the given query and returns the result.
+    This tool is the primary interface for interacting with the database. It borrows
+    a connection from the pool for the duration of the call and runs the statement
+    on a worker thread, so other requests keep being served while it executes. If
+    the request is cancelled, the statement is cancelled on the server as well.
     It handles different types of queries:
-    - For SELECT queries, it returns a JSON array of objects.
+    - For SELECT queries, it returns a JSON object with the `rows` as an array of
+      objects, plus `rows_returned`, `rows_total` and `truncated`. Results are kept
+      within a row, byte and cell-length budget; when a result does not fit,
+      `truncated` is true and `rows_total` tells how many rows the query matched.
     - For INSERT/UPDATE/DELETE queries, it commits the transaction and returns a
       success message with the number of affected rows.
     - In case of an error, it rolls back the transaction and returns a JSON object
       with an error message.
 
+    SELECT results are cached in memory and served from the cache until a write to
+    one of the tables they read from is seen, or their time-to-live expires.
+
+    Large SELECTs can be read page by page: pass `page_size` to open a server-side
+    cursor and receive the first page, then pass the returned `cursor_token` (the
+    query is ignored) to read the following pages. Paged results are returned as a
+    JSON object with `rows`, `rows_returned`, `rows_fetched_total`, `rows_estimate`,
+    `cursor_token` and `has_more`. The cursor is closed once the last page has been
+    read, or earlier with the `close_cursor` tool. Long cells are shortened in
+    paged mode as well.
+
     Args:
         query: The SQL query to execute.
         ctx: The MCP context, used for logging.
         params: An optional dictionary of parameters to pass to the query.
+        page_size: Optional number of rows per page; enables paged mode for SELECTs.
+        cursor_token: Continuation token returned by a previous paged call.
+        max_rows: Optional lower row limit for this call.
+        max_bytes: Optional lower limit on the serialized size of the rows.
+        max_cell_length: Optional lower limit on the length of a text cell.
 
     Returns:
         A JSON string representing the result of the query.
     """
-    if not db_conn:
+    if not db_pool:
         logger.error("Database connection is not available.")
         return json.dumps({"error": "Database connection is not available."})
 
+    if page_size is not None:
+        page_size = max(1, min(page_size, settings.max_page_size))
+    limits = ResultLimits.resolve(max_rows, max_bytes, max_cell_length)
+
     try:
-        with db_conn.cursor(cursor_factory=RealDictCursor) as cursor:
-            logger.info(f"Executing query: {query} with params: {params}")
-            await ctx.info(f"Executing query: {query} with params: {params}")
+        await reap_idle_cursors()
 
-            cursor.execute(query, params)
+        if cursor_token:
+            logger.info(f"Fetching next page for cursor {cursor_token}")
+            page = await fetch_next_page(cursor_token, page_size, limits)
+            return await _page_response(page, ctx)
 
-            if cursor.description:
-                res = cursor.fetchall()
-                res_json = json.dumps(res, default=str)
-                logger.info(f"Query result: {res_json}")
-                await ctx.info(f"Query result: {res_json}")
-                return res_json
-            else:
-                db_conn.commit()
-                logger.info(
-                    f"Query executed successfully. {cursor.rowcount} rows affected."
-                )
-                await ctx.info(
-                    f"Query executed successfully. {cursor.rowcount} rows affected."
-                )
-                return json.dumps(
-                    {"status": "success", "rows_affected": cursor.rowcount}
-                )
+        logger.info(f"Executing query: {query} with params: {params}")
+        await ctx.info(f"Executing query: {query} with params: {params}")
+
+        if page_size:
+            page = await open_paged_query(query, params, page_size, limits)
+            return await _page_response(page, ctx)
 
+        result, cached = await run_query(query, params, limits)
+
+        if cached:
+            res_json = json.dumps(result, default=str)
+            await _log_result(ctx, f"Cache hit: {result['rows_returned']} rows", res_json)
+            return res_json
+        if "rows" in result:
+            res_json = json.dumps(result, default=str)
+            await _log_result(
+                ctx,
+                f"Query returned {result['rows_returned']} of {result['rows_total']} rows"
+                f"{', truncated' if result['truncated'] else ''}",
+                res_json,
+            )
+            return res_json
+        else:
+            rowcount = result["rows_affected"]
+            logger.info(f"Query executed successfully. {rowcount} rows affected.")
+            await ctx.info(f"Query executed successfully. {rowcount} rows affected.")
+            return json.dumps(result)
+
+    except UnknownCursorError as e:
+        logger.warning(f"⚠️ {e}")
+        await ctx.error(f"⚠️ {e}")
+        return json.dumps({"error": str(e)})
+    except PoolTimeoutError as e:
+        logger.error(f"❌ Connection pool exhausted: {e}")
+        await ctx.error(f"❌ Connection pool exhausted: {e}")
+        return json.dumps({"error": str(e)})
     except psycopg2.Error as e:
         logger.error(f"❌ Query execution error: {e}")
         await ctx.error(f"❌ Query execution error: {e}")
-        if db_conn:
-            db_conn.rollback()
         return json.dumps({"error": str(e)})
     except Exception as e:
         logger.error(f"❌ An unexpected error occurred: {e}")
         await ctx.error(f"❌ An unexpected error occurred: {e}")
-        if db_conn:
-            db_conn.rollback()
         return json.dumps({"error": f"An unexpected error occurred: {e}"})
 
 
+async def _log_result(ctx: Context, summary: str, res_json: str) -> None:
+    """
+    Logs a one-line summary of a result; the full payload only goes to the debug log.
+    """
+    summary = f"{summary} ({len(res_json)} bytes)."
+    logger.info(summary)
+    logger.debug(f"Query result: {res_json}")
+    await ctx.info(summary)
+
+
+async def _page_response(page: dict, ctx: Context) -> str:
+    res_json = json.dumps(page, default=str)
+    await _log_result(
+        ctx,
+        f"Page returned {page['rows_returned']} rows, "
+        f"{page['rows_fetched_total']} so far, has_more={page['has_more']}",
+        res_json,
+    )
+    return res_json
+
+
+@mcp.tool()
+async def execute_batch(
+    statements: list[BatchStatement],
+    ctx: Context,
+    atomic: bool = True,
+    max_rows: int | None = None,
+    max_bytes: int | None = None,
+    max_cell_length: int | None = None,
+) -> str:
+    """
+    Executes several SQL statements in one call and returns their results as a JSON string.
+
+    Use this tool to run a multi-step lookup (for example orders, then their items,
+    then the warehouses stocking those items) in a single round trip.
+    - With `atomic` set to true (the default), the statements run in order inside a
+      single transaction that is committed only if all of them succeed; after the
+      first failure the transaction is rolled back and the remaining statements are
+      skipped.
+    - With `atomic` set to false, every statement runs on its own (concurrently,
+      with its own commit, and SELECTs may be served from the cache), so one
+      failing statement does not affect the others.
+
+    Each statement's result has the same shape as an `execute_query` result. The
+    byte budget is shared by all statements of the batch, in order: a statement can
+    use what the ones before it left, and once it is spent later statements still
+    run but return no rows (with `truncated` set).
+
+    Args:
+        statements: The ordered list of statements, each with a `query` and optional `params`.
+        ctx: The MCP context, used for logging.
+        atomic: Whether to run all statements in a single transaction.
+        max_rows: Optional lower row limit for each statement.
+        max_bytes: Optional lower limit on the serialized size of the whole batch.
+        max_cell_length: Optional lower limit on the length of a text cell.
+
+    Returns:
+        A JSON string with `atomic`, `committed` (atomic mode only) and `results`,
+        one entry per statement in the order given.
+    """
+    if not db_pool:
+        logger.error("Database connection is not available.")
+        return json.dumps({"error": "Database connection is not available."})
+    if not statements:
+        return json.dumps({"atomic": atomic, "results": []})
+    if len(statements) > settings.batch_max_statements:
+        return json.dumps(
+            {"error": f"A batch may contain at most {settings.batch_max_statements} statements."}
+        )
+
+    limits = ResultLimits.resolve(max_rows, max_bytes, max_cell_length)
+
+    logger.info(f"Executing batch of {len(statements)} statements (atomic={atomic}).")
+    await ctx.info(f"Executing batch of {len(statements)} statements (atomic={atomic}).")
+
+    try:
+        if atomic:
+            results, committed = await run_on_pool(_execute_batch_atomic, statements, limits)
+            if committed:
+                query_cache.invalidate(
+                    frozenset().union(*(written_tables(s.query) for s in statements))
+                )
+            response = {
+                "atomic": True,
+                "committed": committed,
+                "results": share_byte_budget(results, limits.max_bytes),
+            }
+        else:
+
+            async def run_one(statement: BatchStatement) -> dict:
+                try:
+                    result, _ = await run_query(statement.query, statement.params, limits)
+                    return result
+                except (PoolTimeoutError, psycopg2.Error) as e:
+                    return {"error": str(e)}
+
+            results = await asyncio.gather(*(run_one(s) for s in statements))
+            response = {"atomic": False, "results": share_byte_budget(results, limits.max_bytes)}
+
+        res_json = json.dumps(response, default=str)
+        failed = sum(1 for r in response["results"] if "error" in r)
+        await _log_result(
+            ctx, f"Batch finished: {len(statements) - failed} succeeded, {failed} failed", res_json
+        )
+        return res_json
+
+    except PoolTimeoutError as e:
+        logger.error(f"❌ Connection pool exhausted: {e}")
+        await ctx.error(f"❌ Connection pool exhausted: {e}")
+        return json.dumps({"error": str(e)})
+    except Exception as e:
+        logger.error(f"❌ An unexpected error occurred: {e}")
+        await ctx.error(f"❌ An unexpected error occurred: {e}")
+        return json.dumps({"error": f"An unexpected error occurred: {e}"})
+
+
+@mcp.tool()
+async def close_cursor(cursor_token: str, ctx: Context) -> str:
+    """
+    Closes a paged cursor opened by `execute_query` before all pages were read.
+
+    Args:
+        cursor_token: The continuation token of the cursor to close.
+        ctx: The MCP context, used for logging.
+
+    Returns:
+        A JSON string with the status of the operation.
+    """
+    entry = open_cursors.take(cursor_token)
+    if entry is None:
+        return json.dumps({"error": f"Unknown or expired cursor_token: {cursor_token}"})
+    await asyncio.get_running_loop().run_in_executor(db_executor, _close_cursor, entry)
+    await ctx.info(f"Closed cursor {cursor_token}.")
+    return json.dumps({"status": "success", "rows_fetched_total": entry.rows_fetched})
+
+
+@mcp.tool()
+async def get_server_metrics(ctx: Context) -> str:
+    """
+    Returns operational metrics of the MCP server as a JSON string.
+
+    The `pool` section reports the connection pool size, utilization and the
+    time callers spent waiting to acquire a connection; `open_cursors` is the
+    number of paged cursors currently holding a connection. The `cache` section
+    reports the query result cache's size and hit, miss and eviction counters.
+
+    Args:
+        ctx: The MCP context, used for logging.
+
+    Returns:
+        A JSON string with the server metrics.
+    """
+    if not db_pool:
+        return json.dumps({"error": "Database connection is not available."})
+    return json.dumps(
+        {
+            "pool": db_pool.stats(),
+            "open_cursors": len(open_cursors),
+            "cache": query_cache.stats(),
+        }
+    )
+
+
+@mcp.tool()
+async def get_query_stats(ctx: Context, top: int = 10) -> str:
+    """
+    Returns execution statistics per query shape as a JSON string.
+
+    A query shape is a statement with its literals replaced by placeholders. The
+    result lists the `top` shapes by call count (`by_calls`) and by total execution
+    time (`by_total_time`), with how many executions used a prepared statement.
+
+    Args:
+        ctx: The MCP context, used for logging.
+        top: The number of shapes to list in each ranking.
+
+    Returns:
+        A JSON string with the query shape statistics.
+    """
+    return json.dumps(query_stats.top(max(1, top)))
+
+
 # --- Main Execution Block ---
 if __name__ == "__main__":
-    # The server is designed to be run as a subprocess by an MCP agent.
-    # Running this script directly will start the server and listen for
-    # commands over standard input/output.
+    # By default the server is run as a subprocess by an MCP agent and listens for
+    # commands over standard input/output. With MCP_TRANSPORT=streamable-http it
+    # runs as a long-lived server at http://MCP_HOST:MCP_PORT/mcp instead, shared
+    # by every agent session that sets MCP_SERVER_URL to that address.
 
     connect_db()
 
-    logger.info("Starting MCP server...")
-    mcp.run(transport="stdio")
+    logger.info(f"Starting MCP server ({settings.mcp_transport})...")
+    try:
+        mcp.run(transport=settings.mcp_transport)
+    finally:
+        close_db_connection(None)
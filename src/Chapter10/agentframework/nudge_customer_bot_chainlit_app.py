@@ -7,24 +7,16 @@ from dotenv import load_dotenv
 
 from agent_framework.azure import AzureOpenAIResponsesClient
 from agent_framework import ai_function
-from agent_framework import MCPStdioTool
 
 import chainlit as cl
-from tnt_mart_tools import TnTMartTools
+from pgsql_mcp import pgsql_tool_pool
+from tnt_mart_tools import AsyncTnTMartTools
 
 # Load environment variables from .env file
 current_dir = pathlib.Path(__file__).parent
 env_path = current_dir / ".env"
 load_dotenv(dotenv_path=env_path)
 
-# Find the correct path to the MCP server script
-mcp_server_path = current_dir / "mcp_server.py"
-if not mcp_server_path.exists():
-    mcp_server_path = current_dir.parent / "mcp_server.py"
-    if not mcp_server_path.exists():
-        raise FileNotFoundError(
-            "mcp_server.py not found in expected locations.")
-
 # create Azure OpenAI Responses client
 client = AzureOpenAIResponsesClient(
     endpoint=os.environ["AZURE_OPENAI_ENDPOINT"],
@@ -36,15 +28,11 @@ client = AzureOpenAIResponsesClient(
 @cl.on_chat_start
 async def start_chat():
     
-    TnTMartTools().create_connection()
+    await AsyncTnTMartTools.create_connection()
     
-    # Define MCP adapter for your server
-    pgsql_tool = MCPStdioTool(
-        name="PGSQLMCPServer",
-        command="python",
-        args=[str(mcp_server_path)]
-    )
-    await pgsql_tool.connect()
+    # Check a connected MCP adapter for your server out of the warm pool
+    pgsql_tool = await pgsql_tool_pool().checkout()
+    cl.user_session.set("pgsql_tool", pgsql_tool)
     
     agent = client.create_agent(
         name="TnT Mart Customer Nudge Bot",
@@ -65,16 +53,17 @@ async def start_chat():
             - Presenting Items: Clearly present the list of regular items to the Customer, including details such as product name, quantity, and price. Make sure to format the information in an easy-to-read manner and include product descriptions where possible.
             - Encouraging Purchase: Politely nudge Vikas towards making a purchase by highlighting the convenience and benefits of buying his regular items.
             - Calculating Total: If Vikas asks for the total cost, calculate the sum of the prices of all the suggested items.
-            - Adding to Cart: If Vikas agrees to buy, use the tools and first check 
+            - Adding All Regular Items: If Vikas agrees to buy all of his regular items, call add_regular_items_to_cart once with his customer_id instead of querying and comparing the tables yourself. It adds the missing items, leaves items already in the cart as they are and returns a summary of what was added and what was already there; share that summary with him. If he then wants the items already in his cart reset to his regular quantities, call it again with update_existing set to true.
+            - Adding to Cart: If Vikas agrees to buy only some of the items, use the tools and first check 
                 - if the same items are already present. 
                 - Only if they are not, add the items to his shopping_cart. 
                 - You MUST ENSURE that only the products in the customer_regular_items for this customer are added in the shopping_cart. DO NOT add random products to the cart.
-                - You will need to execute an SQL `INSERT` statement. Ensure you include the correct `customer_id`, `product_id`, `quantity`, and `unit_price` for each item. 
+                - Add all of the items with a single call to bulk_add_to_cart, passing the `customer_id` and a list of items with the correct `product_id`, `quantity`, and `unit_price` for each. Do not call add_to_cart once per item. Items already in the cart are skipped and reported back by the tool.
                 - After adding the items, you must inform the customer that they have been placed in his cart.
             - Avoid Duplicates: YOU MUST make sure that the items get added only once to the shopping cart. 
                 - Query the shopping cart before adding items. Use customer_id and product_id combination to verify if an item is already in the cart.
                 - If any of the items is already present, ask the customer if they would like to update the quantity for those items.
-                - Only if the customer agrees, update the quantity using the tools. You must fetch and pass the correct customer_id, product_id from the shopping_cart table to the tnt_mart_manager plugin. Note that the customer may provides description of the product and not the product_id or the product_code when asking a particular item to be updated. Write your SQL queries accordingly.
+                - Only if the customer agrees, update the quantity using the tools. Update all of the agreed items with a single call to bulk_update_cart rather than one call per item. You must fetch and pass the correct customer_id, product_id from the shopping_cart table to the tnt_mart_manager plugin. Note that the customer may provides description of the product and not the product_id or the product_code when asking a particular item to be updated. Write your SQL queries accordingly.
                 - Only add items that are not already present and provide a summary of what was added to the cart, what was already there and have been updated.
             - Personalization: Throughout the conversation, use the customer's name to create a more personalized experience.
             - Handling Rejection: If the customer declines the offer, politely end the conversation.
@@ -86,7 +75,15 @@ async def start_chat():
                 - Keep the customer apprised of actions you are taking, especially when adding items to the cart. Every action should be communicated clearly.
 
             """,
-        tools=[pgsql_tool, TnTMartTools.add_to_cart, TnTMartTools.remove_from_cart, TnTMartTools.update_quantity_in_cart]
+        tools=[
+            pgsql_tool,
+            AsyncTnTMartTools.add_to_cart,
+            AsyncTnTMartTools.bulk_add_to_cart,
+            AsyncTnTMartTools.remove_from_cart,
+            AsyncTnTMartTools.update_quantity_in_cart,
+            AsyncTnTMartTools.bulk_update_cart,
+            AsyncTnTMartTools.add_regular_items_to_cart,
+        ]
     )
 
     thread = agent.get_new_thread()
@@ -107,8 +104,11 @@ async def on_message(message: cl.Message):
 
 @cl.on_chat_end
 async def end_chat():
-    TnTMartTools().close_connection()
+    await AsyncTnTMartTools.close_connection()
+    pgsql_tool = cl.user_session.get("pgsql_tool")
+    if pgsql_tool:
+        await pgsql_tool_pool().checkin(pgsql_tool)
 
 @cl.on_chat_resume
 async def resume_chat():
-    TnTMartTools().create_connection()
\ No newline at end of file
+    await AsyncTnTMartTools.create_connection()
\ No newline at end of file
@@ -6,7 +6,8 @@ import chainlit as cl
 from agent_framework.azure import AzureOpenAIResponsesClient
 from dotenv import load_dotenv
 from agent_framework import ai_function
-from agent_framework import MCPStdioTool
+from pgsql_mcp import pgsql_tool_pool
+from tnt_mart_tools import AsyncTnTMartTools
 
 load_dotenv()
 
@@ -15,9 +16,6 @@ current_dir = pathlib.Path(__file__).parent
 env_path = current_dir / ".env"
 load_dotenv(dotenv_path=env_path)
 
-# Find the correct path to the MCP server script
-mcp_server_path = current_dir / "mcp_server.py"
-
 client = AzureOpenAIResponsesClient(
     endpoint=os.environ["AZURE_OPENAI_ENDPOINT"],
     deployment_name=os.environ["AZURE_OPENAI_RESPONSES_DEPLOYMENT_NAME"],
@@ -37,13 +35,10 @@ def getETA(self,location:str) -> str:
 
 @cl.on_chat_start
 async def start():   
-    # Define MCP adapter for your server
-    pgsql_tool = MCPStdioTool(
-        name="PGSQLMCPServer",
-        command="python",
-        args=[str(mcp_server_path)]
-    )
-    await pgsql_tool.connect()            
+    # Check a connected MCP adapter for your server out of the warm pool
+    pgsql_tool = await pgsql_tool_pool().checkout()
+    cl.user_session.set("pgsql_tool", pgsql_tool)
+    await AsyncTnTMartTools.create_connection()
     agent = client.create_agent(
         name="OrderTrackingBot",
         instructions="""
@@ -53,43 +48,32 @@ async def start():
         Your goal is to act as a helpful assistant for **TnTMart** and encourage customer **Shweta Kamath ** (customer ID: **4**) to track her order. 
         You'll use the **order_tracker** plugin to access customer and product data, manage their shopping cart, and personalize the conversation.
         You must use the Schema Definitions section below to understand the structure of the database tables.
+        When a step needs data from several tables, use the **execute_batch** tool to run all the SELECT statements in a single call instead of calling **execute_query** once per table.
         Here is a breakdown of the specific actions you need to take, DO NOT MISS ANY STEP and DO NOT DEVIATE FROM THE STEPS at any cost:
 
         * **Initial Engagement**: Begin by warmly greeting the user and asking if they would like to track their order.
         * **Get order Details**: 
-            * Retrieve the orders from the orders table where status is "Dispatched" or "Ready to dispatch".
-            * Summarize the order details based on the information present in the orders table including order id, order date, total amount, status and expected delivery date.
+            * Call the **get_order_summary** tool with her customer id and the statuses "Dispatched" and "Ready to dispatch". It returns every matching order with its items, amounts, payment state and delivery dates in one call; do not query the orders, order_item, product and payment tables for this yourself.
+            * Summarize the order details from that response including order id, order date, total amount, status and expected delivery date.
             * Ask if she would like to know more details of any specific order?
         * Next, you need to provide details of orders which the customer is interested in. For each order:
             * Check if the status is either "Dispatched" or "Ready to dispatch".
                 * if the order is "Dispatched", do the following:
-                    * Retrieve the order items details from the order_item table based on the order id.
-                    * For each product id, check the warehouse_product table to find which warehouse has the product in stock.
-                    * For each warehouse that has the product, get the warehouse details from the warehouse table.
-                    * Next, get the address of the customer from the address table. The user_id in address table is same as customer_id in customer table.
-                    * And, get the address of the warehouse from warehouse table.
-                    * By comparing the two locations, determine whether the warehouse is in the same state as the customer.
-                    * If the warehouse is in the same state as the customer, pass the value "Local" to the getETA function of LocationPlugin.
-                    * If the warehouse is not in the same state as the customer , pass the value "Non-Local" to the getETA function of LocationPlugin.
-                    * Use the response from the **getETA** function from the **LocationPlugin** to provide an estimated ETA for the order.
+                    * Call the **get_order_eta** tool with the order id. For every item of the order it returns the nearest warehouse that has the product in stock, whether that warehouse is "Local" or "Non-Local" to the customer and the ETA, followed by the ETA of the whole order. Do not query the order_item, warehouse_product, warehouse and address tables to work this out yourself.
+                    * Use the response from the **get_order_eta** tool to provide the ETA for the order and tell the customer which items ship from a Local or a Non-Local warehouse.
                     * DO NOT MISS to provide all the details to the customer at the end of this step.
 
                 * if the order is "Ready to dispatch", do the following:
-                    * Retrieve the order items details from the order_item table based on the order id.
-                    * For each product id, check the warehouse_product table to find which warehouse has the product in stock.
-                    * For each warehouse that has the product, get the warehouse details from the warehouse table.
-                    * Next, get the address of the customer from the address table. The user_id in address table is same as customer_id in customer table.
-                    * And, get the address of the warehouse from warehouse table.
-                    * By comparing the two locations, determine whether the warehouse is in the same state as the customer.
-                    * If the warehouse is in the same state as the customer:
-                        * pass the value "Local" to the getETA function of LocationPlugin.
-                    * If the warehouse is not in the same state as the customer , 
-                        * pass the value "Non-Local" to the getETA function of LocationPlugin.
+                    * Call the **get_order_eta** tool with the order id. For every item of the order it returns the nearest warehouse that has the product in stock, whether that warehouse is "Local" or "Non-Local" to the customer and the ETA, followed by the ETA of the whole order. Do not query the order_item, warehouse_product, warehouse and address tables to work this out yourself.
+                    * If all items are "Local":
+                        * provide the ETA returned by **get_order_eta**.
+                    * If any item is "Non-Local":
+                        * Call the **get_nearest_warehouses** tool with the order id and tell the customer how far the nearest warehouse stocking each Non-Local item is and its distance-based ETA.
                         * Inform the customer that since the product is not available in the same state as hers, we might need to source it from a different state.
                         * Inform the customer that this might lead to a difference in payment and she will need to pay the difference if the amount is more.
                         * If the customer agrees to pay the difference, insert a new record in the payment table where the amount is the difference between the original amount and the new amount.
                         * Also, update the order_item table to reflect the new product_id, quantity and amount for the specific order.
-                        * Once the database updates are done, confirm to the custoer that the order has been updated and provide the new ETA by passing the value "Local" to the getETA function of LocationPlugin.
+                        * Once the database updates are done, confirm to the custoer that the order has been updated and provide the new ETA by calling **get_order_eta** again.
                     * DO NOT MISS to provide all the details to the customer once all the above is done and you have the information.
 
 
@@ -107,7 +91,13 @@ async def start():
             * The **payment** table contains `payment_id`, `order_id`, `payment_time`, `amount`, `payment_mode`, `status` and `transaction_id`.
             * The **product** table contains `product_id`, `product_code`, `product_category`, `price`, `description`, `active` and `regularly_purchased`.
         """,       
-    tools=[getETA,pgsql_tool],
+    tools=[
+        getETA,
+        AsyncTnTMartTools.get_order_summary,
+        AsyncTnTMartTools.get_order_eta,
+        AsyncTnTMartTools.get_nearest_warehouses,
+        pgsql_tool,
+    ],
     )
     thread = agent.get_new_thread()
     
@@ -117,10 +107,6 @@ async def start():
     
     print(f" User session id is :: {cl.user_session.get('id')}")
 
-    if not mcp_server_path.exists():
-        await cl.Message(content=f"Error: MCP server script not found at {mcp_server_path}").send()
-        return
-    
     await cl.Message(content="TnTMart welcomes you to the customer assistant. This message is to track your orders. Would you like me to continue?").send()
     
 @cl.on_message
@@ -128,4 +114,11 @@ async def handle_message(message: cl.Message):
     agent = cl.user_session.get("agent")
     thread = cl.user_session.get("thread")
     response = await agent.run(message.content, thread=thread)
-    await cl.Message(content=response).send()
\ No newline at end of file
+    await cl.Message(content=response).send()
+
+@cl.on_chat_end
+async def end_chat():
+    pgsql_tool = cl.user_session.get("pgsql_tool")
+    if pgsql_tool:
+        await pgsql_tool_pool().checkin(pgsql_tool)
+    await AsyncTnTMartTools.close_connection()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Connects Agent Framework agents to the PGSQL MCP server.
+
+By default every chat session spawns its own `mcp_server.py` subprocess over stdio.
+When MCP_SERVER_URL is set (e.g. http://127.0.0.1:8000/mcp), sessions instead
+connect to one long-lived server started with MCP_TRANSPORT=streamable-http, which
+keeps a single connection pool for all of them.
+
+Sessions check their tool out of `pgsql_tool_pool()` in `on_chat_start` and return
+it in `on_chat_end`. With MCP_WARM_POOL_SIZE > 0 the pool keeps that many servers
+started, initialized and connected to the database ahead of time, so a new chat
+does not wait for a subprocess to spawn.
+"""
+
+import asyncio
+import logging
+import os
+import pathlib
+from collections import deque
+from typing import Any, Callable
+
+from agent_framework import MCPStdioTool, MCPStreamableHTTPTool
+
+MCP_SERVER_PATH = pathlib.Path(__file__).parent / "mcp_server.py"
+
+logger = logging.getLogger(__name__)
+
+
+def mcp_server_url() -> str | None:
+    """Returns the URL of the shared MCP server, or None to use a subprocess."""
+    return os.getenv("MCP_SERVER_URL") or None
+
+
+def create_pgsql_tool(name: str = "PGSQLMCPServer") -> MCPStdioTool | MCPStreamableHTTPTool:
+    """
+    Creates the MCP tool for the PGSQL MCP server.
+
+    The tool is not connected yet; chat sessions get connected tools from
+    `pgsql_tool_pool()` instead of calling this directly.
+    """
+    url = mcp_server_url()
+    if url:
+        return MCPStreamableHTTPTool(name=name, url=url)
+    if not MCP_SERVER_PATH.exists():
+        raise FileNotFoundError(f"MCP server script not found at {MCP_SERVER_PATH}")
+    return MCPStdioTool(name=name, command="python", args=[str(MCP_SERVER_PATH)])
+
+
+class _PoolMember:
+    """A pooled MCP tool, owned by a task that keeps it connected until retired."""
+
+    def __init__(self, tool: Any):
+        self.tool = tool
+        self.uses = 0
+        self.ready: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.stop = asyncio.Event()
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        # The MCP client must be entered and exited by the same task, so the
+        # member's own task holds the connection instead of the chat handlers.
+        try:
+            async with self.tool:
+                if not self.ready.done():
+                    self.ready.set_result(self.tool)
+                await self.stop.wait()
+        except Exception as e:
+            if not self.ready.done():
+                self.ready.set_exception(e)
+            else:
+                logger.warning(f"MCP server exited with an error: {e}")
+
+    async def healthy(self, timeout: float) -> bool:
+        """Pings the server; False if it does not answer within `timeout` seconds."""
+        if self.task.done():
+            return False
+        try:
+            await asyncio.wait_for(self.tool.session.send_ping(), timeout)
+            return True
+        except Exception:
+            return False
+
+    def retire(self) -> None:
+        self.stop.set()
+
+
+class MCPToolPool:
+    """
+    A pool of connected MCP tools that chat sessions check out and return.
+
+    Up to `size` idle tools are kept started and connected in the background. A
+    checked-out tool is health-probed first, and a returned tool is reused for at
+    most `max_reuse` sessions before its server is recycled. With `size` 0 every
+    checkout starts a new server, which is stopped again on checkin.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        size: int,
+        max_reuse: int,
+        probe_timeout: float,
+    ):
+        self.factory = factory
+        self.size = size
+        self.max_reuse = max_reuse
+        self.probe_timeout = probe_timeout
+        self._idle: deque[_PoolMember] = deque()
+        self._starting: set[_PoolMember] = set()
+        self._checked_out: dict[int, _PoolMember] = {}
+        self._warming: set[asyncio.Task] = set()
+        self._closed = False
+
+    def _start(self) -> _PoolMember:
+        member = _PoolMember(self.factory())
+        self._starting.add(member)
+        member.ready.add_done_callback(lambda _: self._on_ready(member))
+        return member
+
+    def _on_ready(self, member: _PoolMember) -> None:
+        self._starting.discard(member)
+        if not member.ready.cancelled() and member.ready.exception() is not None:
+            logger.warning(f"Failed to start MCP server: {member.ready.exception()}")
+
+    async def _warm(self, member: _PoolMember) -> None:
+        try:
+            await asyncio.shield(member.ready)
+        except Exception:
+            return
+        if self._closed or member.stop.is_set():
+            member.retire()
+        else:
+            self._idle.append(member)
+
+    def fill(self) -> None:
+        """Starts servers in the background until `size` are idle or starting."""
+        while not self._closed and len(self._idle) + len(self._starting) < self.size:
+            task = asyncio.create_task(self._warm(self._start()))
+            self._warming.add(task)
+            task.add_done_callback(self._warming.discard)
+
+    async def checkout(self) -> Any:
+        """Returns a connected tool, starting a new server if none is warm."""
+        member = None
+        while self._idle:
+            candidate = self._idle.popleft()
+            if await candidate.healthy(self.probe_timeout):
+                member = candidate
+                break
+            logger.info("Recycling an MCP server that failed its health probe.")
+            candidate.retire()
+        if member is None:
+            member = self._start()
+            try:
+                # Shielded: a cancelled checkout must not cancel the member's readiness,
+                # which its own task still has to report.
+                await asyncio.shield(member.ready)
+            except BaseException:
+                member.retire()
+                raise
+        self._checked_out[id(member.tool)] = member
+        self.fill()
+        return member.tool
+
+    async def checkin(self, tool: Any, reusable: bool = True) -> None:
+        """Returns a tool to the pool, or stops its server if it should not be reused."""
+        member = self._checked_out.pop(id(tool), None)
+        if member is None:
+            return
+        member.uses += 1
+        if (
+            reusable
+            and not self._closed
+            and member.uses < self.max_reuse
+            and len(self._idle) < self.size
+            and not member.task.done()
+        ):
+            self._idle.append(member)
+        else:
+            member.retire()
+        self.fill()
+
+    async def close(self) -> None:
+        """Stops every server, idle or checked out."""
+        self._closed = True
+        members = [*self._idle, *self._starting, *self._checked_out.values()]
+        self._idle.clear()
+        self._checked_out.clear()
+        for member in members:
+            member.retire()
+        await asyncio.gather(*(m.task for m in members), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "starting": len(self._starting),
+            "checked_out": len(self._checked_out),
+        }
+
+
+_pool: MCPToolPool | None = None
+
+
+def pgsql_tool_pool() -> MCPToolPool:
+    """
+    Returns the process-wide pool of PGSQL MCP tools, creating it on first use.
+
+    Configured through MCP_WARM_POOL_SIZE (default 0), MCP_WARM_POOL_MAX_REUSE
+    (default 20) and MCP_WARM_POOL_PROBE_TIMEOUT in seconds (default 2).
+    """
+    global _pool
+    if _pool is None:
+        _pool = MCPToolPool(
+            create_pgsql_tool,
+            size=int(os.getenv("MCP_WARM_POOL_SIZE", "0")),
+            max_reuse=int(os.getenv("MCP_WARM_POOL_MAX_REUSE", "20")),
+            probe_timeout=float(os.getenv("MCP_WARM_POOL_PROBE_TIMEOUT", "2")),
+        )
+    return _pool
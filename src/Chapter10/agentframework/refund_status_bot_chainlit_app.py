@@ -7,24 +7,16 @@ from dotenv import load_dotenv
 
 from agent_framework.azure import AzureOpenAIResponsesClient
 from agent_framework import ai_function
-from agent_framework import MCPStdioTool
 
 import chainlit as cl
-from tnt_mart_tools import TnTMartTools
+from pgsql_mcp import pgsql_tool_pool
+from tnt_mart_tools import AsyncTnTMartTools
 
 # Load environment variables from .env file
 current_dir = pathlib.Path(__file__).parent
 env_path = current_dir / ".env"
 load_dotenv(dotenv_path=env_path)
 
-# Find the correct path to the MCP server script
-mcp_server_path = current_dir / "mcp_server.py"
-if not mcp_server_path.exists():
-    mcp_server_path = current_dir.parent / "mcp_server.py"
-    if not mcp_server_path.exists():
-        raise FileNotFoundError(
-            "mcp_server.py not found in expected locations.")
-
 # create Azure OpenAI Responses client
 client = AzureOpenAIResponsesClient(
     endpoint=os.environ["AZURE_OPENAI_ENDPOINT"],
@@ -36,15 +28,11 @@ client = AzureOpenAIResponsesClient(
 @cl.on_chat_start
 async def start_chat():
     
-    TnTMartTools().create_connection()
+    await AsyncTnTMartTools.create_connection()
     
-    # Define MCP adapter for your server
-    pgsql_tool = MCPStdioTool(
-        name="PGSQLMCPServer",
-        command="python",
-        args=[str(mcp_server_path)]
-    )
-    await pgsql_tool.connect()
+    # Check a connected MCP adapter for your server out of the warm pool
+    pgsql_tool = await pgsql_tool_pool().checkout()
+    cl.user_session.set("pgsql_tool", pgsql_tool)
     
     agent = client.create_agent(
         name="TnT Mart Refund Bot",
@@ -114,7 +102,7 @@ async def start_chat():
                 - Keep the customer apprised of actions you are taking, especially when adding items to the cart. Every action should be communicated clearly.
             
         """,
-        tools=[pgsql_tool, TnTMartTools.approve_refund, TnTMartTools.reject_refund]
+        tools=[pgsql_tool, AsyncTnTMartTools.approve_refund, AsyncTnTMartTools.reject_refund]
     )
     
     thread = agent.get_new_thread()
@@ -144,8 +132,11 @@ async def on_message(message: cl.Message):
 
 @cl.on_chat_end
 async def end_chat():
-    TnTMartTools().close_connection()
+    await AsyncTnTMartTools.close_connection()
+    pgsql_tool = cl.user_session.get("pgsql_tool")
+    if pgsql_tool:
+        await pgsql_tool_pool().checkin(pgsql_tool)
 
 @cl.on_chat_resume
 async def resume_chat():
-    TnTMartTools().create_connection()
\ No newline at end of file
+    await AsyncTnTMartTools.create_connection()
\ No newline at end of file
@@ -0,0 +1,325 @@
+import psycopg2
+import pytest
+
+from mcp_server import (
+    ALL_TABLES,
+    ConnectionPool,
+    PoolTimeoutError,
+    QueryCache,
+    ResultLimits,
+    apply_result_budget,
+    fingerprint_sql,
+    share_byte_budget,
+    written_tables,
+)
+
+
+class FakeConnection:
+    """Stands in for a psycopg2 connection, so these tests need no database."""
+
+    def __init__(self, healthy=True):
+        self.closed = 0
+        self.healthy = healthy
+        self.in_transaction = False
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        if self.in_transaction:
+            return psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        self.in_transaction = False
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        if not self.conn.healthy:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+
+def make_pool(min_size=0, max_size=2, max_idle=300, health_check_interval=30):
+    return ConnectionPool(
+        connect=FakeConnection,
+        min_size=min_size,
+        max_size=max_size,
+        acquire_timeout=0.05,
+        max_idle=max_idle,
+        health_check_interval=health_check_interval,
+    )
+
+
+def test_pool_rejects_invalid_sizes():
+    with pytest.raises(ValueError):
+        make_pool(min_size=3, max_size=2)
+    with pytest.raises(ValueError):
+        make_pool(max_size=0)
+
+
+def test_pool_opens_min_size_connections():
+    pool = make_pool(min_size=2, max_size=3)
+    pool.open()
+    assert pool.stats()["size"] == 2
+    assert pool.stats()["idle"] == 2
+    assert pool.metrics.connections_created == 2
+
+
+def test_pool_reuses_released_connection():
+    pool = make_pool()
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert pool.metrics.connections_created == 1
+
+
+def test_pool_times_out_when_exhausted():
+    pool = make_pool(max_size=2)
+    pool.acquire()
+    pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    assert pool.metrics.timeouts == 1
+    assert pool.stats()["size"] == 2
+
+
+def test_pool_rolls_back_open_transaction_on_release():
+    pool = make_pool()
+    conn = pool.acquire()
+    conn.in_transaction = True
+    pool.release(conn)
+    assert conn.rollbacks == 1
+    assert pool.stats()["idle"] == 1
+
+
+def test_pool_discards_closed_connection_and_frees_its_slot():
+    pool = make_pool(max_size=1)
+    conn = pool.acquire()
+    conn.close()
+    pool.release(conn)
+    assert pool.stats()["size"] == 0
+    assert pool.acquire() is not conn
+    assert pool.metrics.connections_closed == 1
+
+
+def test_pool_replaces_connection_that_fails_health_check():
+    pool = make_pool(health_check_interval=0)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.healthy = False
+    replacement = pool.acquire()
+    assert replacement is not conn
+    assert conn.closed
+    assert pool.metrics.health_check_failures == 1
+    assert pool.stats()["size"] == 1
+
+
+def test_pool_reaps_idle_connections_above_min_size():
+    pool = make_pool(min_size=0, max_idle=0)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is not conn
+    assert conn.closed
+    assert pool.metrics.connections_closed == 1
+
+
+def test_pool_connection_context_discards_on_operational_error():
+    pool = make_pool()
+    with pytest.raises(psycopg2.OperationalError):
+        with pool.connection() as conn:
+            raise psycopg2.OperationalError("connection lost")
+    assert conn.closed
+    assert pool.stats()["size"] == 0
+
+
+def test_closed_pool_refuses_to_hand_out_connections():
+    pool = make_pool(min_size=1)
+    pool.open()
+    pool.close()
+    assert pool.stats()["size"] == 0
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+
+
+def test_result_budget_drops_rows_beyond_max_rows():
+    rows = [{"id": i} for i in range(5)]
+    kept, cells_truncated, dropped = apply_result_budget(rows, ResultLimits(3, 10_000, 100))
+    assert kept == rows[:3]
+    assert cells_truncated == 0
+    assert dropped
+
+
+def test_result_budget_keeps_rows_within_max_bytes():
+    rows = [{"name": "x" * 10} for _ in range(3)]
+    row_bytes = len('{"name": "xxxxxxxxxx"}')
+    # The brackets, two rows and the separator between them.
+    limits = ResultLimits(10, 2 + 2 * row_bytes + 2, 100)
+    kept, _, dropped = apply_result_budget(rows, limits)
+    assert kept == rows[:2]
+    assert dropped
+
+
+def test_result_budget_truncates_long_cells_without_modifying_rows():
+    rows = [{"id": 1, "note": "abcdef"}, {"id": 2, "note": "ab"}]
+    kept, cells_truncated, dropped = apply_result_budget(rows, ResultLimits(10, 10_000, 3))
+    assert kept == [{"id": 1, "note": "abc…"}, {"id": 2, "note": "ab"}]
+    assert cells_truncated == 1
+    assert not dropped
+    assert rows[0]["note"] == "abcdef"
+
+
+def test_shared_byte_budget_passes_unused_bytes_on():
+    small = {"rows": [{"id": 1}], "rows_returned": 1, "truncated": False}
+    large = {"rows": [{"id": i} for i in range(10)], "rows_returned": 10, "truncated": False}
+    budget = len('[{"id": 1}]') + len('[{"id": 0}, {"id": 1}]')
+    shared = share_byte_budget([small, large], budget)
+    assert shared[0] is small
+    assert shared[1]["rows"] == [{"id": 0}, {"id": 1}]
+    assert shared[1]["rows_returned"] == 2
+    assert shared[1]["truncated"]
+    # The trimmed result is a copy; the original may be a cached result.
+    assert len(large["rows"]) == 10
+
+
+def test_shared_byte_budget_empties_results_once_spent():
+    first = {"rows": [{"id": 1}, {"id": 2}], "rows_returned": 2, "truncated": False}
+    second = {"rows": [{"id": 3}], "rows_returned": 1, "truncated": False}
+    status = {"status": "success", "rows_affected": 4}
+    shared = share_byte_budget([first, status, second], len('[{"id": 1}, {"id": 2}]'))
+    assert shared[0] is first
+    assert shared[1] is status
+    assert shared[2]["rows"] == []
+    assert shared[2]["truncated"]
+
+
+LIMITS = ResultLimits(200, 65536, 1000)
+
+
+def cached(cache, query):
+    key = QueryCache.key(query, None, LIMITS)
+    cache.put(key, {"rows": []}, QueryCache.cacheable(query))
+    return key
+
+
+def test_cache_key_ignores_case_whitespace_and_comments():
+    assert QueryCache.key("SELECT *\n  FROM product -- all of them", None, LIMITS) == QueryCache.key(
+        "select * from product;", None, LIMITS
+    )
+    assert QueryCache.key("select * from product where name = 'A'", None, LIMITS) != QueryCache.key(
+        "select * from product where name = 'a'", None, LIMITS
+    )
+
+
+def test_cache_does_not_cache_writes_or_volatile_reads():
+    assert QueryCache.cacheable("update product set price = 1") == frozenset()
+    assert QueryCache.cacheable("select now(), * from orders") == frozenset()
+    assert QueryCache.cacheable("select * from orders for update") == frozenset()
+    assert QueryCache.cacheable("select * from orders o join customer c on c.id = o.customer_id") == {
+        "orders",
+        "customer",
+    }
+
+
+def test_written_tables():
+    assert written_tables("UPDATE public.product SET price = 1") == {"product"}
+    assert written_tables('insert into "Orders" values (1)') == {"orders"}
+    assert written_tables("delete from cart where customer_id = 1") == {"cart"}
+    assert written_tables("alter table product add column x int") == {ALL_TABLES}
+    assert written_tables("call refresh_everything()") == {ALL_TABLES}
+    assert written_tables("select * from product") == frozenset()
+
+
+def test_cache_invalidates_entries_read_from_written_table():
+    cache = QueryCache(max_entries=10, ttl=60)
+    product = cached(cache, "select * from product")
+    customer = cached(cache, "select * from customer")
+    assert cache.invalidate({"product"}) == 1
+    assert cache.get(product) is None
+    assert cache.get(customer) is not None
+
+
+def test_cache_invalidates_tables_derived_from_written_table():
+    cache = QueryCache(max_entries=10, ttl=60)
+    summary = cached(cache, "select * from order_summary where customer_id = 1")
+    locality = cached(cache, "select * from product_locality")
+    assert cache.invalidate({"payment"}) == 1
+    assert cache.get(summary) is None
+    assert cache.get(locality) is not None
+    assert cache.invalidate({"warehouse_product"}) == 1
+    assert cache.get(locality) is None
+
+
+def test_cache_invalidates_everything_for_all_tables():
+    cache = QueryCache(max_entries=10, ttl=60)
+    cached(cache, "select * from product")
+    cached(cache, "select * from customer")
+    assert cache.invalidate({ALL_TABLES}) == 2
+    assert cache.stats()["size"] == 0
+
+
+def test_cache_evicts_least_recently_used_and_expires_entries():
+    cache = QueryCache(max_entries=2, ttl=60)
+    first = cached(cache, "select * from product")
+    second = cached(cache, "select * from customer")
+    cache.get(first)
+    cached(cache, "select * from orders")
+    assert cache.get(second) is None
+    assert cache.get(first) is not None
+    assert cache.metrics.evictions == 1
+
+    expired = QueryCache(max_entries=2, ttl=-1)
+    key = cached(expired, "select * from product")
+    assert expired.get(key) is None
+    assert expired.metrics.expirations == 1
+
+
+def test_fingerprint_binds_literals_of_one_shape():
+    first = fingerprint_sql("SELECT * FROM orders WHERE customer_id = 4")
+    second = fingerprint_sql("select *  from orders where customer_id = 7;")
+    assert first.text == second.text == "select * from orders where customer_id = $1"
+    assert first.literals == ["4"]
+    assert second.literals == ["7"]
+    assert first.preparable
+
+
+def test_fingerprint_binds_literals_in_typed_contexts():
+    shape = fingerprint_sql(
+        "select * from product where name like 'Tea%' and price between 1 and 2.5 "
+        "and category_id in (3, 4) and added > '2024-01-01'::date limit 10 offset 20"
+    )
+    assert shape.text == (
+        "select * from product where name like $1 and price between $2 and $3 "
+        "and category_id in ($4, $5) and added > $6::date limit $7 offset $8"
+    )
+    assert shape.literals == ["Tea%", "1", "2.5", "3", "4", "2024-01-01", "10", "20"]
+    insert = fingerprint_sql("insert into cart (customer_id, product_id) values (1, 'it''s')")
+    assert insert.text == "insert into cart (customer_id, product_id) values ($1, $2)"
+    assert insert.literals == ["1", "it's"]
+
+
+def test_fingerprint_keeps_untyped_literals():
+    shape = fingerprint_sql("select 0 as discount, case when id = 5 then 'yes' else 'no' end from x")
+    assert shape.text == "select 0 as discount, case when id = $1 then 'yes' else 'no' end from x"
+    assert shape.literals == ["5"]
+    assert fingerprint_sql('select "Col1" from t2').literals == []
+
+
+def test_fingerprint_does_not_prepare_positional_references_or_typed_literals():
+    assert not fingerprint_sql("select name, count(*) from product group by 1 order by 2").preparable
+    assert not fingerprint_sql("select * from orders where order_date > date '2024-01-01'").preparable
+    assert not fingerprint_sql("select $$text$$").preparable
@@ -29,6 +29,30 @@ def test_update_quantity_in_cart():
     
     assert f"Quantity of product {product_id} updated to {new_quantity} for customer {customer_id}." in result
 
+def test_bulk_add_to_cart():
+    items = [
+        {"product_id": product_id, "quantity": quantity, "unit_price": unit_price},
+        {"product_id": 17, "quantity": 1, "unit_price": 9.99},
+    ]
+    result = TnTMartTools.bulk_add_to_cart(customer_id=customer_id, items=items)
+    assert f"Products [{product_id}, 17] added to cart for customer {customer_id}." in result
+
+    # Adding the same items again must not create duplicates.
+    result = TnTMartTools.bulk_add_to_cart(customer_id=customer_id, items=items)
+    assert f"Products [{product_id}, 17] were already in the cart and were not added." in result
+
+def test_bulk_update_cart():
+    items = [
+        {"product_id": product_id, "quantity": 3, "unit_price": unit_price},
+        {"product_id": 17, "quantity": 2, "unit_price": 9.99},
+    ]
+    try:
+        result = TnTMartTools.bulk_update_cart(customer_id=customer_id, items=items)
+        assert f"Cart updated for customer {customer_id}: products [{product_id}, 17] updated, products [] added." in result
+    finally:
+        TnTMartTools.remove_from_cart(customer_id=customer_id, product_id=product_id)
+        TnTMartTools.remove_from_cart(customer_id=customer_id, product_id=17)
+
 def test_approve_refund():
     refund_id = 1
     result = TnTMartTools.approve_refund(refund_id)
@@ -63,6 +87,8 @@ if __name__ == "__main__":
     test_add_to_cart()
     test_update_quantity_in_cart()
     test_remove_from_cart()
+    test_bulk_add_to_cart()
+    test_bulk_update_cart()
     test_approve_refund()
     test_reject_refund()
     test_getETA()
@@ -6,39 +6,252 @@ Key Functions:
 - add_to_cart: Adds an item to the shopping cart.
 - remove_from_cart: Removes an item from the shopping cart.
 - update_quantity_in_cart: Updates the quantity of an item in the shopping cart.
+- bulk_add_to_cart: Adds several items to the shopping cart in one transaction.
+- bulk_update_cart: Sets the quantity of several items in the shopping cart in one transaction.
+- add_regular_items_to_cart: Adds a customer's regular items missing from their cart in one statement.
 - approve_refund: Approves a refund request.
 - reject_refund: Rejects a refund request.
+- get_order_eta: Provides the ETA of an order from the precomputed product locality index.
+- get_nearest_warehouses: Finds the nearest stocked warehouse for every item of an order.
+- get_order_summary: Summarizes a customer's orders from the maintained order summary.
 
+`AsyncTnTMartTools` provides the same tools, with the same names and schemas, as
+coroutines that do not block the event loop while waiting for the database.
 """
 
 from agent_framework import ai_function
-from dotenv import load_dotenv
-import os, json, psycopg2, pathlib
-from psycopg2.extras import RealDictCursor
+from pydantic import BaseModel
 from typing import Annotated
-from decimal import Decimal
+
+import tnt_mart_db
+from warehouse_locator import warehouse_locator
+
+
+class CartItem(BaseModel):
+    """One shopping cart line for the bulk cart tools."""
+
+    product_id: int
+    quantity: int
+    unit_price: float
+
+
+CartItems = Annotated[list[CartItem], "The items, each with product_id, quantity and unit_price."]
+
+# Products already in the cart are left untouched and are not returned.
+_BULK_ADD_TO_CART = """
+    insert into shopping_cart (customer_id, product_id, quantity, unit_price) values %s
+    on conflict (customer_id, product_id) do nothing
+    returning product_id;
+"""
+
+# xmax is 0 only for rows the statement inserted, so it tells inserts from updates.
+_BULK_UPDATE_CART = """
+    insert into shopping_cart (customer_id, product_id, quantity, unit_price) values %s
+    on conflict (customer_id, product_id)
+    do update set quantity = excluded.quantity, unit_price = excluded.unit_price
+    returning product_id, (xmax = 0) as inserted;
+"""
+
+
+def _cart_rows(customer_id: int, items: list) -> list[tuple]:
+    # One row per product, as a statement may not upsert the same key twice; a
+    # repeated product keeps its last entry. Items may arrive as plain dicts.
+    rows = {}
+    for item in items:
+        item = CartItem.model_validate(item)
+        rows[item.product_id] = (customer_id, item.product_id, item.quantity, item.unit_price)
+    return list(rows.values())
+
+
+def _bulk_add_message(customer_id: int, rows: list[tuple], returned: list[tuple]) -> str:
+    added = [product_id for (product_id,) in returned]
+    skipped = [row[1] for row in rows if row[1] not in added]
+    message = f"Products {added} added to cart for customer {customer_id}."
+    if skipped:
+        message += f" Products {skipped} were already in the cart and were not added."
+    return message
+
+
+def _bulk_update_message(customer_id: int, returned: list[tuple]) -> str:
+    updated = [product_id for product_id, inserted in returned if not inserted]
+    added = [product_id for product_id, inserted in returned if inserted]
+    return f"Cart updated for customer {customer_id}: products {updated} updated, products {added} added."
+
+
+# Reconciles a customer's regular items with their cart in one statement. All CTEs
+# see the cart as it was before the statement, so the insert and the update never
+# touch the same row.
+_ADD_REGULAR_ITEMS_TO_CART = """
+    with regular as (
+        select r.product_id, p.description, sum(r.quantity)::int as quantity, p.price
+        from customer_regular_items r
+        join product p on p.product_id = r.product_id
+        where r.customer_id = %(customer_id)s and p.active = 'Y'
+        group by r.product_id, p.description, p.price
+    ),
+    added as (
+        insert into shopping_cart (customer_id, product_id, quantity, unit_price)
+        select %(customer_id)s, r.product_id, r.quantity, r.price
+        from regular r
+        where not exists (
+            select 1 from shopping_cart c
+            where c.customer_id = %(customer_id)s and c.product_id = r.product_id
+        )
+        on conflict (customer_id, product_id) do nothing
+        returning product_id
+    ),
+    updated as (
+        update shopping_cart c
+        set quantity = r.quantity, unit_price = r.price
+        from regular r
+        where %(update_existing)s
+            and c.customer_id = %(customer_id)s
+            and c.product_id = r.product_id
+            and (c.quantity <> r.quantity or c.unit_price <> r.price)
+        returning c.product_id
+    )
+    select r.product_id, r.description,
+        -- Items left as they were are reported with the quantity in the cart.
+        case when a.product_id is null and u.product_id is null then c.quantity else r.quantity end as quantity,
+        case
+            when a.product_id is not null then 'added'
+            when u.product_id is not null then 'updated'
+            else 'already_present'
+        end as outcome
+    from regular r
+    left join added a on a.product_id = r.product_id
+    left join updated u on u.product_id = r.product_id
+    left join shopping_cart c on c.customer_id = %(customer_id)s and c.product_id = r.product_id
+    order by r.product_id;
+"""
+
+
+def _regular_items_message(customer_id: int, returned: list[tuple]) -> str:
+    if not returned:
+        return f"Customer {customer_id} has no active regular items."
+    outcomes = {"added": [], "already_present": [], "updated": []}
+    for product_id, description, quantity, outcome in returned:
+        outcomes[outcome].append(f"{description} (product {product_id}) x {quantity}")
+    return f"Regular items for customer {customer_id}: " + "; ".join(
+        f"{outcome}: {', '.join(items) if items else 'none'}" for outcome, items in outcomes.items()
+    ) + "."
+
+
+# Needs the product_locality table from resources/scripts/migrations/001.
+_ORDER_ETA = """
+    select o.status, a.state, oi.product_id, p.description, pl.warehouse_code, pl.eta_class, pl.eta_days
+    from orders o
+    join order_item oi on oi.order_id = o.order_id
+    join product p on p.product_id = oi.product_id
+    left join lateral (
+        select state from address where user_id = o.customer_id order by address_id limit 1
+    ) a on true
+    left join product_locality pl on pl.product_id = oi.product_id and pl.state = a.state
+    where o.order_id = %s
+    order by oi.order_item_id;
+"""
+
+
+def _order_eta_message(order_id: int, returned: list[tuple]) -> str:
+    if not returned:
+        return f"Order {order_id} was not found or has no items."
+    status, state = returned[0][0], returned[0][1]
+    lines = [f"Order {order_id} ({status}) ships to {state}:"]
+    eta_days = []
+    for _, _, product_id, description, warehouse_code, eta_class, days in returned:
+        if warehouse_code is None:
+            lines.append(f"- {description} (product {product_id}): not in stock in any active warehouse.")
+        else:
+            lines.append(f"- {description} (product {product_id}): ships from {warehouse_code}, {eta_class}, ETA is {days} days.")
+            eta_days.append(days)
+    if eta_days:
+        lines.append(f"ETA for the order is {max(eta_days)} days.")
+    return "\n".join(lines)
+
+
+_ORDER_DELIVERY = """
+    select a.latitude, a.longitude, oi.product_id, p.description
+    from orders o
+    join order_item oi on oi.order_id = o.order_id
+    join product p on p.product_id = oi.product_id
+    join lateral (
+        select latitude, longitude from address where user_id = o.customer_id order by address_id limit 1
+    ) a on true
+    where o.order_id = %s
+    order by oi.order_item_id;
+"""
+
+
+def _nearest_warehouses(order_id: int) -> str:
+    # One read for the order and its delivery address; the warehouse search itself
+    # runs in memory.
+    returned = tnt_mart_db.execute_read(_ORDER_DELIVERY, (order_id,))
+    if not returned:
+        return f"Order {order_id} was not found or has no items."
+    latitude, longitude = float(returned[0][0]), float(returned[0][1])
+    matches = warehouse_locator().nearest_many([row[2] for row in returned], latitude, longitude)
+    lines = [f"Nearest warehouses for order {order_id}:"]
+    for _, _, product_id, description in returned:
+        match = matches[product_id]
+        if match is None:
+            lines.append(f"- {description} (product {product_id}): not in stock in any active warehouse.")
+        else:
+            lines.append(
+                f"- {description} (product {product_id}): {match.warehouse.warehouse_code}, "
+                f"{match.distance_km} km away, ETA is {match.eta_days} days."
+            )
+    eta_days = [match.eta_days for match in matches.values() if match is not None]
+    if eta_days:
+        lines.append(f"ETA for the order is {max(eta_days)} days.")
+    return "\n".join(lines)
+
+
+# Needs the order_summary table from resources/scripts/migrations/002.
+_ORDER_SUMMARY = """
+    select order_id, order_date, status, total_amount, items, amount_paid, payment_status,
+        expected_delivery_date, actual_delivery_date, delivery_delay_days
+    from order_summary
+    where customer_id = %(customer_id)s
+        and (%(statuses)s::text[] is null or status = any(%(statuses)s::text[]))
+    order by order_date desc;
+"""
+
+
+def _order_summary_message(customer_id: int, returned: list[tuple]) -> str:
+    if not returned:
+        return f"No matching orders found for customer {customer_id}."
+    lines = []
+    for (order_id, order_date, status, total, items, paid, payment_status,
+         expected, actual, delay_days) in returned:
+        delivery = f"expected {expected:%Y-%m-%d}"
+        if actual is not None:
+            delivery += f", delivered {actual:%Y-%m-%d} ({delay_days:+d} days)"
+        lines.append(
+            f"Order {order_id} | {order_date:%Y-%m-%d} | {status} | total {total} | "
+            f"paid {paid} ({payment_status}) | {delivery}"
+        )
+        described = [
+            f"{item['description']} (product {item['product_id']}) x {item['quantity']}, {item['amount']}, {item['status']}"
+            for item in items
+        ]
+        lines.append("  items: " + ("; ".join(described) or "none"))
+    return "\n".join(lines)
+
 
 class TnTMartTools:
-    connection = None
-    cursor = None
+    """
+    Tools for the TnT Mart agents.
+
+    The tools share the process-wide connection pool in `tnt_mart_db`; every call
+    checks out its own connection, so concurrent chat sessions never share one.
+    """
 
     @staticmethod
     @ai_function(name="create_connection", description="Create a connection object to the postgres database.")
     def create_connection():
-        # Load environment variables from .env file
-        current_dir = pathlib.Path(__file__).parent
-        env_path = current_dir / ".env"
-        load_dotenv(dotenv_path=env_path)
         print("create_connection function called... ")
-        TnTMartTools.connection = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-        )
-        TnTMartTools.cursor = TnTMartTools.connection.cursor(cursor_factory=RealDictCursor)
-            
+        tnt_mart_db.attach()
+
     @staticmethod
     @ai_function(name="close_connection", description="Closes the connection to the database.")
     def close_connection() -> Annotated[str, "Returns a message indicating the status of the connection closure."]:
@@ -50,9 +263,8 @@ class TnTMartTools:
         """
         print("close_connection function called... ")
         try:
-            if TnTMartTools.connection:
-                TnTMartTools.cursor.close()
-                TnTMartTools.connection.close()
+            # Only the last session to close its connection closes the shared pool.
+            tnt_mart_db.detach()
             return "Connection closed successfully."
         except Exception as e:
             return str(e)
@@ -73,10 +285,11 @@ class TnTMartTools:
         
         print(f"Adding product {product_id} to cart for customer {customer_id} with quantity {quantity} at price {unit_price}.")
         
-        query = f"""insert into shopping_cart (customer_id, product_id, quantity, unit_price) values ({customer_id}, {product_id}, {quantity}, {unit_price});"""
-        cursor = TnTMartTools.connection.cursor()
-        cursor.execute(query)
-        TnTMartTools.connection.commit()
+        tnt_mart_db.execute_write(
+            "insert into shopping_cart (customer_id, product_id, quantity, unit_price) values (%s, %s, %s, %s);",
+            (customer_id, product_id, quantity, unit_price),
+            "shopping_cart",
+        )
         
         return f"Product {product_id} added to cart for customer {customer_id}."
 
@@ -93,10 +306,11 @@ class TnTMartTools:
         """
         print(f"Removing product {product_id} from cart for customer {customer_id}.")
 
-        query = f"""delete from shopping_cart where customer_id={customer_id} and product_id={product_id};"""
-        cursor = TnTMartTools.connection.cursor()
-        cursor.execute(query)
-        TnTMartTools.connection.commit()
+        tnt_mart_db.execute_write(
+            "delete from shopping_cart where customer_id = %s and product_id = %s;",
+            (customer_id, product_id),
+            "shopping_cart",
+        )
 
         return f"Product {product_id} removed from cart for customer {customer_id}."
 
@@ -114,13 +328,75 @@ class TnTMartTools:
         """
         print(f"Updating quantity of product {product_id} to {quantity} for customer {customer_id}.")
 
-        query = f"""update shopping_cart set quantity={quantity} where customer_id={customer_id} and product_id={product_id};"""
-        cursor = TnTMartTools.connection.cursor()
-        cursor.execute(query)
-        TnTMartTools.connection.commit()
+        tnt_mart_db.execute_write(
+            "update shopping_cart set quantity = %s where customer_id = %s and product_id = %s;",
+            (quantity, customer_id, product_id),
+            "shopping_cart",
+        )
 
         return f"Quantity of product {product_id} updated to {quantity} for customer {customer_id}."
 
+    @staticmethod
+    @ai_function(description="Adds several items to the shopping cart in one transaction, skipping items already in the cart.", name="bulk_add_to_cart")
+    def bulk_add_to_cart(customer_id: int, items: CartItems) -> str:
+        """
+        Adds several items to the shopping cart with one multi-row insert and commit.
+        Args:
+            customer_id (int): The ID of the customer.
+            items (list[CartItem]): The products to add, with quantity and unit price.
+        Returns:
+            str: A message listing the products added and those already in the cart.
+        """
+        rows = _cart_rows(customer_id, items)
+        if not rows:
+            return "No items to add."
+        print(f"Adding products {[row[1] for row in rows]} to cart for customer {customer_id}.")
+
+        returned = tnt_mart_db.execute_values_write(_BULK_ADD_TO_CART, rows, "shopping_cart")
+
+        return _bulk_add_message(customer_id, rows, returned)
+
+    @staticmethod
+    @ai_function(description="Sets the quantity and price of several items in the shopping cart in one transaction, adding items not yet in the cart.", name="bulk_update_cart")
+    def bulk_update_cart(customer_id: int, items: CartItems) -> str:
+        """
+        Upserts several items into the shopping cart with one multi-row statement and commit.
+        Args:
+            customer_id (int): The ID of the customer.
+            items (list[CartItem]): The products with their new quantity and unit price.
+        Returns:
+            str: A message listing the products updated and those added.
+        """
+        rows = _cart_rows(customer_id, items)
+        if not rows:
+            return "No items to update."
+        print(f"Updating products {[row[1] for row in rows]} in cart for customer {customer_id}.")
+
+        returned = tnt_mart_db.execute_values_write(_BULK_UPDATE_CART, rows, "shopping_cart")
+
+        return _bulk_update_message(customer_id, returned)
+
+    @staticmethod
+    @ai_function(description="Adds all of a customer's regular items that are not yet in their shopping cart in one step. Set update_existing to also reset the quantity of regular items already in the cart.", name="add_regular_items_to_cart")
+    def add_regular_items_to_cart(customer_id: int, update_existing: bool = False) -> str:
+        """
+        Reconciles the customer's regular items with their shopping cart in one SQL statement.
+        Args:
+            customer_id (int): The ID of the customer.
+            update_existing (bool): Whether to set items already in the cart to their regular quantity and current price.
+        Returns:
+            str: A summary of the items added, already present and updated.
+        """
+        print(f"Adding regular items to cart for customer {customer_id} (update existing: {update_existing}).")
+
+        returned = tnt_mart_db.execute_write_returning(
+            _ADD_REGULAR_ITEMS_TO_CART,
+            {"customer_id": customer_id, "update_existing": update_existing},
+            "shopping_cart",
+        )
+
+        return _regular_items_message(customer_id, returned)
+
     @staticmethod
     @ai_function(description="Approves a refund request.", name="approve_refund")
     def approve_refund(refund_id: int) -> str:
@@ -133,10 +409,11 @@ class TnTMartTools:
         """
         print(f"Approving refund request with ID {refund_id}.")
 
-        query = f"""update refund set status='Approved' where refund_id={refund_id};"""
-        cursor = TnTMartTools.connection.cursor()
-        cursor.execute(query)
-        TnTMartTools.connection.commit()
+        tnt_mart_db.execute_write(
+            "update refund set status = 'Approved' where refund_id = %s;",
+            (refund_id,),
+            "refund",
+        )
 
         return f"Refund request with ID {refund_id} has been approved." 
     
@@ -153,13 +430,60 @@ class TnTMartTools:
         """
         print(f"Rejecting refund request with ID {refund_id} for reason: {reason}")
 
-        query = f"""update refund set status='Rejected', reason='{reason}' where refund_id={refund_id};"""
-        cursor = TnTMartTools.connection.cursor()
-        cursor.execute(query)
-        TnTMartTools.connection.commit()
+        tnt_mart_db.execute_write(
+            "update refund set status = 'Rejected', reason = %s where refund_id = %s;",
+            (reason, refund_id),
+            "refund",
+        )
 
         return f"Refund request with ID {refund_id} has been rejected for reason: {reason}"
     
+    @staticmethod
+    @ai_function(description="Provides the ETA of an order, with the nearest warehouse that has each of its items in stock and whether it is Local or Non-Local to the customer.", name="get_order_eta")
+    def get_order_eta(order_id: int) -> str:
+        """
+        Looks up the ETA of every item of an order in the precomputed product locality index.
+        Args:
+            order_id (int): The ID of the order.
+        Returns:
+            str: The warehouse, ETA class and ETA of each item, and the ETA of the order.
+        """
+        print(f"Determining ETA for order {order_id}.")
+
+        returned = tnt_mart_db.execute_read(_ORDER_ETA, (order_id,))
+
+        return _order_eta_message(order_id, returned)
+
+    @staticmethod
+    @ai_function(description="Finds, for every item of an order, the nearest warehouse that has it in stock, its distance from the customer and a distance-based ETA.", name="get_nearest_warehouses")
+    def get_nearest_warehouses(order_id: int) -> str:
+        """
+        Finds the nearest stocked warehouse for every item of an order using the in-memory warehouse locator.
+        Args:
+            order_id (int): The ID of the order.
+        Returns:
+            str: The nearest warehouse, distance and ETA of each item, and the ETA of the order.
+        """
+        print(f"Finding nearest warehouses for order {order_id}.")
+        return _nearest_warehouses(order_id)
+
+    @staticmethod
+    @ai_function(description="Summarizes a customer's orders with their items, amounts, status, payment state and delivery dates, optionally only orders in the given statuses.", name="get_order_summary")
+    def get_order_summary(customer_id: int, statuses: list[str] | None = None) -> str:
+        """
+        Reads the customer's orders from the maintained order summary.
+        Args:
+            customer_id (int): The ID of the customer.
+            statuses (list[str], optional): Only include orders in these statuses, e.g. ["Dispatched", "Ready to dispatch"].
+        Returns:
+            str: One entry per order, most recent first.
+        """
+        print(f"Summarizing orders for customer {customer_id} with statuses {statuses}.")
+
+        returned = tnt_mart_db.execute_read(_ORDER_SUMMARY, {"customer_id": customer_id, "statuses": statuses or None})
+
+        return _order_summary_message(customer_id, returned)
+
     @staticmethod
     @ai_function(description="Provides ETA for dispatched orders.", name="getETA")
     def getETA(location:str) -> str:
@@ -171,3 +495,177 @@ class TnTMartTools:
         else:
             return "ETA is 10 days"
 
+
+class AsyncTnTMartTools:
+    """
+    Async variants of the TnTMartTools, with the same tool names and schemas.
+
+    Each call awaits the database work on the bounded executor in `tnt_mart_db`, so
+    the Chainlit event loop keeps serving other chat sessions while it runs.
+    """
+
+    @staticmethod
+    @ai_function(name="create_connection", description="Create a connection object to the postgres database.")
+    async def create_connection():
+        print("create_connection function called... ")
+        await tnt_mart_db.run_async(tnt_mart_db.attach)
+
+    @staticmethod
+    @ai_function(name="close_connection", description="Closes the connection to the database.")
+    async def close_connection() -> Annotated[str, "Returns a message indicating the status of the connection closure."]:
+        """Closes the connection to the PostgreSQL database."""
+        print("close_connection function called... ")
+        try:
+            await tnt_mart_db.run_async(tnt_mart_db.detach)
+            return "Connection closed successfully."
+        except Exception as e:
+            return str(e)
+
+    @staticmethod
+    @ai_function(description="Adds an item to the shopping cart.", name="add_to_cart")
+    async def add_to_cart(customer_id: int, product_id: int, quantity: int, unit_price: float) -> str:
+        """Adds an item to the shopping cart."""
+        print(f"Adding product {product_id} to cart for customer {customer_id} with quantity {quantity} at price {unit_price}.")
+
+        await tnt_mart_db.execute_write_async(
+            "insert into shopping_cart (customer_id, product_id, quantity, unit_price) values (%s, %s, %s, %s);",
+            (customer_id, product_id, quantity, unit_price),
+            "shopping_cart",
+        )
+
+        return f"Product {product_id} added to cart for customer {customer_id}."
+
+    @staticmethod
+    @ai_function(description="Removes an item from the shopping cart.", name="remove_from_cart")
+    async def remove_from_cart(customer_id: int, product_id: int) -> str:
+        """Removes an item from the shopping cart."""
+        print(f"Removing product {product_id} from cart for customer {customer_id}.")
+
+        await tnt_mart_db.execute_write_async(
+            "delete from shopping_cart where customer_id = %s and product_id = %s;",
+            (customer_id, product_id),
+            "shopping_cart",
+        )
+
+        return f"Product {product_id} removed from cart for customer {customer_id}."
+
+    @staticmethod
+    @ai_function(description="Updates the quantity of an item in the shopping cart.", name="update_quantity_in_cart")
+    async def update_quantity_in_cart(quantity: int, customer_id: int, product_id: int) -> str:
+        """Updates the quantity of an item in the shopping cart."""
+        print(f"Updating quantity of product {product_id} to {quantity} for customer {customer_id}.")
+
+        await tnt_mart_db.execute_write_async(
+            "update shopping_cart set quantity = %s where customer_id = %s and product_id = %s;",
+            (quantity, customer_id, product_id),
+            "shopping_cart",
+        )
+
+        return f"Quantity of product {product_id} updated to {quantity} for customer {customer_id}."
+
+    @staticmethod
+    @ai_function(description="Adds several items to the shopping cart in one transaction, skipping items already in the cart.", name="bulk_add_to_cart")
+    async def bulk_add_to_cart(customer_id: int, items: CartItems) -> str:
+        """Adds several items to the shopping cart. See TnTMartTools.bulk_add_to_cart."""
+        rows = _cart_rows(customer_id, items)
+        if not rows:
+            return "No items to add."
+        print(f"Adding products {[row[1] for row in rows]} to cart for customer {customer_id}.")
+
+        returned = await tnt_mart_db.execute_values_write_async(_BULK_ADD_TO_CART, rows, "shopping_cart")
+
+        return _bulk_add_message(customer_id, rows, returned)
+
+    @staticmethod
+    @ai_function(description="Sets the quantity and price of several items in the shopping cart in one transaction, adding items not yet in the cart.", name="bulk_update_cart")
+    async def bulk_update_cart(customer_id: int, items: CartItems) -> str:
+        """Upserts several items into the shopping cart. See TnTMartTools.bulk_update_cart."""
+        rows = _cart_rows(customer_id, items)
+        if not rows:
+            return "No items to update."
+        print(f"Updating products {[row[1] for row in rows]} in cart for customer {customer_id}.")
+
+        returned = await tnt_mart_db.execute_values_write_async(_BULK_UPDATE_CART, rows, "shopping_cart")
+
+        return _bulk_update_message(customer_id, returned)
+
+    @staticmethod
+    @ai_function(description="Adds all of a customer's regular items that are not yet in their shopping cart in one step. Set update_existing to also reset the quantity of regular items already in the cart.", name="add_regular_items_to_cart")
+    async def add_regular_items_to_cart(customer_id: int, update_existing: bool = False) -> str:
+        """Reconciles the customer's regular items with their cart. See TnTMartTools.add_regular_items_to_cart."""
+        print(f"Adding regular items to cart for customer {customer_id} (update existing: {update_existing}).")
+
+        returned = await tnt_mart_db.execute_write_returning_async(
+            _ADD_REGULAR_ITEMS_TO_CART,
+            {"customer_id": customer_id, "update_existing": update_existing},
+            "shopping_cart",
+        )
+
+        return _regular_items_message(customer_id, returned)
+
+    @staticmethod
+    @ai_function(description="Approves a refund request.", name="approve_refund")
+    async def approve_refund(refund_id: int) -> str:
+        """Approves a refund request."""
+        print(f"Approving refund request with ID {refund_id}.")
+
+        await tnt_mart_db.execute_write_async(
+            "update refund set status = 'Approved' where refund_id = %s;",
+            (refund_id,),
+            "refund",
+        )
+
+        return f"Refund request with ID {refund_id} has been approved."
+
+    @staticmethod
+    @ai_function(description="Rejects a refund request.", name="reject_refund")
+    async def reject_refund(refund_id: int, reason: str) -> str:
+        """Rejects a refund request."""
+        print(f"Rejecting refund request with ID {refund_id} for reason: {reason}")
+
+        await tnt_mart_db.execute_write_async(
+            "update refund set status = 'Rejected', reason = %s where refund_id = %s;",
+            (reason, refund_id),
+            "refund",
+        )
+
+        return f"Refund request with ID {refund_id} has been rejected for reason: {reason}"
+
+    @staticmethod
+    @ai_function(description="Provides the ETA of an order, with the nearest warehouse that has each of its items in stock and whether it is Local or Non-Local to the customer.", name="get_order_eta")
+    async def get_order_eta(order_id: int) -> str:
+        """Looks up the ETA of every item of an order. See TnTMartTools.get_order_eta."""
+        print(f"Determining ETA for order {order_id}.")
+
+        returned = await tnt_mart_db.execute_read_async(_ORDER_ETA, (order_id,))
+
+        return _order_eta_message(order_id, returned)
+
+    @staticmethod
+    @ai_function(description="Finds, for every item of an order, the nearest warehouse that has it in stock, its distance from the customer and a distance-based ETA.", name="get_nearest_warehouses")
+    async def get_nearest_warehouses(order_id: int) -> str:
+        """Finds the nearest stocked warehouse for every item of an order. See TnTMartTools.get_nearest_warehouses."""
+        print(f"Finding nearest warehouses for order {order_id}.")
+        return await tnt_mart_db.run_async(_nearest_warehouses, order_id)
+
+    @staticmethod
+    @ai_function(description="Summarizes a customer's orders with their items, amounts, status, payment state and delivery dates, optionally only orders in the given statuses.", name="get_order_summary")
+    async def get_order_summary(customer_id: int, statuses: list[str] | None = None) -> str:
+        """Reads the customer's orders from the maintained order summary. See TnTMartTools.get_order_summary."""
+        print(f"Summarizing orders for customer {customer_id} with statuses {statuses}.")
+
+        returned = await tnt_mart_db.execute_read_async(
+            _ORDER_SUMMARY, {"customer_id": customer_id, "statuses": statuses or None}
+        )
+
+        return _order_summary_message(customer_id, returned)
+
+    @staticmethod
+    @ai_function(description="Provides ETA for dispatched orders.", name="getETA")
+    async def getETA(location: str) -> str:
+        """Get the ETA for Dispatched orders."""
+        print("Determining ETA Dispatched order from  warehouse")
+        if location == "Local":
+            return "ETA is 5 days"
+        else:
+            return "ETA is 10 days"
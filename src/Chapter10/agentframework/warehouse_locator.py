@@ -0,0 +1,176 @@
+"""
+Nearest-stocked-warehouse search for the TnT Mart tools.
+
+Warehouses and customer addresses both carry latitude/longitude. `WarehouseLocator`
+keeps, for every product, a k-d tree over the active warehouses that have it in
+stock, so finding the nearest one for a delivery address is a tree descent of a few
+microseconds instead of a database round trip. Points are placed on the unit sphere,
+where the straight-line (chord) distance orders warehouses exactly as the
+great-circle distance does.
+
+The index is loaded from the database by `warehouse_locator()` and reloaded once it
+is older than WAREHOUSE_LOCATOR_TTL seconds (default 60), so stock changes show up
+without a restart.
+"""
+
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import tnt_mart_db
+
+EARTH_RADIUS_KM = 6371.0
+
+# (up to this many km, ETA in days); anything further takes MAX_ETA_DAYS.
+ETA_BANDS_KM = ((50, 2), (300, 4), (1000, 7))
+MAX_ETA_DAYS = 10
+
+_STOCKED_WAREHOUSES = """
+    select wp.product_id, w.warehouse_id, w.warehouse_code, w.latitude, w.longitude
+    from warehouse_product wp
+    join warehouse w on w.warehouse_id = wp.warehouse_id
+    where w.active = 'Y' and wp.product_quantity > 0;
+"""
+
+
+@dataclass(frozen=True)
+class Warehouse:
+    warehouse_id: int
+    warehouse_code: str
+    latitude: float
+    longitude: float
+
+
+@dataclass(frozen=True)
+class Match:
+    """The nearest warehouse stocking a product, with the distance-based ETA."""
+
+    warehouse: Warehouse
+    distance_km: float
+    eta_days: int
+
+
+def to_unit_vector(latitude: float, longitude: float) -> tuple[float, float, float]:
+    lat, lon = math.radians(latitude), math.radians(longitude)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def chord_to_km(chord_squared: float) -> float:
+    """Converts a squared chord length on the unit sphere to a great-circle distance."""
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(chord_squared) / 2))
+
+
+def eta_days(distance_km: float) -> int:
+    for limit_km, days in ETA_BANDS_KM:
+        if distance_km <= limit_km:
+            return days
+    return MAX_ETA_DAYS
+
+
+class KDTree:
+    """
+    A static 3-d tree over (point, item) pairs.
+
+    Nodes are plain tuples (point, item, axis, left, right) to keep the search loop
+    free of attribute lookups.
+    """
+
+    def __init__(self, entries: list[tuple[tuple[float, float, float], object]]):
+        self._root = self._build(list(entries), 0)
+
+    def _build(self, entries: list, depth: int):
+        if not entries:
+            return None
+        axis = depth % 3
+        entries.sort(key=lambda entry: entry[0][axis])
+        median = len(entries) // 2
+        point, item = entries[median]
+        return (
+            point,
+            item,
+            axis,
+            self._build(entries[:median], depth + 1),
+            self._build(entries[median + 1 :], depth + 1),
+        )
+
+    def nearest(self, target: tuple[float, float, float]) -> tuple[object, float] | None:
+        """Returns the nearest item and its squared distance, or None if the tree is empty."""
+        best_item, best_distance = None, math.inf
+        # Each entry carries a lower bound on the squared distance to its subtree.
+        stack = [(self._root, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if node is None or bound >= best_distance:
+                continue
+            point, item, axis, left, right = node
+            dx, dy, dz = target[0] - point[0], target[1] - point[1], target[2] - point[2]
+            distance = dx * dx + dy * dy + dz * dz
+            if distance < best_distance:
+                best_item, best_distance = item, distance
+            diff = target[axis] - point[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            # The far side is only worth visiting if its splitting plane is closer
+            # than the best match found by then; the near side is searched first.
+            stack.append((far, diff * diff))
+            stack.append((near, 0.0))
+        if best_item is None:
+            return None
+        return best_item, best_distance
+
+
+class WarehouseLocator:
+    """Finds the nearest active warehouse that has a product in stock."""
+
+    def __init__(self, stock: list[tuple[int, Warehouse]]):
+        by_product: dict[int, list] = {}
+        for product_id, warehouse in stock:
+            point = to_unit_vector(warehouse.latitude, warehouse.longitude)
+            by_product.setdefault(product_id, []).append((point, warehouse))
+        self._trees = {product_id: KDTree(entries) for product_id, entries in by_product.items()}
+
+    @classmethod
+    def from_database(cls) -> "WarehouseLocator":
+        rows = tnt_mart_db.execute_read(_STOCKED_WAREHOUSES, ())
+        return cls(
+            [
+                (product_id, Warehouse(warehouse_id, code, float(latitude), float(longitude)))
+                for product_id, warehouse_id, code, latitude, longitude in rows
+            ]
+        )
+
+    def nearest(self, product_id: int, latitude: float, longitude: float) -> Match | None:
+        """Returns the nearest warehouse stocking `product_id`, or None if none does."""
+        return self.nearest_many([product_id], latitude, longitude)[product_id]
+
+    def nearest_many(self, product_ids: list[int], latitude: float, longitude: float) -> dict[int, Match | None]:
+        """Finds the nearest warehouse for several products delivered to the same address."""
+        target = to_unit_vector(latitude, longitude)
+        matches = {}
+        for product_id in product_ids:
+            tree = self._trees.get(product_id)
+            found = tree.nearest(target) if tree else None
+            if found is None:
+                matches[product_id] = None
+                continue
+            warehouse, chord_squared = found
+            distance_km = chord_to_km(chord_squared)
+            matches[product_id] = Match(warehouse, round(distance_km, 1), eta_days(distance_km))
+        return matches
+
+
+_locator: WarehouseLocator | None = None
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def warehouse_locator() -> WarehouseLocator:
+    """Returns the process-wide locator, loading it on first use and once it is stale."""
+    global _locator, _loaded_at
+    with _lock:
+        ttl = float(os.getenv("WAREHOUSE_LOCATOR_TTL", "60"))
+        if _locator is None or time.monotonic() - _loaded_at > ttl:
+            _locator = WarehouseLocator.from_database()
+            _loaded_at = time.monotonic()
+        return _locator
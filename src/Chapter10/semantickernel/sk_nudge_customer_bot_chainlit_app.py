@@ -7,7 +7,6 @@ from dotenv import load_dotenv
 from semantic_kernel import Kernel
 from semantic_kernel.connectors.ai.open_ai import OpenAIChatPromptExecutionSettings
 from semantic_kernel.connectors.ai.function_choice_behavior import FunctionChoiceBehavior
-from semantic_kernel.connectors.mcp import MCPStdioPlugin
 from semantic_kernel.contents import ChatHistory
 from semantic_kernel.contents.streaming_chat_message_content import StreamingChatMessageContent
 from semantic_kernel.contents.utils.author_role import AuthorRole
@@ -15,22 +14,23 @@ from semantic_kernel.functions import KernelArguments
 from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
 
 import chainlit as cl
-from tnt_mart_plugins import TnTMartPlugin
+from pgsql_mcp import pgsql_plugin_pool
+from tnt_mart_plugins import AsyncTnTMartPlugin
 
 # Load environment variables from .env file
 current_dir = pathlib.Path(__file__).parent
 env_path = current_dir / ".env"
 load_dotenv(dotenv_path=env_path)
 
-# Find the correct path to the MCP server script
-mcp_server_path = current_dir / "mcp_server.py"
-
 @cl.on_chat_start
 async def start_chat():
-    # Make sure the server script exists
-    if not mcp_server_path.exists():
-        await cl.Message(content=f"Error: MCP server script not found at {mcp_server_path}").send()
+    # Check a connected MCP plugin out of the warm pool (see pgsql_mcp.py)
+    try:
+        mcp_plugin = await pgsql_plugin_pool().checkout()
+    except FileNotFoundError as e:
+        await cl.Message(content=f"Error: {str(e)}").send()
         return
+    cl.user_session.set("mcp_plugin", mcp_plugin)
 
     # Initialize the kernel
     kernel = Kernel()
@@ -50,18 +50,11 @@ async def start_chat():
     )
 
     kernel.add_service(service)
-    kernel.add_plugin(TnTMartPlugin(), plugin_name="tnt_mart_manager")
-
-    # Configure and use the MCP plugin for our calculator
-    mcp_plugin = MCPStdioPlugin(
-        name="PGSQLMCPServer",
-        command="python",
-        args=[str(mcp_server_path)]  # Use absolute path to our MCP server script
-    )
+    tnt_mart_plugin = AsyncTnTMartPlugin()
+    await tnt_mart_plugin.create_connection()
+    cl.user_session.set("tnt_mart_plugin", tnt_mart_plugin)
+    kernel.add_plugin(tnt_mart_plugin, plugin_name="tnt_mart_manager")
     
-    # It's important to start the plugin process
-    await mcp_plugin.__aenter__()
-
     # Register the MCP plugin with the kernel
     try:
         kernel.add_plugin(mcp_plugin, plugin_name="regular_items_nudge")
@@ -91,16 +84,17 @@ async def start_chat():
                 - Presenting Items: Clearly present the list of regular items to the Customer, including details such as product name, quantity, and price. Make sure to format the information in an easy-to-read manner and include product descriptions where possible.
                 - Encouraging Purchase: Politely nudge Vikas towards making a purchase by highlighting the convenience and benefits of buying his regular items.
                 - Calculating Total: If Vikas asks for the total cost, calculate the sum of the prices of all the suggested items.
-                - Adding to Cart: If Vikas agrees to buy, use the regular_items_nudge plugin first check 
+                - Adding All Regular Items: If Vikas agrees to buy all of his regular items, call add_regular_items_to_cart once with his customer_id instead of querying and comparing the tables yourself. It adds the missing items, leaves items already in the cart as they are and returns a summary of what was added and what was already there; share that summary with him. If he then wants the items already in his cart reset to his regular quantities, call it again with update_existing set to true.
+                - Adding to Cart: If Vikas agrees to buy only some of the items, use the regular_items_nudge plugin first check 
                     - if the same items are already present. 
                     - Only if they are not, add the items to his shopping_cart. 
                     - You MUST ENSURE that only the products in the customer_regular_items for this customer are added in the shopping_cart. DO NOT add random products to the cart.
-                    - You will need to execute an SQL `INSERT` statement. Ensure you include the correct `customer_id`, `product_id`, `quantity`, and `unit_price` for each item. 
+                    - Add all of the items with a single call to bulk_add_to_cart, passing the `customer_id` and a list of items with the correct `product_id`, `quantity`, and `unit_price` for each. Do not call add_to_cart once per item. Items already in the cart are skipped and reported back by the tool.
                     - After adding the items, you must inform the customer that they have been placed in his cart.
                 - Avoid Duplicates: YOU MUST make sure that the items get added only once to the shopping cart. 
                     - Query the shopping cart before adding items. Use customer_id and product_id combination to verify if an item is already in the cart.
                     - If any of the items is already present, ask the customer if they would like to update the quantity for those items.
-                    - Only if the customer agrees, update the quantity using the tnt_mart_manager plugin. You must fetch and pass the correct customer_id, product_id from the shopping_cart table to the tnt_mart_manager plugin. Note that the customer may provides description of the product and not the product_id or the product_code when asking a particular item to be updated. Write your SQL queries accordingly.
+                    - Only if the customer agrees, update the quantity using the tnt_mart_manager plugin. Update all of the agreed items with a single call to bulk_update_cart rather than one call per item. You must fetch and pass the correct customer_id, product_id from the shopping_cart table to the tnt_mart_manager plugin. Note that the customer may provides description of the product and not the product_id or the product_code when asking a particular item to be updated. Write your SQL queries accordingly.
                     - Only add items that are not already present and provide a summary of what was added to the cart, what was already there and have been updated.
                 - Personalization: Throughout the conversation, use the customer's name to create a more personalized experience.
                 - Handling Rejection: If the customer declines the offer, politely end the conversation.
@@ -116,7 +110,6 @@ async def start_chat():
 
     cl.user_session.set("kernel", kernel)
     cl.user_session.set("history", history)
-    cl.user_session.set("mcp_plugin", mcp_plugin)
 
     await cl.Message(content="TnTMart welcomes you to the customer assistant. This message is to remind you about some regular items you have purchased in the past. Would you like me to continue?").send()
 
@@ -166,5 +159,11 @@ async def on_message(message: cl.Message):
     except Exception as e:
         await cl.Message(content=f"Error: {str(e)}").send()
 
-
-
+@cl.on_chat_end
+async def end_chat():
+    mcp_plugin = cl.user_session.get("mcp_plugin")
+    if mcp_plugin:
+        await pgsql_plugin_pool().checkin(mcp_plugin)
+    tnt_mart_plugin = cl.user_session.get("tnt_mart_plugin")
+    if tnt_mart_plugin:
+        await tnt_mart_plugin.close_connection()
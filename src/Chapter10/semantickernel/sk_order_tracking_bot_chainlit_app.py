@@ -6,7 +6,6 @@ from dotenv import load_dotenv
 from semantic_kernel import Kernel
 from semantic_kernel.connectors.ai.open_ai import OpenAIChatPromptExecutionSettings
 from semantic_kernel.connectors.ai.function_choice_behavior import FunctionChoiceBehavior
-from semantic_kernel.connectors.mcp import MCPStdioPlugin
 from semantic_kernel.contents import ChatHistory
 from semantic_kernel.contents.streaming_chat_message_content import StreamingChatMessageContent
 from semantic_kernel.contents.utils.author_role import AuthorRole
@@ -15,7 +14,8 @@ from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
 from semantic_kernel.functions import kernel_function
 
 import chainlit as cl
-from tnt_mart_plugins import TnTMartPlugin
+from pgsql_mcp import pgsql_plugin_pool
+from tnt_mart_plugins import AsyncTnTMartPlugin
 
 
 # Load environment variables from .env file
@@ -23,15 +23,15 @@ current_dir = pathlib.Path(__file__).parent
 env_path = current_dir / ".env"
 load_dotenv(dotenv_path=env_path)
 
-# Find the correct path to the MCP server script
-mcp_server_path = current_dir / "mcp_server.py"
-
 @cl.on_chat_start
 async def start_chat():
-    # Make sure the server script exists
-    if not mcp_server_path.exists():
-        await cl.Message(content=f"Error: MCP server script not found at {mcp_server_path}").send()
+    # Check a connected MCP plugin out of the warm pool (see pgsql_mcp.py)
+    try:
+        mcp_plugin = await pgsql_plugin_pool().checkout()
+    except FileNotFoundError as e:
+        await cl.Message(content=f"Error: {str(e)}").send()
         return
+    cl.user_session.set("mcp_plugin", mcp_plugin)
 
     # Initialize the kernel
     kernel = Kernel()
@@ -51,19 +51,11 @@ async def start_chat():
     )
 
     kernel.add_service(service)
-    kernel.add_plugin(TnTMartPlugin(), plugin_name="getETA")
-    
-
-    # Configure and use the MCP plugin for our calculator
-    mcp_plugin = MCPStdioPlugin(
-        name="PGSQLMCPServer",
-        command="python",
-        args=[str(mcp_server_path)]  # Use absolute path to our MCP server script
-    )
+    tnt_mart_plugin = AsyncTnTMartPlugin()
+    await tnt_mart_plugin.create_connection()
+    cl.user_session.set("tnt_mart_plugin", tnt_mart_plugin)
+    kernel.add_plugin(tnt_mart_plugin, plugin_name="getETA")
     
-    # It's important to start the plugin process
-    await mcp_plugin.__aenter__()
-
     # Register the MCP plugin with the kernel
     try:
         kernel.add_plugin(mcp_plugin, plugin_name="order_tracking_plugin")
@@ -83,43 +75,32 @@ async def start_chat():
                 Your goal is to act as a helpful assistant for **TnTMart** and encourage customer **Shweta Kamath ** (customer ID: **4**) to track her order. 
                 You'll use the **order_tracker** plugin to access customer and product data, manage their shopping cart, and personalize the conversation.
                 You must use the Schema Definitions section below to understand the structure of the database tables.
+                When a step needs data from several tables, use the **execute_batch** tool to run all the SELECT statements in a single call instead of calling **execute_query** once per table.
                 Here is a breakdown of the specific actions you need to take, DO NOT MISS ANY STEP and DO NOT DEVIATE FROM THE STEPS at any cost:
 
                 * **Initial Engagement**: Begin by warmly greeting Shweta by name and asking if he would like to track her order.
                 * **Get order Details**: 
-                    * Retrieve the orders from the orders table where status is "Dispatched" or "Ready to dispatch".
-                    * Summarize the order details based on the information present in the orders table including order id, order date, total amount, status and expected delivery date.
+                    * Call the **get_order_summary** tool with her customer id and the statuses "Dispatched" and "Ready to dispatch". It returns every matching order with its items, amounts, payment state and delivery dates in one call; do not query the orders, order_item, product and payment tables for this yourself.
+                    * Summarize the order details from that response including order id, order date, total amount, status and expected delivery date.
                     * Ask if she would like to know more details of any specific order?
                 * Next, you need to provide details of orders which the customer is interested in. For each order:
                     * Check if the status is either "Dispatched" or "Ready to dispatch".
                         * if the order is "Dispatched", do the following:
-                            * Retrieve the order items details from the order_item table based on the order id.
-                            * For each product id, check the warehouse_product table to find which warehouse has the product in stock.
-                            * For each warehouse that has the product, get the warehouse details from the warehouse table.
-                            * Next, get the address of the customer from the address table. The user_id in address table is same as customer_id in customer table.
-                            * And, get the address of the warehouse from warehouse table.
-                            * By comparing the two locations, determine whether the warehouse is in the same state as the customer.
-                            * If the warehouse is in the same state as the customer, pass the value "Local" to the getETA function of LocationPlugin.
-                            * If the warehouse is not in the same state as the customer , pass the value "Non-Local" to the getETA function of LocationPlugin.
-                            * Use the response from the **getETA** function from the **LocationPlugin** to provide an estimated ETA for the order.
+                            * Call the **get_order_eta** tool with the order id. For every item of the order it returns the nearest warehouse that has the product in stock, whether that warehouse is "Local" or "Non-Local" to the customer and the ETA, followed by the ETA of the whole order. Do not query the order_item, warehouse_product, warehouse and address tables to work this out yourself.
+                            * Use the response from the **get_order_eta** tool to provide the ETA for the order and tell the customer which items ship from a Local or a Non-Local warehouse.
                             * DO NOT MISS to provide all the details to the customer at the end of this step.
 
                         * if the order is "Ready to dispatch", do the following:
-                            * Retrieve the order items details from the order_item table based on the order id.
-                            * For each product id, check the warehouse_product table to find which warehouse has the product in stock.
-                            * For each warehouse that has the product, get the warehouse details from the warehouse table.
-                            * Next, get the address of the customer from the address table. The user_id in address table is same as customer_id in customer table.
-                            * And, get the address of the warehouse from warehouse table.
-                            * By comparing the two locations, determine whether the warehouse is in the same state as the customer.
-                            * If the warehouse is in the same state as the customer:
-                                * pass the value "Local" to the getETA function of LocationPlugin.
-                            * If the warehouse is not in the same state as the customer , 
-                                * pass the value "Non-Local" to the getETA function of LocationPlugin.
+                            * Call the **get_order_eta** tool with the order id. For every item of the order it returns the nearest warehouse that has the product in stock, whether that warehouse is "Local" or "Non-Local" to the customer and the ETA, followed by the ETA of the whole order. Do not query the order_item, warehouse_product, warehouse and address tables to work this out yourself.
+                            * If all items are "Local":
+                                * provide the ETA returned by **get_order_eta**.
+                            * If any item is "Non-Local":
+                                * Call the **get_nearest_warehouses** tool with the order id and tell the customer how far the nearest warehouse stocking each Non-Local item is and its distance-based ETA.
                                 * Inform the customer that since the product is not available in the same state as hers, we might need to source it from a different state.
                                 * Inform the customer that this might lead to a difference in payment and she will need to pay the difference if the amount is more.
                                 * If the customer agrees to pay the difference, insert a new record in the payment table where the amount is the difference between the original amount and the new amount.
                                 * Also, update the order_item table to reflect the new product_id, quantity and amount for the specific order.
-                                * Once the database updates are done, confirm to the custoer that the order has been updated and provide the new ETA by passing the value "Local" to the getETA function of LocationPlugin.
+                                * Once the database updates are done, confirm to the custoer that the order has been updated and provide the new ETA by calling **get_order_eta** again.
                             * DO NOT MISS to provide all the details to the customer once all the above is done and you have the information.
 
         
@@ -140,7 +121,6 @@ async def start_chat():
         )
     cl.user_session.set("kernel", kernel)
     cl.user_session.set("history", history)
-    cl.user_session.set("mcp_plugin", mcp_plugin)
 
     await cl.Message(content="TnTMart welcomes you to the customer assistant. This message is to track your orders. Would you like me to continue?").send()    
 
@@ -189,3 +169,12 @@ async def on_message(message: cl.Message):
 
     except Exception as e:
         await cl.Message(content=f"Error: {str(e)}").send()
+
+@cl.on_chat_end
+async def end_chat():
+    mcp_plugin = cl.user_session.get("mcp_plugin")
+    if mcp_plugin:
+        await pgsql_plugin_pool().checkin(mcp_plugin)
+    tnt_mart_plugin = cl.user_session.get("tnt_mart_plugin")
+    if tnt_mart_plugin:
+        await tnt_mart_plugin.close_connection()
@@ -7,7 +7,6 @@ from dotenv import load_dotenv
 from semantic_kernel import Kernel
 from semantic_kernel.connectors.ai.open_ai import OpenAIChatPromptExecutionSettings
 from semantic_kernel.connectors.ai.function_choice_behavior import FunctionChoiceBehavior
-from semantic_kernel.connectors.mcp import MCPStdioPlugin
 from semantic_kernel.contents import ChatHistory
 from semantic_kernel.contents.streaming_chat_message_content import StreamingChatMessageContent
 from semantic_kernel.contents.utils.author_role import AuthorRole
@@ -15,22 +14,23 @@ from semantic_kernel.functions import KernelArguments
 from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
 
 import chainlit as cl
-from tnt_mart_plugins import TnTMartPlugin
+from pgsql_mcp import pgsql_plugin_pool
+from tnt_mart_plugins import AsyncTnTMartPlugin
 
 # Load environment variables from .env file
 current_dir = pathlib.Path(__file__).parent
 env_path = current_dir / ".env"
 load_dotenv(dotenv_path=env_path)
 
-# Find the correct path to the MCP server script
-mcp_server_path = current_dir / "mcp_server.py"
-
 @cl.on_chat_start
 async def start_chat():
-    # Make sure the server script exists
-    if not mcp_server_path.exists():
-        await cl.Message(content=f"Error: MCP server script not found at {mcp_server_path}").send()
+    # Check a connected MCP plugin out of the warm pool (see pgsql_mcp.py)
+    try:
+        mcp_plugin = await pgsql_plugin_pool().checkout()
+    except FileNotFoundError as e:
+        await cl.Message(content=f"Error: {str(e)}").send()
         return
+    cl.user_session.set("mcp_plugin", mcp_plugin)
 
     # Initialize the kernel
     kernel = Kernel()
@@ -50,18 +50,11 @@ async def start_chat():
     )
 
     kernel.add_service(service)
-    kernel.add_plugin(TnTMartPlugin(), plugin_name="tnt_mart_manager")
-
-    # Configure and use the MCP plugin for our calculator
-    mcp_plugin = MCPStdioPlugin(
-        name="PGSQLMCPServer",
-        command="python",
-        args=[str(mcp_server_path)]  # Use absolute path to our MCP server script
-    )
+    tnt_mart_plugin = AsyncTnTMartPlugin()
+    await tnt_mart_plugin.create_connection()
+    cl.user_session.set("tnt_mart_plugin", tnt_mart_plugin)
+    kernel.add_plugin(tnt_mart_plugin, plugin_name="tnt_mart_manager")
     
-    # It's important to start the plugin process
-    await mcp_plugin.__aenter__()
-
     # Register the MCP plugin with the kernel
     try:
         kernel.add_plugin(mcp_plugin, plugin_name="refund_status_plugin")
@@ -144,7 +137,6 @@ async def start_chat():
 
     cl.user_session.set("kernel", kernel)
     cl.user_session.set("history", history)
-    cl.user_session.set("mcp_plugin", mcp_plugin)
 
     await cl.Message(content="TnTMart welcomes you to the customer assistant. Type Hello to start the conversation now.").send()
 
@@ -202,4 +194,13 @@ async def on_message(message: cl.Message):
         history.add_assistant_message(full_response)
 
     except Exception as e:
-        await cl.Message(content=f"Error: {str(e)}").send()
\ No newline at end of file
+        await cl.Message(content=f"Error: {str(e)}").send()
+
+@cl.on_chat_end
+async def end_chat():
+    mcp_plugin = cl.user_session.get("mcp_plugin")
+    if mcp_plugin:
+        await pgsql_plugin_pool().checkin(mcp_plugin)
+    tnt_mart_plugin = cl.user_session.get("tnt_mart_plugin")
+    if tnt_mart_plugin:
+        await tnt_mart_plugin.close_connection()
@@ -0,0 +1,286 @@
+"""
+Shared, thread-safe database access for the TnT Mart tools.
+
+All tool calls in a process borrow connections from one psycopg2
+ThreadedConnectionPool instead of sharing a single connection. A connection is
+checked out per call, used through context-managed cursors and returned to the pool
+afterwards, or discarded if it broke. A write whose connection turns out to be dead
+is retried once on a new connection, so a database restart does not fail every
+session's next tool call.
+
+Async callers use `run_async` / `execute_write_async`, which run the same calls on a
+bounded thread pool (one worker per pooled connection), so a slow commit does not
+block the event loop shared by every chat session in the process.
+
+Configuration (read from the environment / .env file):
+- DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT: connection parameters.
+- DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE: connections kept open / allowed at once.
+- DB_POOL_ACQUIRE_TIMEOUT: seconds to wait for a free connection.
+"""
+
+import asyncio
+import functools
+import os
+import pathlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import psycopg2
+from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+# Channel the PGSQL MCP server listens on to invalidate its cached query results.
+TABLE_CHANGES_CHANNEL = "tnt_mart_table_changes"
+
+
+class PoolExhaustedError(Exception):
+    """Raised when no pooled connection frees up within the acquire timeout."""
+
+
+_pool: ThreadedConnectionPool | None = None
+_slots: threading.BoundedSemaphore | None = None
+_executor: ThreadPoolExecutor | None = None
+_sessions = 0
+_lock = threading.Lock()
+
+
+def notify_table_change(cursor, table: str) -> None:
+    """Announces a write to `table`; delivered to listeners when the transaction commits."""
+    cursor.execute("select pg_notify(%s, %s);", (TABLE_CHANGES_CHANNEL, table))
+
+
+def open_pool() -> tuple[ThreadedConnectionPool, threading.BoundedSemaphore]:
+    """Returns the process-wide pool and its checkout slots, creating them on first use."""
+    global _pool, _slots
+    with _lock:
+        if _pool is None:
+            load_dotenv(dotenv_path=pathlib.Path(__file__).parent / ".env")
+            max_size = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+            # A rebuilt pool opens connections as they are needed: connections of the
+            # old pool may still be checked out.
+            min_size = int(os.getenv("DB_POOL_MIN_SIZE", "1")) if _slots is None else 0
+            _pool = ThreadedConnectionPool(
+                min_size,
+                max_size,
+                dbname=os.getenv("DB_NAME"),
+                user=os.getenv("DB_USER"),
+                password=os.getenv("DB_PASSWORD"),
+                host=os.getenv("DB_HOST"),
+                port=os.getenv("DB_PORT"),
+            )
+            if _slots is None:
+                # ThreadedConnectionPool raises instead of waiting once all connections
+                # are in use; the semaphore makes callers queue for a free one. It
+                # outlives a rebuilt pool, so connections still checked out from the
+                # old pool count against DB_POOL_MAX_SIZE too.
+                _slots = threading.BoundedSemaphore(max_size)
+        return _pool, _slots
+
+
+def _drop_pool(pool: ThreadedConnectionPool) -> None:
+    # A dead connection usually means the server restarted and every idle connection
+    # is dead too; start over with a new pool. The old pool's idle connections are
+    # closed now, the ones still checked out when they are returned (see `connection`).
+    global _pool
+    with _lock:
+        if _pool is not pool:
+            return
+        _pool = None
+    # psycopg2 has no public call for this: closeall() would also close connections
+    # other threads are still using.
+    with pool._lock:
+        idle, pool._pool = pool._pool, []
+    for conn in idle:
+        conn.close()
+
+
+def attach() -> None:
+    """Registers a chat session using the tools, opening the pool if needed."""
+    global _sessions
+    open_pool()
+    with _lock:
+        _sessions += 1
+
+
+def detach() -> None:
+    """Unregisters a chat session; the last one to leave closes the pool."""
+    global _sessions, _pool
+    with _lock:
+        _sessions = max(0, _sessions - 1)
+        if _sessions or _pool is None:
+            return
+        pool, _pool = _pool, None
+    pool.closeall()
+
+
+@contextmanager
+def connection():
+    """
+    Checks a connection out of the pool for the duration of the `with` block.
+
+    The transaction is rolled back if the block raises. Broken connections are
+    discarded instead of being returned to the pool.
+    """
+    pool, slots = open_pool()
+    if not slots.acquire(timeout=float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10"))):
+        raise PoolExhaustedError("Timed out waiting for a free database connection.")
+    conn = None
+    try:
+        conn = pool.getconn()
+        yield conn
+    except BaseException:
+        if conn is not None and not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass
+        raise
+    finally:
+        if conn is not None:
+            if conn.closed:
+                _drop_pool(pool)
+            try:
+                pool.putconn(conn, close=conn.closed or pool is not _pool)
+            except PoolError:
+                # The pool was closed while the connection was checked out.
+                conn.close()
+        slots.release()
+
+
+def _run(statement, table: str | None):
+    # Runs `statement(cursor)` and commits it, retrying once on a new connection if
+    # the connection turned out to be dead before the commit was attempted. Without
+    # a `table` the statement only reads and is neither announced nor committed.
+    for attempt in (1, 2):
+        conn = None
+        committing = False
+        try:
+            with connection() as conn:
+                with conn.cursor() as cursor:
+                    result = statement(cursor)
+                    if table is not None:
+                        notify_table_change(cursor, table)
+                if table is None:
+                    conn.rollback()
+                else:
+                    committing = True
+                    conn.commit()
+                return result
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            reconnect = conn is None or conn.closed
+            if attempt == 2 or committing or not reconnect:
+                raise
+            print("Database connection lost, retrying on a new connection...")
+
+
+def execute_read(query: str, params: tuple | dict) -> list[tuple]:
+    """
+    Runs one read-only query on a pooled connection.
+
+    Retried once on a new connection if the connection is dead.
+
+    Returns:
+        The rows of the result.
+    """
+
+    def statement(cursor) -> list[tuple]:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+    return _run(statement, None)
+
+
+def execute_write(query: str, params: tuple, table: str) -> int:
+    """
+    Runs one write statement on `table` in its own transaction.
+
+    The change is announced on TABLE_CHANGES_CHANNEL. If the statement fails because
+    the connection is dead, it is retried once on a new connection; a failure
+    while committing is not retried, as the commit may already have been applied.
+
+    Returns:
+        The number of rows affected.
+    """
+
+    def statement(cursor) -> int:
+        cursor.execute(query, params)
+        return cursor.rowcount
+
+    return _run(statement, table)
+
+
+def execute_write_returning(query: str, params: tuple | dict, table: str) -> list[tuple]:
+    """
+    Runs one write statement on `table` that returns rows, in its own transaction.
+
+    Retries as `execute_write` does.
+
+    Returns:
+        The rows produced by the statement.
+    """
+
+    def statement(cursor) -> list[tuple]:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+    return _run(statement, table)
+
+
+def execute_values_write(query: str, rows: list[tuple], table: str, template: str | None = None) -> list[tuple]:
+    """
+    Runs one multi-row write statement on `table` in its own transaction.
+
+    `query` contains a single `VALUES %s` placeholder that is expanded to all of
+    `rows` (see psycopg2.extras.execute_values), so any number of rows costs one
+    round trip and one commit. Retries as `execute_write` does.
+
+    Returns:
+        The rows produced by the statement's RETURNING clause, if any.
+    """
+
+    def statement(cursor) -> list[tuple]:
+        # One page, so that RETURNING yields the rows of the whole batch.
+        return execute_values(cursor, query, rows, template=template, page_size=max(1, len(rows)), fetch=True)
+
+    return _run(statement, table)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+                thread_name_prefix="tnt-mart-db",
+            )
+        return _executor
+
+
+async def run_async(fn, *args, **kwargs):
+    """Runs a blocking database call on the bounded executor and awaits its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(fn, *args, **kwargs))
+
+
+async def execute_read_async(query: str, params: tuple | dict) -> list[tuple]:
+    """Async variant of `execute_read`."""
+    return await run_async(execute_read, query, params)
+
+
+async def execute_write_async(query: str, params: tuple, table: str) -> int:
+    """Async variant of `execute_write`."""
+    return await run_async(execute_write, query, params, table)
+
+
+async def execute_write_returning_async(query: str, params: tuple | dict, table: str) -> list[tuple]:
+    """Async variant of `execute_write_returning`."""
+    return await run_async(execute_write_returning, query, params, table)
+
+
+async def execute_values_write_async(
+    query: str, rows: list[tuple], table: str, template: str | None = None
+) -> list[tuple]:
+    """Async variant of `execute_values_write`."""
+    return await run_async(execute_values_write, query, rows, table, template)
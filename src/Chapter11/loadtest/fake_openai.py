@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+A deterministic, local stand-in for the Azure OpenAI endpoints used by the bots.
+
+It serves the two APIs the Chapter 10/11 apps call:
+
+- `POST .../responses` (Agent Framework's AzureOpenAIResponsesClient)
+- `POST .../chat/completions`, streaming or not (Semantic Kernel's AzureChatCompletion)
+
+The replies follow a fixed script instead of a model: when the latest input is a user
+message and the request offers one of the tools in SCRIPTED_TOOL_CALLS, the reply is a
+call to that tool with the scripted arguments; otherwise (e.g. after a tool result) the
+reply is a short text answer. An optional per-request delay stands in for model
+latency, so the load test measures the app and its tools rather than the network.
+
+Run it with `python fake_openai.py --port 8765`, then point AZURE_OPENAI_ENDPOINT at
+http://127.0.0.1:8765.
+"""
+
+import argparse
+import itertools
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Tool name -> arguments, in order of preference. Semantic Kernel prefixes tool names
+# with their plugin ("order_tracking_plugin-execute_query"); the prefix is ignored.
+SCRIPTED_TOOL_CALLS = {
+    "execute_query": {
+        "query": "SELECT o.order_id, o.status, o.expected_delivery_date "
+        "FROM orders o WHERE o.customer_id = 1 ORDER BY o.order_date DESC"
+    },
+    "get_weather": {"city": "Paris"},
+}
+
+_ids = itertools.count(1)
+
+
+def _next_id(prefix: str) -> str:
+    return f"{prefix}_{next(_ids):08d}"
+
+
+def _scripted_call(tool_names: list[str]) -> tuple[str, dict] | None:
+    """Returns the (full tool name, arguments) to call, or None to answer in text."""
+    for scripted, arguments in SCRIPTED_TOOL_CALLS.items():
+        for name in tool_names:
+            if name.rsplit("-", 1)[-1] == scripted:
+                return name, arguments
+    return None
+
+
+def _answer(tool_output: str | None) -> str:
+    if tool_output is None:
+        return "Hello! How can I help you today?"
+    return f"Here is what I found: {tool_output[:200]}"
+
+
+# --- Responses API ---
+def _responses_reply(body: dict) -> dict:
+    items = body.get("input")
+    if isinstance(items, str):
+        items = [{"role": "user", "content": items}]
+    last = items[-1] if items else {}
+    tool_names = [t.get("name") for t in body.get("tools") or [] if t.get("type") == "function"]
+
+    call = None if last.get("type") == "function_call_output" else _scripted_call(tool_names)
+    if call:
+        name, arguments = call
+        output = [
+            {
+                "type": "function_call",
+                "id": _next_id("fc"),
+                "call_id": _next_id("call"),
+                "name": name,
+                "arguments": json.dumps(arguments),
+                "status": "completed",
+            }
+        ]
+    else:
+        tool_output = last.get("output") if last.get("type") == "function_call_output" else None
+        output = [
+            {
+                "type": "message",
+                "id": _next_id("msg"),
+                "role": "assistant",
+                "status": "completed",
+                "content": [
+                    {"type": "output_text", "text": _answer(tool_output), "annotations": []}
+                ],
+            }
+        ]
+    return {
+        "id": _next_id("resp"),
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": "completed",
+        "model": body.get("model", "fake"),
+        "output": output,
+        "parallel_tool_calls": True,
+        "tool_choice": body.get("tool_choice", "auto"),
+        "tools": body.get("tools") or [],
+        "usage": {
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "total_tokens": 0,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens_details": {"reasoning_tokens": 0},
+        },
+    }
+
+
+# --- Chat Completions API ---
+def _chat_reply(body: dict) -> tuple[dict, str]:
+    """Returns the assistant message and its finish reason."""
+    messages = body.get("messages") or []
+    last = messages[-1] if messages else {}
+    tool_names = [t["function"]["name"] for t in body.get("tools") or [] if t.get("function")]
+
+    call = None if last.get("role") == "tool" else _scripted_call(tool_names)
+    if call:
+        name, arguments = call
+        tool_call = {
+            "id": _next_id("call"),
+            "type": "function",
+            "function": {"name": name, "arguments": json.dumps(arguments)},
+        }
+        return {"role": "assistant", "content": None, "tool_calls": [tool_call]}, "tool_calls"
+    tool_output = last.get("content") if last.get("role") == "tool" else None
+    if isinstance(tool_output, list):
+        tool_output = " ".join(part.get("text", "") for part in tool_output)
+    return {"role": "assistant", "content": _answer(tool_output)}, "stop"
+
+
+def _chat_completion(body: dict) -> dict:
+    message, finish_reason = _chat_reply(body)
+    return {
+        "id": _next_id("chatcmpl"),
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+def _chat_chunks(body: dict):
+    """Yields the streamed form of the reply, one chunk per word for text answers."""
+    message, finish_reason = _chat_reply(body)
+    chunk_id, created = _next_id("chatcmpl"), int(time.time())
+
+    def chunk(delta: dict, finish: str | None = None) -> dict:
+        return {
+            "id": chunk_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+        }
+
+    if "tool_calls" in message:
+        calls = [dict(call, index=i) for i, call in enumerate(message["tool_calls"])]
+        yield chunk({"role": "assistant", "tool_calls": calls})
+    else:
+        yield chunk({"role": "assistant", "content": ""})
+        for word in message["content"].split(" "):
+            yield chunk({"content": word + " "})
+    yield chunk({}, finish_reason)
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Routes requests by path suffix, so Azure and OpenAI style URLs both work."""
+
+    protocol_version = "HTTP/1.1"
+    latency: float = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.latency:
+            time.sleep(self.latency)
+
+        if path.endswith("/responses"):
+            self._send_json(200, _responses_reply(body))
+        elif path.endswith("/chat/completions") and body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for chunk in _chat_chunks(body):
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+        elif path.endswith("/chat/completions"):
+            self._send_json(200, _chat_completion(body))
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {path}"}})
+
+
+def serve(host: str, port: int, latency_ms: float) -> ThreadingHTTPServer:
+    """Creates the server; call `serve_forever()` on it to start handling requests."""
+    handler = type("Handler", (FakeOpenAIHandler,), {"latency": latency_ms / 1000})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every reply")
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.latency_ms)
+    print(f"Fake OpenAI endpoint listening on http://{args.host}:{server.server_port}", flush=True)
+    server.serve_forever()
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Load test for the Chainlit bots of Chapters 10 and 11.
+
+Drives the `on_chat_start`, `on_message` and `on_chat_end` handlers of one Chainlit app
+with N simulated users, in-process and without a browser. Each user gets its own
+Chainlit HTTP context, so `cl.user_session` and `cl.Message` behave as they do in a
+real session. The LLM is replaced by the scripted, local server in `fake_openai.py`;
+the database is either the one configured through the usual DB_* variables or a
+disposable Postgres container loaded with `resources/scripts/script.sql` and the
+schema migrations next to it.
+
+Reported: throughput, p50/p95/p99 latency of session start and of each message, the
+memory added per concurrent session and the number of subprocesses (e.g. stdio MCP
+servers) at peak.
+
+Example:
+    python run_load.py ../../Chapter10/agentframework/order_tracking_bot_chainlit_app.py \\
+        --users 50 --messages 3 --postgres docker
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import inspect
+import json
+import os
+import pathlib
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+HERE = pathlib.Path(__file__).resolve().parent
+SCHEMA_SQL = HERE.parents[2] / "resources" / "scripts" / "script.sql"
+MIGRATIONS_DIR = SCHEMA_SQL.parent / "migrations"
+DEFAULT_MESSAGES = [
+    "Yes, please continue.",
+    "What is the status of my orders?",
+    "What's the weather in Paris?",
+]
+
+
+# --- Process Metrics ---
+def _parents() -> dict[int, int]:
+    """Maps every running pid to its parent pid (Linux /proc)."""
+    parents = {}
+    for entry in pathlib.Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        # The command name may contain spaces; the parent pid follows its closing ")".
+        parents[int(entry.name)] = int(stat.rsplit(")", 1)[1].split()[1])
+    return parents
+
+
+def process_tree(root: int, exclude: set[int]) -> list[int]:
+    """Returns `root` and all of its descendants, minus `exclude` and theirs."""
+    children: dict[int, list[int]] = {}
+    for pid, ppid in _parents().items():
+        children.setdefault(ppid, []).append(pid)
+    tree, stack = [], [root]
+    while stack:
+        pid = stack.pop()
+        if pid in exclude:
+            continue
+        tree.append(pid)
+        stack.extend(children.get(pid, []))
+    return tree
+
+
+def rss_bytes(pid: int) -> int:
+    try:
+        for line in pathlib.Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+class ResourceSampler:
+    """Samples RSS and subprocess count of this process tree while the test runs."""
+
+    def __init__(self, exclude: set[int], interval: float = 0.25):
+        self.exclude = exclude
+        self.interval = interval
+        self.baseline_rss = 0
+        self.peak_rss = 0
+        self.peak_subprocesses = 0
+        self._task: asyncio.Task | None = None
+
+    def sample(self) -> tuple[int, int]:
+        tree = process_tree(os.getpid(), self.exclude)
+        return sum(rss_bytes(pid) for pid in tree), len(tree) - 1
+
+    def record(self) -> None:
+        rss, subprocesses = self.sample()
+        self.peak_rss = max(self.peak_rss, rss)
+        self.peak_subprocesses = max(self.peak_subprocesses, subprocesses)
+
+    async def _run(self) -> None:
+        while True:
+            self.record()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self.baseline_rss, _ = self.sample()
+        self.peak_rss = self.baseline_rss
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+# --- Test Fixtures ---
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def fake_openai(latency_ms: float):
+    """Starts `fake_openai.py` in a subprocess and yields (pid, endpoint)."""
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, str(HERE / "fake_openai.py"), "--port", str(port), "--latency-ms", str(latency_ms)],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        proc.stdout.readline()  # Printed once the server is listening.
+        yield proc.pid, f"http://127.0.0.1:{port}"
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+@contextmanager
+def disposable_postgres(image: str, timeout: float = 120):
+    """Runs Postgres in a throwaway container loaded with script.sql and the migrations; yields DB_* vars."""
+    name = f"tnt-mart-loadtest-{uuid.uuid4().hex[:8]}"
+    port = _free_port()
+    # The entrypoint runs init scripts in name order: the schema first, then the migrations.
+    migrations = [
+        arg
+        for path in sorted(MIGRATIONS_DIR.glob("*.sql"))
+        for arg in ("-v", f"{path}:/docker-entrypoint-initdb.d/02-{path.name}:ro")
+    ]
+    subprocess.run(
+        [
+            "docker", "run", "--rm", "-d", "--name", name,
+            "-e", "POSTGRES_PASSWORD=loadtest", "-e", "POSTGRES_DB=tntmart",
+            "-p", f"127.0.0.1:{port}:5432",
+            "-v", f"{SCHEMA_SQL}:/docker-entrypoint-initdb.d/01-script.sql:ro",
+            *migrations,
+            image,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    try:
+        # The init scripts run against a socket-only server; TCP answers once they are done.
+        deadline = time.monotonic() + timeout
+        while subprocess.run(
+            ["docker", "exec", name, "pg_isready", "-h", "127.0.0.1", "-U", "postgres"],
+            capture_output=True,
+        ).returncode != 0:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Postgres container {name} did not become ready")
+            time.sleep(0.5)
+        yield {
+            "DB_NAME": "tntmart",
+            "DB_USER": "postgres",
+            "DB_PASSWORD": "loadtest",
+            "DB_HOST": "127.0.0.1",
+            "DB_PORT": str(port),
+        }
+    finally:
+        subprocess.run(["docker", "rm", "-f", name], capture_output=True)
+
+
+def load_app(path: pathlib.Path):
+    """Imports a Chainlit app module and returns its registered handlers."""
+    # Importing chainlit creates a .chainlit config folder in the app root.
+    os.environ.setdefault("CHAINLIT_APP_ROOT", tempfile.mkdtemp(prefix="chainlit-loadtest-"))
+    sys.path.insert(0, str(path.parent))
+    spec = importlib.util.spec_from_file_location(path.stem, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    from chainlit.config import config
+
+    return config.code
+
+
+async def _call(handler, *args) -> None:
+    # Chainlit's wrapper reports exceptions to the UI and swallows them; call the
+    # user's function directly so that failures are counted.
+    fn = getattr(handler, "__wrapped__", handler)
+    result = fn(*args)
+    if inspect.isawaitable(result):
+        await result
+
+
+# --- Simulated Users ---
+@dataclass
+class UserResult:
+    start_seconds: float | None = None
+    message_seconds: list[float] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+
+
+async def simulate_user(
+    code, sampler: ResourceSampler, delay: float, messages: list[str], think_time: float
+) -> UserResult:
+    """Runs one chat session: start, send `messages` in turn, end."""
+    import chainlit as cl
+    from chainlit.context import init_http_context
+
+    result = UserResult()
+    await asyncio.sleep(delay)
+    init_http_context(thread_id=str(uuid.uuid4()))
+    try:
+        started = time.perf_counter()
+        if code.on_chat_start:
+            await _call(code.on_chat_start)
+        result.start_seconds = time.perf_counter() - started
+        sampler.record()  # Short runs may otherwise end between two periodic samples.
+
+        for text in messages:
+            started = time.perf_counter()
+            await _call(code.on_message, cl.Message(content=text))
+            result.message_seconds.append(time.perf_counter() - started)
+            await asyncio.sleep(think_time)
+    except Exception as e:
+        result.errors.append(f"{type(e).__name__}: {e}")
+    finally:
+        if code.on_chat_end:
+            try:
+                await _call(code.on_chat_end)
+            except Exception as e:
+                result.errors.append(f"on_chat_end: {type(e).__name__}: {e}")
+    return result
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """Nearest-rank percentile, `q` in [0, 100]."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def _latency(values: list[float]) -> dict:
+    return {
+        f"p{q}_ms": None if percentile(values, q) is None else round(1000 * percentile(values, q), 1)
+        for q in (50, 95, 99)
+    }
+
+
+async def run(args, exclude: set[int]) -> dict:
+    code = load_app(args.app)
+    if not code.on_message:
+        raise SystemExit(f"{args.app} does not register an on_message handler")
+    messages = (args.message or DEFAULT_MESSAGES)[: args.messages]
+
+    sampler = ResourceSampler(exclude)
+    sampler.start()
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(
+            simulate_user(code, sampler, i * args.ramp_up / max(1, args.users), messages, args.think_time)
+            for i in range(args.users)
+        )
+    )
+    elapsed = time.perf_counter() - started
+    await sampler.stop()
+
+    starts = [r.start_seconds for r in results if r.start_seconds is not None]
+    latencies = [s for r in results for s in r.message_seconds]
+    errors = [e for r in results for e in r.errors]
+    return {
+        "app": str(args.app),
+        "users": args.users,
+        "messages_per_user": len(messages),
+        "elapsed_s": round(elapsed, 2),
+        "messages_completed": len(latencies),
+        "throughput_msgs_per_s": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "session_start": _latency(starts),
+        "message": _latency(latencies),
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:5],
+        "baseline_rss_mb": round(sampler.baseline_rss / 2**20, 1),
+        "peak_rss_mb": round(sampler.peak_rss / 2**20, 1),
+        "rss_per_session_mb": round((sampler.peak_rss - sampler.baseline_rss) / 2**20 / max(1, args.users), 2),
+        "peak_subprocesses": sampler.peak_subprocesses,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("app", type=lambda p: pathlib.Path(p).resolve(), help="Path to the Chainlit app")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent simulated users")
+    parser.add_argument("--messages", type=int, default=2, help="Messages sent per user")
+    parser.add_argument("--message", action="append", help="Message text (repeatable); overrides the defaults")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Seconds over which users start")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Seconds between a user's messages")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Delay of every fake LLM reply")
+    parser.add_argument(
+        "--postgres",
+        choices=["env", "docker"],
+        default="env",
+        help="Use the DB_* settings from the environment, or a disposable Docker container",
+    )
+    parser.add_argument("--postgres-image", default="postgres:16")
+    parser.add_argument("--json", type=pathlib.Path, help="Also write the report to this file")
+    args = parser.parse_args()
+
+    with fake_openai(args.llm_latency_ms) as (llm_pid, endpoint):
+        # Set before the app loads its .env, which does not override existing variables.
+        os.environ.update(
+            {
+                "AZURE_OPENAI_ENDPOINT": endpoint,
+                "AZURE_OPENAI_API_KEY": "loadtest",
+                "AZURE_OPENAI_API_VERSION": "2025-03-01-preview",
+                "AZURE_OPENAI_RESPONSES_DEPLOYMENT_NAME": "loadtest",
+                "AZURE_OPENAI_CHAT_COMPLETION_MODEL": "loadtest",
+            }
+        )
+        if args.postgres == "docker":
+            with disposable_postgres(args.postgres_image) as db_env:
+                os.environ.update(db_env)
+                report = asyncio.run(run(args, exclude={llm_pid}))
+        else:
+            report = asyncio.run(run(args, exclude={llm_pid}))
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
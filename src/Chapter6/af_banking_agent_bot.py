@@ -13,8 +13,12 @@ from agent_framework import (
 from agent_framework.azure import AzureOpenAIChatClient
 from dotenv import load_dotenv
 
+from intent_router import ADDRESS_CHANGE, CARD_UNLOCK, PIN_RESET, IntentRouter
+
 load_dotenv()
 
+intent_router = IntentRouter.from_env()
+
 # tools
 @ai_function(name="investigate_card", description="Investigate a locked card for a customer.")
 def investigate_card(customer_id: str, cardno: str) -> str:
@@ -166,6 +170,19 @@ async def main() -> None:
     
     triage, pin_agent, card_agent, address_update_agent = create_agents(chat_client)
 
+    # Ask for the request first: when the local intent router is sure which specialist
+    # it is for, that specialist coordinates and the triage LLM call is skipped.
+    print("Welcome to the Banking Support Bot!")
+    first_message = input("\nUser: ")
+    if first_message.lower() == 'exit':
+        print("Goodbye!")
+        return
+    coordinator = triage
+    route = intent_router.classify(first_message)
+    if route.intent is not None:
+        coordinator = {CARD_UNLOCK: card_agent, PIN_RESET: pin_agent, ADDRESS_CHANGE: address_update_agent}[route.intent]
+        print(f"Routed to {coordinator.name} by {route.source} ({route.confidence:.2f})")
+
     # Configure multi-tier handoffs using fluent add_handoff() API
     # This allows specialists to hand off to other specialists
     workflow = (
@@ -173,11 +190,12 @@ async def main() -> None:
             name="multi_tier_support",
             participants=[triage, pin_agent, card_agent, address_update_agent],
         )
-        .set_coordinator(triage)
+        .set_coordinator(coordinator)
         .add_handoff(triage, [pin_agent, card_agent, address_update_agent])  # Triage can route to any specialist
-        .add_handoff(card_agent, [pin_agent, address_update_agent])  # Replacement can delegate to delivery or billing
-        .add_handoff(pin_agent, [card_agent, address_update_agent])  # Delivery can escalate to billing
-        .add_handoff(address_update_agent, [pin_agent, card_agent])  # Billing can escalate to other specialists
+        # Every specialist can hand back to triage, which matters when the router made it the coordinator
+        .add_handoff(card_agent, [triage, pin_agent, address_update_agent])  # Replacement can delegate to delivery or billing
+        .add_handoff(pin_agent, [triage, card_agent, address_update_agent])  # Delivery can escalate to billing
+        .add_handoff(address_update_agent, [triage, pin_agent, card_agent])  # Billing can escalate to other specialists
         # Termination condition: Stop when more than 8 user messages exist.
         # This allows agents to respond to the 7th user message before the 8th triggers termination.
         .with_termination_condition(lambda conv: sum(1 for msg in conv if msg.role.value == "user") > 8)
@@ -195,10 +213,8 @@ async def main() -> None:
     # Start the workflow with the initial user message
     # run_stream() returns an async iterator of WorkflowEvent
     print("\n[Starting workflow with initial user message...]")
-    events = await _drain(workflow.run_stream("Hello, I need some assistance, could you help me?"))
+    events = await _drain(workflow.run_stream(first_message))
     pending_requests = _handle_events(events)
-
-    print("Welcome to the Banking Support Bot!")
     
     # Process the request/response cycle
     # The workflow will continue requesting input until:
@@ -1,7 +1,10 @@
 import uuid, asyncio, os, json
-from typing import List, Tuple
+import argparse, socket, subprocess, sys, threading, time
+from typing import Callable, Dict, Iterable, List, Tuple
 
 from autogen_core import (
+    AgentRuntime,
+    CancellationToken,
     FunctionCall,
     MessageContext,
     RoutedAgent,
@@ -9,10 +12,12 @@ from autogen_core import (
     TopicId,
     TypeSubscription,
     message_handler,
+    try_get_known_serializers_for_type,
 )
 from autogen_core.models import (
     AssistantMessage,
     ChatCompletionClient,
+    CreateResult,
     FunctionExecutionResult,
     FunctionExecutionResultMessage,
     LLMMessage,
@@ -26,6 +31,24 @@ from pydantic import BaseModel
 from dotenv import load_dotenv
 load_dotenv()
 
+from context_window import ContextWindow
+from intent_router import ADDRESS_CHANGE, CARD_UNLOCK, PIN_RESET, IntentRouter
+from prompt_prefix import prompt_prefix
+from session_io import HUMAN, USER, ConsoleIO, SessionIO
+
+# Tool calls the model makes in one turn run concurrently, at most this many at a time.
+MAX_CONCURRENT_TOOLS = int(os.getenv("AGENT_MAX_CONCURRENT_TOOLS", "4"))
+# A tool call still running after this many seconds is reported to the model as failed.
+TOOL_TIMEOUT_SECONDS = float(os.getenv("AGENT_TOOL_TIMEOUT_SECONDS", "30"))
+# The conversation an agent sends to the model is compacted to about this many tokens;
+# the last AGENT_CONTEXT_RECENT_TURNS turns are always kept verbatim.
+CONTEXT_WINDOW = ContextWindow(
+    token_budget=int(os.getenv("AGENT_CONTEXT_TOKEN_BUDGET", "4000")),
+    recent_turns=int(os.getenv("AGENT_CONTEXT_RECENT_TURNS", "3")),
+)
+# Sends messages that are clearly a card unlock, PIN reset or address change past triage.
+INTENT_ROUTER = IntentRouter.from_env()
+
 class UserLogin(BaseModel):
     pass
 
@@ -46,46 +69,80 @@ class AIAgent(RoutedAgent):
         delegate_tools: List[Tool],
         agent_topic_type: str,
         user_topic_type: str,
+        io: SessionIO,
+        max_concurrent_tools: int = MAX_CONCURRENT_TOOLS,
+        tool_timeout: float = TOOL_TIMEOUT_SECONDS,
+        context_window: ContextWindow = CONTEXT_WINDOW,
     ) -> None:
         super().__init__(description)
-        self._system_message = system_message
+        # The system message and tool schemas are built once and shared by every session's
+        # agent with the same ones, instead of being rebuilt on every model call.
+        self._prefix = prompt_prefix(system_message, [*tools, *delegate_tools])
         self._model_client = model_client
         self._tools = dict([(tool.name, tool) for tool in tools])
-        self._tool_schema = [tool.schema for tool in tools]
         self._delegate_tools = dict([(tool.name, tool) for tool in delegate_tools])
-        self._delegate_tool_schema = [tool.schema for tool in delegate_tools]
         self._agent_topic_type = agent_topic_type
         self._user_topic_type = user_topic_type
+        self._io = io
+        self._tool_slots = asyncio.Semaphore(max_concurrent_tools)
+        self._tool_timeout = tool_timeout
+        self._context_window = context_window
+
+    async def _call_model(self, context: List[LLMMessage], cancellation_token: CancellationToken) -> CreateResult:
+        return await self._model_client.create(
+            messages=self._prefix.messages(context),
+            tools=self._prefix.tool_schemas,
+            cancellation_token=cancellation_token,
+        )
+
+    async def _execute_tool(self, call: FunctionCall, cancellation_token: CancellationToken) -> FunctionExecutionResult:
+        """Runs one tool call within the concurrency limit and timeout; a failure becomes an error result."""
+        tool = self._tools[call.name]
+        try:
+            arguments = json.loads(call.arguments)
+            async with self._tool_slots:
+                run = asyncio.ensure_future(tool.run_json(arguments, cancellation_token))
+                # Cancelling the message cancels the tool call, and the timeout cancels it through
+                # wait_for. A plain function tool runs in a worker thread, which is left to finish
+                # on its own; only its result is dropped.
+                cancellation_token.link_future(run)
+                result = await asyncio.wait_for(run, timeout=self._tool_timeout)
+            content, is_error = tool.return_value_as_string(result), False
+        except asyncio.TimeoutError:
+            content, is_error = f"Error: {call.name} did not finish within {self._tool_timeout:g} seconds.", True
+        except Exception as e:
+            content, is_error = f"Error: {call.name} failed: {e}", True
+        return FunctionExecutionResult(call_id=call.id, content=content, is_error=is_error, name=call.name)
 
     @message_handler
     async def handle_task(self, message: UserTask, ctx: MessageContext) -> None:
+        # Work on a compacted context, which keeps the prompt and everything passed on bounded.
+        # It is a new list that shares the message objects; those are never modified.
+        context = self._context_window.fit(message.context)
         # Send the task to the LLM.
-        llm_result = await self._model_client.create(
-            messages=[self._system_message] + message.context,
-            tools=self._tool_schema + self._delegate_tool_schema,
-            cancellation_token=ctx.cancellation_token,
-        )
-        print(f"{'-'*80}\n{self.id.type}:\n{llm_result.content}", flush=True)
+        llm_result = await self._call_model(context, ctx.cancellation_token)
+        await self._io.write(self.id.key, self.id.type, str(llm_result.content))
         # Process the LLM result.
         while isinstance(llm_result.content, list) and all(isinstance(m, FunctionCall) for m in llm_result.content):
-            tool_call_results: List[FunctionExecutionResult] = []
             delegate_targets: List[Tuple[str, UserTask]] = []
-            # Process each function call.
             for call in llm_result.content:
-                arguments = json.loads(call.arguments)
-                if call.name in self._tools:
-                    # Execute the tool directly.
-                    result = await self._tools[call.name].run_json(arguments, ctx.cancellation_token)
-                    result_as_str = self._tools[call.name].return_value_as_string(result)
-                    tool_call_results.append(
-                        FunctionExecutionResult(call_id=call.id, content=result_as_str, is_error=False, name=call.name)
-                    )
-                elif call.name in self._delegate_tools:
+                if call.name not in self._tools and call.name not in self._delegate_tools:
+                    raise ValueError(f"Unknown tool: {call.name}")
+            # The calls of one turn are independent: execute them concurrently, so the turn takes
+            # as long as its slowest tool. gather returns the results in call order.
+            tool_calls = [call for call in llm_result.content if call.name in self._tools]
+            tool_call_results: List[FunctionExecutionResult] = list(
+                await asyncio.gather(*(self._execute_tool(call, ctx.cancellation_token) for call in tool_calls))
+            )
+            # Process each delegation.
+            for call in llm_result.content:
+                if call.name in self._delegate_tools:
+                    arguments = json.loads(call.arguments)
                     # Execute the tool to get the delegate agent's topic type.
                     result = await self._delegate_tools[call.name].run_json(arguments, ctx.cancellation_token)
                     topic_type = self._delegate_tools[call.name].return_value_as_string(result)
                     # Create the context for the delegate agent, including the function call and the result.
-                    delegate_messages = list(message.context) + [
+                    delegate_messages = context + [
                         AssistantMessage(content=[call], source=self.id.type),
                         FunctionExecutionResultMessage(
                             content=[
@@ -99,49 +156,46 @@ class AIAgent(RoutedAgent):
                         ),
                     ]
                     delegate_targets.append((topic_type, UserTask(context=delegate_messages)))
-                else:
-                    raise ValueError(f"Unknown tool: {call.name}")
             if len(delegate_targets) > 0:
                 # Delegate the task to other agents by publishing messages to the corresponding topics.
                 for topic_type, task in delegate_targets:
-                    print(f"{'-'*80}\n{self.id.type}:\nDelegating to {topic_type}", flush=True)
+                    await self._io.write(self.id.key, self.id.type, f"Delegating to {topic_type}")
                     await self.publish_message(task, topic_id=TopicId(topic_type, source=self.id.key))
             if len(tool_call_results) > 0:
-                print(f"{'-'*80}\n{self.id.type}:\n{tool_call_results}", flush=True)
+                await self._io.write(self.id.key, self.id.type, str(tool_call_results))
                 # Make another LLM call with the results.
-                message.context.extend(
+                context.extend(
                     [
                         AssistantMessage(content=llm_result.content, source=self.id.type),
                         FunctionExecutionResultMessage(content=tool_call_results),
                     ]
                 )
-                llm_result = await self._model_client.create(
-                    messages=[self._system_message] + message.context,
-                    tools=self._tool_schema + self._delegate_tool_schema,
-                    cancellation_token=ctx.cancellation_token,
-                )
-                print(f"{'-'*80}\n{self.id.type}:\n{llm_result.content}", flush=True)
+                # Tool results can be long, and a task may take many rounds: compact again.
+                context = self._context_window.fit(context)
+                llm_result = await self._call_model(context, ctx.cancellation_token)
+                await self._io.write(self.id.key, self.id.type, str(llm_result.content))
             else:
                 # The task has been delegated, so we are done.
                 return
         # The task has been completed, publish the final result.
         assert isinstance(llm_result.content, str)
-        message.context.append(AssistantMessage(content=llm_result.content, source=self.id.type))
+        context.append(AssistantMessage(content=llm_result.content, source=self.id.type))
         await self.publish_message(
-            AgentResponse(context=message.context, reply_to_topic_type=self._agent_topic_type),
+            AgentResponse(context=context, reply_to_topic_type=self._agent_topic_type),
             topic_id=TopicId(self._user_topic_type, source=self.id.key),
         )
 
 class HumanAgent(RoutedAgent):
-    def __init__(self, description: str, agent_topic_type: str, user_topic_type: str) -> None:
+    def __init__(self, description: str, agent_topic_type: str, user_topic_type: str, io: SessionIO) -> None:
         super().__init__(description)
         self._agent_topic_type = agent_topic_type
         self._user_topic_type = user_topic_type
+        self._io = io
 
     @message_handler
     async def handle_user_task(self, message: UserTask, ctx: MessageContext) -> None:
-        human_input = input("Human agent input: ")
-        print(f"{'-'*80}\n{self.id.type}:\n{human_input}", flush=True)
+        human_input = await self._io.read(self.id.key, HUMAN, "Human agent input: ")
+        await self._io.write(self.id.key, self.id.type, human_input)
         message.context.append(AssistantMessage(content=human_input, source=self.id.type))
         await self.publish_message(
             AgentResponse(context=message.context, reply_to_topic_type=self._agent_topic_type),
@@ -149,34 +203,56 @@ class HumanAgent(RoutedAgent):
         )
 
 class UserAgent(RoutedAgent):
-    def __init__(self, description: str, user_topic_type: str, agent_topic_type: str) -> None:
+    def __init__(
+        self,
+        description: str,
+        user_topic_type: str,
+        agent_topic_type: str,
+        io: SessionIO,
+        intent_router: IntentRouter = INTENT_ROUTER,
+    ) -> None:
         super().__init__(description)
         self._user_topic_type = user_topic_type
         self._agent_topic_type = agent_topic_type
+        self._io = io
+        self._intent_router = intent_router
+
+    async def _route(self, user_input: str, topic_type: str) -> str:
+        """Returns the topic for the user's message: a specialist's if it was meant for triage and its intent is clear."""
+        if topic_type != triage_agent_topic_type:
+            return topic_type
+        route = self._intent_router.classify(user_input)
+        if route.intent is None:
+            return topic_type
+        await self._io.write(
+            self.id.key, None, f"Routed to {INTENT_TOPICS[route.intent]} by {route.source} ({route.confidence:.2f})."
+        )
+        return INTENT_TOPICS[route.intent]
 
     @message_handler
     async def handle_user_login(self, message: UserLogin, ctx: MessageContext) -> None:
-        print(f"{'-'*80}\nUser login, session ID: {self.id.key}.", flush=True)
+        await self._io.write(self.id.key, None, f"User login, session ID: {self.id.key}.")
         # Get the user's initial input after login.
-        user_input = input("User: ")
-        print(f"{'-'*80}\n{self.id.type}:\n{user_input}")
+        user_input = await self._io.read(self.id.key, USER, "User: ")
+        await self._io.write(self.id.key, self.id.type, user_input)
+        topic_type = await self._route(user_input, self._agent_topic_type)
         await self.publish_message(
             UserTask(context=[UserMessage(content=user_input, source="User")]),
-            topic_id=TopicId(self._agent_topic_type, source=self.id.key),
+            topic_id=TopicId(topic_type, source=self.id.key),
         )
 
     @message_handler
     async def handle_task_result(self, message: AgentResponse, ctx: MessageContext) -> None:
         # Get the user's input after receiving a response from an agent.
-        user_input = input("User (type 'exit' to close the session): ")
-        print(f"{'-'*80}\n{self.id.type}:\n{user_input}", flush=True)
+        user_input = await self._io.read(self.id.key, USER, "User (type 'exit' to close the session): ")
+        await self._io.write(self.id.key, self.id.type, user_input)
         if user_input.strip().lower() == "exit":
-            print(f"{'-'*80}\nUser session ended, session ID: {self.id.key}.")
+            await self._io.write(self.id.key, None, f"User session ended, session ID: {self.id.key}.")
+            await self._io.end(self.id.key)
             return
         message.context.append(UserMessage(content=user_input, source="User"))
-        await self.publish_message(
-            UserTask(context=message.context), topic_id=TopicId(message.reply_to_topic_type, source=self.id.key)
-        )
+        topic_type = await self._route(user_input, message.reply_to_topic_type)
+        await self.publish_message(UserTask(context=message.context), topic_id=TopicId(topic_type, source=self.id.key))
 
 def investigate_card(customer_id: str, cardno: str) -> str:
         """Investigate a locked card."""
@@ -252,6 +328,12 @@ triage_agent_topic_type = "TriageAgent"
 human_agent_topic_type = "HumanAgent"
 user_topic_type = "User"
 
+INTENT_TOPICS = {
+    CARD_UNLOCK: unlock_card_agent_topic_type,
+    PIN_RESET: pin_reset_agent_topic_type,
+    ADDRESS_CHANGE: kyc_agent_topic_type,
+}
+
 def transfer_to_card_unloack_agent() -> str:
     return unlock_card_agent_topic_type
 
@@ -290,8 +372,6 @@ transfer_back_to_triage_tool = FunctionTool(
 
 escalate_to_human_tool = FunctionTool(escalate_to_human, description="Only call this if explicitly asked to.")
 
-runtime = SingleThreadedAgentRuntime()
-
 model_client = AzureOpenAIChatCompletionClient(
     azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
     model=os.getenv("MODEL_NAME"),
@@ -300,134 +380,140 @@ model_client = AzureOpenAIChatCompletionClient(
     api_key=os.getenv("AZURE_OPENAI_API_KEY"),
 )
 
-async def main():
-
-    # Register the triage agent.
-    triage_agent_type = await AIAgent.register(
-        runtime,
-        type=triage_agent_topic_type,  # Using the topic type as the agent type.
-        factory=lambda: AIAgent(
-            description="A triage agent.",
-            system_message=SystemMessage(
-                content="You are a customer service bot for TNT Bank. "
-                "Introduce yourself. Always be very brief. "
-                "Gather information to direct the customer to the right agent. "
-                "But make your questions subtle and natural."
-                "if the user asks for a card unlock, transfer to the card unlock agent.\n"
-                "if the user asks for a pin reset, transfer to the pin reset agent.\n"
-                "if the user asks for an address change, transfer to the KYC agent.\n"
-                "if the user asks for anything else, transfer to the human agent.\n"
-            ),
-            model_client=model_client,
-            tools=[],
-            delegate_tools=[
-                transfer_to_card_unlock_tool,
-                transfer_to_kyc_tool,
-                transfer_to_pin_reset_tool,
-                escalate_to_human_tool,
-            ],
-            agent_topic_type=triage_agent_topic_type,
-            user_topic_type=user_topic_type,
+# --- Agents ---
+# Every agent type subscribes to the topic of the same name, on whichever runtime hosts it.
+def triage_agent(io: SessionIO) -> AIAgent:
+    return AIAgent(
+        description="A triage agent.",
+        system_message=SystemMessage(
+            content="You are a customer service bot for TNT Bank. "
+            "Introduce yourself. Always be very brief. "
+            "Gather information to direct the customer to the right agent. "
+            "But make your questions subtle and natural."
+            "if the user asks for a card unlock, transfer to the card unlock agent.\n"
+            "if the user asks for a pin reset, transfer to the pin reset agent.\n"
+            "if the user asks for an address change, transfer to the KYC agent.\n"
+            "if the user asks for anything else, transfer to the human agent.\n"
         ),
+        model_client=model_client,
+        tools=[],
+        delegate_tools=[
+            transfer_to_card_unlock_tool,
+            transfer_to_kyc_tool,
+            transfer_to_pin_reset_tool,
+            escalate_to_human_tool,
+        ],
+        agent_topic_type=triage_agent_topic_type,
+        user_topic_type=user_topic_type,
+        io=io,
     )
-    # Add subscriptions for the triage agent: it will receive messages published to its own topic only.
-    await runtime.add_subscription(TypeSubscription(topic_type=triage_agent_topic_type, agent_type=triage_agent_type.type))
-
-    # Register the card unlock agent.
-    unlock_card_type = await AIAgent.register(
-        runtime,
-        type=unlock_card_agent_topic_type,  # Using the topic type as the agent type.
-        factory=lambda: AIAgent(
-            description="A card unlock agent.",
-            system_message=SystemMessage(
-                content="You are a card unlock agent for TNT Bank. Your primary task is to help customers investigate why their card is locked and then unlock it.\n"
-                "Always ask them for their customer ID and card number.\n"
-                "find out the reason why the card was locked and then unlock it.\n"
-                "If the user asks for anything other than locked card, transfer back to triage agent"
-                ""
-            ),
-            model_client=model_client,
-            tools=[unlock_card_tool, investigate_card_tool],
-            delegate_tools=[transfer_back_to_triage_tool],
-            agent_topic_type=unlock_card_agent_topic_type,
-            user_topic_type=user_topic_type,
-        ),
-    )
-    # Add subscriptions for the card unlock agent: it will receive messages published to its own topic only.
-    await runtime.add_subscription(TypeSubscription(topic_type=unlock_card_agent_topic_type, agent_type=unlock_card_type.type))
-
-    # Register the pin reset agent.
-    pin_reset_agent_type = await AIAgent.register(
-        runtime,
-        type=pin_reset_agent_topic_type,  # Using the topic type as the agent type.
-        factory=lambda: AIAgent(
-            description="A PIN reset agent.",
-            system_message=SystemMessage(
-                content="You are a customer support agent for TNT bank."
-                "Always ask the user for their customer ID and card number, date of birth and email.\n and then help them reset their PIN.\n"
-                "if the user does not provide date of birth and email, ask them to provide it.\n"
-                "5. If the user asks anything not related to PIN reset, transfer back to triage agent."
-            ),
-            model_client=model_client,
-            tools=[reset_pin_tool],
-            delegate_tools=[transfer_back_to_triage_tool],
-            agent_topic_type=pin_reset_agent_topic_type,
-            user_topic_type=user_topic_type,
+
+
+def unlock_card_agent(io: SessionIO) -> AIAgent:
+    return AIAgent(
+        description="A card unlock agent.",
+        system_message=SystemMessage(
+            content="You are a card unlock agent for TNT Bank. Your primary task is to help customers investigate why their card is locked and then unlock it.\n"
+            "Always ask them for their customer ID and card number.\n"
+            "find out the reason why the card was locked and then unlock it.\n"
+            "If the user asks for anything other than locked card, transfer back to triage agent"
+            ""
         ),
+        model_client=model_client,
+        tools=[unlock_card_tool, investigate_card_tool],
+        delegate_tools=[transfer_back_to_triage_tool],
+        agent_topic_type=unlock_card_agent_topic_type,
+        user_topic_type=user_topic_type,
+        io=io,
     )
-    # Add subscriptions for the pin reset agent: it will receive messages published to its own topic only.
-    await runtime.add_subscription(
-        TypeSubscription(topic_type=pin_reset_agent_topic_type, agent_type=pin_reset_agent_type.type)
-    )
 
-    kyc_agent_type = await AIAgent.register(
-        runtime,
-        type=kyc_agent_topic_type,  # Using the topic type as the agent type.
-        factory=lambda: AIAgent(
-            description="A KYC agent. You help customers keep their information up-to-date.",
-            system_message=SystemMessage(
-                content="You are a customer support agent for TNT bank."
-                "Always ask the user for their customer ID and card number, and the new address.\n and then help them update their address\n"
-                "if the user does not provide required infromation, ask them to provide it.\n"
-                "5. If the user asks anything not related address update, transfer back to triage agent."
-            ),
-            model_client=model_client,
-            tools=[update_customer_address_tool],
-            delegate_tools=[transfer_back_to_triage_tool],
-            agent_topic_type=kyc_agent_topic_type,
-            user_topic_type=user_topic_type,
+
+def pin_reset_agent(io: SessionIO) -> AIAgent:
+    return AIAgent(
+        description="A PIN reset agent.",
+        system_message=SystemMessage(
+            content="You are a customer support agent for TNT bank."
+            "Always ask the user for their customer ID and card number, date of birth and email.\n and then help them reset their PIN.\n"
+            "if the user does not provide date of birth and email, ask them to provide it.\n"
+            "5. If the user asks anything not related to PIN reset, transfer back to triage agent."
         ),
+        model_client=model_client,
+        tools=[reset_pin_tool],
+        delegate_tools=[transfer_back_to_triage_tool],
+        agent_topic_type=pin_reset_agent_topic_type,
+        user_topic_type=user_topic_type,
+        io=io,
     )
-    # Add subscriptions for the kyc update agent: it will receive messages published to its own topic only.
-    await runtime.add_subscription(
-        TypeSubscription(topic_type=kyc_agent_topic_type, agent_type=kyc_agent_type.type)
-    )
 
-    # Register the human agent.
-    human_agent_type = await HumanAgent.register(
-        runtime,
-        type=human_agent_topic_type,  # Using the topic type as the agent type.
-        factory=lambda: HumanAgent(
-            description="A human agent.",
-            agent_topic_type=human_agent_topic_type,
-            user_topic_type=user_topic_type,
+
+def kyc_agent(io: SessionIO) -> AIAgent:
+    return AIAgent(
+        description="A KYC agent. You help customers keep their information up-to-date.",
+        system_message=SystemMessage(
+            content="You are a customer support agent for TNT bank."
+            "Always ask the user for their customer ID and card number, and the new address.\n and then help them update their address\n"
+            "if the user does not provide required infromation, ask them to provide it.\n"
+            "5. If the user asks anything not related address update, transfer back to triage agent."
         ),
+        model_client=model_client,
+        tools=[update_customer_address_tool],
+        delegate_tools=[transfer_back_to_triage_tool],
+        agent_topic_type=kyc_agent_topic_type,
+        user_topic_type=user_topic_type,
+        io=io,
     )
-    # Add subscriptions for the human agent: it will receive messages published to its own topic only.
-    await runtime.add_subscription(TypeSubscription(topic_type=human_agent_topic_type, agent_type=human_agent_type.type))
-
-    # Register the user agent.
-    user_agent_type = await UserAgent.register(
-        runtime,
-        type=user_topic_type,
-        factory=lambda: UserAgent(
-            description="A user agent.",
-            user_topic_type=user_topic_type,
-            agent_topic_type=triage_agent_topic_type,  # Start with the triage agent.
-        ),
+
+
+def human_agent(io: SessionIO) -> HumanAgent:
+    return HumanAgent(
+        description="A human agent.",
+        agent_topic_type=human_agent_topic_type,
+        user_topic_type=user_topic_type,
+        io=io,
     )
-    # Add subscriptions for the user agent: it will receive messages published to its own topic only.
-    await runtime.add_subscription(TypeSubscription(topic_type=user_topic_type, agent_type=user_agent_type.type))
+
+
+AGENTS: Dict[str, Tuple[type, Callable[[SessionIO], RoutedAgent]]] = {
+    triage_agent_topic_type: (AIAgent, triage_agent),
+    unlock_card_agent_topic_type: (AIAgent, unlock_card_agent),
+    pin_reset_agent_topic_type: (AIAgent, pin_reset_agent),
+    kyc_agent_topic_type: (AIAgent, kyc_agent),
+    human_agent_topic_type: (HumanAgent, human_agent),
+}
+
+
+async def register_agents(
+    runtime: AgentRuntime,
+    agent_types: Iterable[str],
+    io: SessionIO,
+) -> None:
+    """
+    Registers the given agent types on `runtime`, each subscribed to its own topic only.
+
+    Every session (topic source) gets its own agent instances, and they all read and
+    write through `io`.
+    """
+    for agent_type in agent_types:
+        if agent_type == user_topic_type:
+            agent_class, make_agent = UserAgent, lambda io: UserAgent(
+                description="A user agent.",
+                user_topic_type=user_topic_type,
+                agent_topic_type=triage_agent_topic_type,  # Start with the triage agent.
+                io=io,
+            )
+        else:
+            agent_class, make_agent = AGENTS[agent_type]
+        registered = await agent_class.register(
+            runtime, type=agent_type, factory=lambda make_agent=make_agent: make_agent(io)
+        )
+        await runtime.add_subscription(TypeSubscription(topic_type=agent_type, agent_type=registered.type))
+
+
+# --- Runtimes ---
+async def run_local() -> None:
+    """Runs every agent on one in-process runtime, with a console session."""
+    runtime = SingleThreadedAgentRuntime()
+    await register_agents(runtime, [*AGENTS, user_topic_type], ConsoleIO())
 
     # Start the runtime.
     runtime.start()
@@ -440,5 +526,136 @@ async def main():
     await runtime.stop_when_idle()
     await model_client.close()
 
-# Run the async main function
-asyncio.run(main())
\ No newline at end of file
+
+def _grpc_runtime():
+    try:
+        from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntime, GrpcWorkerAgentRuntimeHost
+    except ImportError as e:
+        raise SystemExit(
+            "The distributed runtime needs AutoGen's gRPC support: pip install \"autogen-ext[grpc]\""
+        ) from e
+    return GrpcWorkerAgentRuntime, GrpcWorkerAgentRuntimeHost
+
+
+async def run_host(address: str) -> None:
+    """Runs the gRPC host that routes messages between the worker processes."""
+    _, GrpcWorkerAgentRuntimeHost = _grpc_runtime()
+    host = GrpcWorkerAgentRuntimeHost(address=address)
+    host.start()
+    print(f"Agent host listening on {address}.", flush=True)
+    await host.stop_when_signal()
+
+
+async def run_worker(address: str, agent_types: List[str]) -> None:
+    """
+    Runs some of the agent types in this process, connected to the host at `address`.
+
+    A worker with the user agent also starts the session and stops once it has
+    ended; other workers serve until they are interrupted.
+    """
+    GrpcWorkerAgentRuntime, _ = _grpc_runtime()
+    runtime = GrpcWorkerAgentRuntime(host_address=address)
+    for message_type in (UserLogin, UserTask, AgentResponse):
+        runtime.add_message_serializer(try_get_known_serializers_for_type(message_type))
+    await runtime.start()
+    io = ConsoleIO()
+    await register_agents(runtime, agent_types, io)
+    print(f"Worker ready: {', '.join(agent_types)}", flush=True)
+    try:
+        if user_topic_type in agent_types:
+            await runtime.publish_message(UserLogin(), topic_id=TopicId(user_topic_type, source=str(uuid.uuid4())))
+            await io.ended.wait()
+            await runtime.stop()
+        else:
+            await runtime.stop_when_signal()
+    finally:
+        await model_client.close()
+
+
+def _wait_until_listening(address: str, timeout: float = 30) -> None:
+    host, port = address.rsplit(":", 1)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection((host, int(port)), timeout=1):
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"The agent host did not start listening on {address}")
+            time.sleep(0.2)
+
+
+def _start_worker(address: str, agent_types: List[str]) -> subprocess.Popen:
+    """Starts a worker process and returns once its agents are registered; its output is relayed."""
+    proc = subprocess.Popen(
+        [sys.executable, __file__, "--runtime", "worker", "--address", address, "--agents", ",".join(agent_types)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    for line in proc.stdout:
+        print(line, end="", flush=True)
+        if line.startswith("Worker ready:"):
+            break
+    else:
+        raise RuntimeError(f"Worker for {agent_types} exited during start-up")
+    threading.Thread(target=lambda: [print(line, end="", flush=True) for line in proc.stdout], daemon=True).start()
+    return proc
+
+
+async def run_cluster(address: str) -> None:
+    """
+    Runs the whole bot on localhost: a host process, one worker process per AI agent
+    type, and the user and human agents (which read the console) in this process.
+    """
+    host = subprocess.Popen([sys.executable, __file__, "--runtime", "host", "--address", address])
+    workers = []
+    try:
+        _wait_until_listening(address)
+        # Triage and each specialist get a process of their own, so they scale across cores.
+        for agent_type in AGENTS:
+            if agent_type != human_agent_topic_type:
+                workers.append(_start_worker(address, [agent_type]))
+        await run_worker(address, [human_agent_topic_type, user_topic_type])
+    finally:
+        for proc in [*workers, host]:
+            proc.terminate()
+        for proc in [*workers, host]:
+            proc.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="TNT Bank customer support agents on AutoGen.")
+    parser.add_argument(
+        "--runtime",
+        choices=["local", "cluster", "host", "worker"],
+        default=os.getenv("AGENT_RUNTIME", "local"),
+        help="local: all agents in this process (default); cluster: host and workers as local processes; "
+        "host / worker: one part of a distributed deployment",
+    )
+    parser.add_argument(
+        "--address", default=os.getenv("AGENT_HOST_ADDRESS", "localhost:50051"), help="address of the gRPC agent host"
+    )
+    parser.add_argument(
+        "--agents",
+        default=",".join(AGENTS),
+        help=f"comma-separated agent types for a worker, out of {', '.join([*AGENTS, user_topic_type])}",
+    )
+    args = parser.parse_args()
+
+    if args.runtime == "host":
+        asyncio.run(run_host(args.address))
+    elif args.runtime == "worker":
+        agent_types = [agent_type.strip() for agent_type in args.agents.split(",") if agent_type.strip()]
+        unknown = set(agent_types) - {*AGENTS, user_topic_type}
+        if unknown:
+            parser.error(f"unknown agent types: {', '.join(sorted(unknown))}")
+        asyncio.run(run_worker(args.address, agent_types))
+    elif args.runtime == "cluster":
+        asyncio.run(run_cluster(args.address))
+    else:
+        asyncio.run(run_local())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+A bounded conversation context for the AutoGen banking bot's AI agents.
+
+The context of a session used to grow with every turn. Every LLM call resent all of
+it, and every delegation copied it, so prompt size, latency and memory all grew over
+a long session. `ContextWindow.fit` compacts the context to a token budget before an
+agent uses it. It compacts in stages and stops as soon as the context fits:
+
+1. The last `recent_turns` turns are kept verbatim as long as possible. A turn starts
+   with a user message.
+2. In older turns, tool results are cut down to their first `tool_result_chars`
+   characters.
+3. Older tool calls are then dropped together with their results. What the user and
+   the agents said is kept.
+4. Then the oldest turns are dropped and replaced by a one-line note.
+5. As a last resort, e.g. when a single turn holds a long tool loop, tool results in
+   the recent turns are cut down as well.
+
+Tokens are estimated from the text length. The estimate is cheap enough to run on
+every message and close enough for a budget.
+"""
+
+from typing import List, Sequence
+
+from autogen_core import FunctionCall
+from autogen_core.models import (
+    AssistantMessage,
+    FunctionExecutionResult,
+    FunctionExecutionResultMessage,
+    LLMMessage,
+    UserMessage,
+)
+
+# Tokens added per message for the role and separators.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Stands in for the turns dropped from the start of the conversation.
+OMITTED_NOTE = UserMessage(content="[Earlier turns of this conversation were omitted.]", source="User")
+# Ends a tool result that was cut down.
+TRUNCATION_MARK = " [...]"
+
+
+def estimate_tokens(message: LLMMessage) -> int:
+    content = message.content
+    if isinstance(content, list):
+        text = "".join(
+            item.arguments + item.name if isinstance(item, FunctionCall) else str(getattr(item, "content", item))
+            for item in content
+        )
+    else:
+        text = str(content)
+    return len(text) // 4 + MESSAGE_OVERHEAD_TOKENS
+
+
+def _is_tool_call(message: LLMMessage) -> bool:
+    return isinstance(message, AssistantMessage) and isinstance(message.content, list)
+
+
+class ContextWindow:
+    def __init__(self, token_budget: int, recent_turns: int = 3, tool_result_chars: int = 200) -> None:
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.tool_result_chars = tool_result_chars
+
+    def fit(self, messages: Sequence[LLMMessage]) -> List[LLMMessage]:
+        """Returns `messages` compacted to the token budget; messages are shared, never modified."""
+        sizes = [estimate_tokens(m) for m in messages]
+        total = sum(sizes)
+        if total <= self.token_budget:
+            return list(messages)
+
+        turn_starts = [i for i, m in enumerate(messages) if isinstance(m, UserMessage)]
+        if not self.recent_turns:
+            recent_start = len(messages)
+        elif len(turn_starts) > self.recent_turns:
+            recent_start = turn_starts[-self.recent_turns]
+        else:
+            recent_start = 0
+        old, recent = list(messages[:recent_start]), list(messages[recent_start:])
+        total -= sum(sizes[:recent_start])
+
+        # 2. Cut down old tool results.
+        old = [self._shorten(m) if isinstance(m, FunctionExecutionResultMessage) else m for m in old]
+        old_total = sum(estimate_tokens(m) for m in old)
+        if old_total + total <= self.token_budget:
+            return old + recent
+
+        # 3. Drop old tool calls and their results; the results always follow their calls.
+        old = [m for m in old if not (_is_tool_call(m) or isinstance(m, FunctionExecutionResultMessage))]
+        old_total = sum(estimate_tokens(m) for m in old)
+
+        # 4. Drop the oldest turns; once one is dropped, the note counts against the budget too.
+        note = 0
+        while old and old_total + note + total > self.token_budget:
+            end = next((i for i in range(1, len(old)) if isinstance(old[i], UserMessage)), len(old))
+            old_total -= sum(estimate_tokens(m) for m in old[:end])
+            del old[:end]
+            note = estimate_tokens(OMITTED_NOTE)
+        if note:
+            old.insert(0, OMITTED_NOTE)
+            old_total += note
+
+        # 5. Cut down recent tool results too.
+        if old_total + total > self.token_budget:
+            recent = [self._shorten(m) if isinstance(m, FunctionExecutionResultMessage) else m for m in recent]
+        return old + recent
+
+    def _shorten(self, message: FunctionExecutionResultMessage) -> FunctionExecutionResultMessage:
+        # A result cut down before is left as it is, so compacting the same context twice is stable.
+        limit = self.tool_result_chars + len(TRUNCATION_MARK)
+        if all(len(result.content) <= limit for result in message.content):
+            return message
+        return FunctionExecutionResultMessage(
+            content=[
+                FunctionExecutionResult(
+                    call_id=result.call_id,
+                    content=result.content[: self.tool_result_chars] + TRUNCATION_MARK
+                    if len(result.content) > limit
+                    else result.content,
+                    is_error=result.is_error,
+                    name=result.name,
+                )
+                for result in message.content
+            ]
+        )
@@ -5,9 +5,13 @@ from pydantic import BaseModel
 from enum import Enum
 
 
+from intent_router import ADDRESS_CHANGE, CARD_UNLOCK, PIN_RESET, IntentRouter
+
 import dotenv
 dotenv.load_dotenv()
 
+intent_router = IntentRouter.from_env()
+
 llm = LLM(
     model="azure/gpt-4o-mini",
     api_version="2025-01-01-preview"
@@ -198,6 +202,12 @@ class SupportTopic(Enum):
     AddressChange = "AddressChange"
     CardLocked = "CardLocked"
 
+INTENT_TOPICS = {
+    CARD_UNLOCK: SupportTopic.CardLocked,
+    PIN_RESET: SupportTopic.PINReset,
+    ADDRESS_CHANGE: SupportTopic.AddressChange,
+}
+
 class SupportTopicChoice(BaseModel):
     topic: SupportTopic = SupportTopic.PINReset  # Default choice
     customerId: str = ""
@@ -213,7 +223,12 @@ class RouterFlow(Flow[SupportTopicChoice]):
         """Start method to initialize the flow and gather user input."""
         
         print("Welcome to the Banking Support Bot!")
-        choice = input("Please select a support topic (PINReset, AddressChange, CardLocked): ")
+        choice = input("Please select a support topic (PINReset, AddressChange, CardLocked) or describe your issue: ")
+        if choice not in SupportTopic.__members__:
+            # A description of the issue: the local intent router picks the topic when it is sure.
+            route = intent_router.classify(choice)
+            if route.intent is not None:
+                choice = INTENT_TOPICS[route.intent].value
         print(f"User selected topic: {choice}")
 
         # if the chice is CardLocked, get customer ID and card number
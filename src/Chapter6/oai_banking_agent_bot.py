@@ -20,6 +20,8 @@ from agents.extensions.handoff_prompt import RECOMMENDED_PROMPT_PREFIX
 from openai import AsyncAzureOpenAI
 from dotenv import load_dotenv
 
+from intent_router import ADDRESS_CHANGE, CARD_UNLOCK, PIN_RESET, IntentRouter
+
 load_dotenv()
 
 azure_client = AsyncAzureOpenAI(
@@ -175,6 +177,14 @@ pin_agent.handoffs.append(triage_agent)
 card_agent.handoffs.append(triage_agent)
 address_update_agent.handoffs.append(triage_agent)
 
+# Messages for the triage agent whose intent is clear go straight to the specialist.
+intent_router = IntentRouter.from_env()
+intent_agents = {
+    CARD_UNLOCK: card_agent,
+    PIN_RESET: pin_agent,
+    ADDRESS_CHANGE: address_update_agent,
+}
+
 ### RUN
 
 async def main():
@@ -188,6 +198,11 @@ async def main():
             break
         else:
             input_items.append({"content": user_input, "role": "user"})
+            if current_agent is triage_agent:
+                route = intent_router.classify(user_input)
+                if route.intent is not None:
+                    current_agent = intent_agents[route.intent]
+                    print(f"Routed to {current_agent.name} by {route.source} ({route.confidence:.2f})")
             result = await Runner.run(current_agent, input_items, context=context)
 
             for new_item in result.new_items:
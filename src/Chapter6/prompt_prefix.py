@@ -0,0 +1,45 @@
+"""
+The static prompt prefix of the AutoGen banking bot's AI agents.
+
+Every request an agent sends to the model starts with the same system message and
+tool schemas. `prompt_prefix` builds that prefix once, and every agent with the same
+system message and tools, in every session, sends the very same objects instead of
+rebuilding the schema list on each call.
+
+Providers only cache prompts from a minimum length on (1024 tokens for Azure
+OpenAI). The prefixes of this bot's agents are a few hundred tokens, so sharing them
+does not make the provider's prompt cache hit; it only saves the rebuilding.
+"""
+
+import hashlib
+import json
+from typing import Dict, List, Sequence
+
+from autogen_core.models import LLMMessage, SystemMessage
+from autogen_core.tools import Tool, ToolSchema
+
+
+class PromptPrefix:
+    """The system message and tool schemas an agent starts every request with."""
+
+    def __init__(self, system_message: SystemMessage, tool_schemas: List[ToolSchema], fingerprint: str) -> None:
+        self.system_message = system_message
+        self.tool_schemas = tool_schemas
+        self.fingerprint = fingerprint
+
+    def messages(self, context: Sequence[LLMMessage]) -> List[LLMMessage]:
+        return [self.system_message, *context]
+
+
+_prefixes: Dict[str, PromptPrefix] = {}
+
+
+def prompt_prefix(system_message: SystemMessage, tools: Sequence[Tool]) -> PromptPrefix:
+    """Returns the prefix for `system_message` and `tools`, building it the first time they are seen."""
+    tool_schemas = [tool.schema for tool in tools]
+    serialized = json.dumps([system_message.content, tool_schemas], sort_keys=True)
+    fingerprint = hashlib.sha256(serialized.encode()).hexdigest()
+    prefix = _prefixes.get(fingerprint)
+    if prefix is None:
+        prefix = _prefixes[fingerprint] = PromptPrefix(system_message, tool_schemas, fingerprint)
+    return prefix
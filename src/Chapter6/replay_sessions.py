@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Replays recorded conversations against the AutoGen banking bot, many sessions at once.
+
+All sessions share one in-process runtime. Each line of the conversations file is one
+recorded session: the lines the user typed and, if it was escalated, the replies of
+the human agent.
+
+    {"user": ["My card is locked", "C1001, card 4111", "exit"], "human": []}
+
+A session starts as soon as fewer than --concurrency sessions are live. It ends when
+its user lines run out, with an implied "exit" if the recording has none.
+
+Reported: sessions and user turns per second, and the p50/p95/p99 latency of a turn,
+measured from a user line to the next prompt for a user line.
+
+The LLM is the one configured for the bot. To measure the bot rather than the model,
+point it at the scripted stand-in from Chapter 11:
+
+    python ../Chapter11/loadtest/fake_openai.py --port 8765 --latency-ms 500 &
+    AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8765 AZURE_OPENAI_API_KEY=fake \\
+        python replay_sessions.py recorded_sessions.jsonl --sessions 1000 --concurrency 300
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from collections import deque
+
+from autogen_core import SingleThreadedAgentRuntime, TopicId
+
+from autogen_banking_agent_bot import AGENTS, UserLogin, model_client, register_agents, user_topic_type
+from session_io import HUMAN, USER, SessionIO
+
+# What the human agent says once the recording has no more replies for it.
+HUMAN_FALLBACK = "A colleague will call you back shortly."
+
+
+class ReplayIO(SessionIO):
+    """Answers every prompt of a session from its recording and times the user turns."""
+
+    def __init__(self, think_time: float = 0.0, verbose: bool = False) -> None:
+        self._think_time = think_time
+        self._verbose = verbose
+        self._scripts: dict[str, dict[str, deque]] = {}
+        self._ended: dict[str, asyncio.Future] = {}
+        self._turn_started: dict[str, float] = {}
+        self.turn_latencies: list[float] = []
+        self.messages = 0
+
+    def start(self, session_id: str, conversation: dict) -> asyncio.Future:
+        """Queues the session's recording; the returned future is done once the session has ended."""
+        self._scripts[session_id] = {USER: deque(conversation["user"]), HUMAN: deque(conversation.get("human", []))}
+        self._ended[session_id] = asyncio.get_running_loop().create_future()
+        return self._ended[session_id]
+
+    def discard(self, session_id: str) -> None:
+        self._scripts.pop(session_id, None)
+        self._ended.pop(session_id, None)
+        self._turn_started.pop(session_id, None)
+
+    async def read(self, session_id: str, role: str, prompt: str) -> str:
+        script = self._scripts[session_id]
+        if role == HUMAN:
+            return script[HUMAN].popleft() if script[HUMAN] else HUMAN_FALLBACK
+        started = self._turn_started.pop(session_id, None)
+        if started is not None:
+            self.turn_latencies.append(time.perf_counter() - started)
+        if self._think_time:
+            await asyncio.sleep(self._think_time)
+        line = script[USER].popleft() if script[USER] else "exit"
+        self._turn_started[session_id] = time.perf_counter()
+        return line
+
+    async def write(self, session_id: str, source: str | None, text: str) -> None:
+        self.messages += 1
+        if self._verbose:
+            print(f"[{session_id[:8]}] {source or '-'}: {text}", flush=True)
+
+    async def end(self, session_id: str) -> None:
+        self._turn_started.pop(session_id, None)
+        self._scripts.pop(session_id, None)
+        ended = self._ended.pop(session_id, None)
+        if ended is not None and not ended.done():
+            ended.set_result(None)
+
+
+def load_conversations(path: str) -> list[dict]:
+    conversations = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            conversation = json.loads(line)
+            if not conversation.get("user"):
+                raise SystemExit(f"{path}:{number}: a conversation needs at least one user line")
+            conversations.append(conversation)
+    if not conversations:
+        raise SystemExit(f"{path}: no conversations")
+    return conversations
+
+
+def _percentile(values: list[float], q: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+async def replay(
+    conversations: list[dict],
+    sessions: int,
+    concurrency: int,
+    think_time: float = 0.0,
+    session_timeout: float = 300.0,
+    verbose: bool = False,
+) -> dict:
+    """Runs `sessions` sessions, cycling through `conversations`, and returns the measurements."""
+    io = ReplayIO(think_time, verbose)
+    runtime = SingleThreadedAgentRuntime()
+    await register_agents(runtime, [*AGENTS, user_topic_type], io)
+    runtime.start()
+
+    slots = asyncio.Semaphore(concurrency)
+    live = peak = failed = 0
+
+    async def run_session(conversation: dict) -> None:
+        nonlocal live, peak, failed
+        async with slots:
+            session_id = str(uuid.uuid4())
+            ended = io.start(session_id, conversation)
+            live += 1
+            peak = max(peak, live)
+            try:
+                await runtime.publish_message(UserLogin(), topic_id=TopicId(user_topic_type, source=session_id))
+                # A failing agent handler is logged by the runtime and never ends its session.
+                await asyncio.wait_for(ended, timeout=session_timeout)
+            except asyncio.TimeoutError:
+                failed += 1
+                io.discard(session_id)
+            finally:
+                live -= 1
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(run_session(conversations[i % len(conversations)]) for i in range(sessions)))
+        elapsed = time.perf_counter() - started
+    finally:
+        await runtime.stop()
+        await model_client.close()
+
+    turns = io.turn_latencies
+    return {
+        "sessions": sessions,
+        "failed": failed,
+        "peak_live_sessions": peak,
+        "elapsed_s": round(elapsed, 3),
+        "sessions_per_s": round((sessions - failed) / elapsed, 2),
+        "turns": len(turns),
+        "turns_per_s": round(len(turns) / elapsed, 2),
+        "turn_p50_ms": round(_percentile(turns, 50) * 1000, 1),
+        "turn_p95_ms": round(_percentile(turns, 95) * 1000, 1),
+        "turn_p99_ms": round(_percentile(turns, 99) * 1000, 1),
+        "agent_messages": io.messages,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("conversations", nargs="?", default="recorded_sessions.jsonl", help="JSON Lines file of sessions")
+    parser.add_argument("--sessions", type=int, default=100, help="sessions to run, cycling through the file")
+    parser.add_argument("--concurrency", type=int, default=100, help="sessions live at the same time")
+    parser.add_argument("--think-time", type=float, default=0.0, help="seconds the user waits before each line")
+    parser.add_argument("--session-timeout", type=float, default=300.0, help="seconds before a session counts as failed")
+    parser.add_argument("--verbose", action="store_true", help="print what every session shows")
+    args = parser.parse_args()
+
+    results = asyncio.run(
+        replay(
+            load_conversations(args.conversations),
+            sessions=args.sessions,
+            concurrency=args.concurrency,
+            think_time=args.think_time,
+            session_timeout=args.session_timeout,
+            verbose=args.verbose,
+        )
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
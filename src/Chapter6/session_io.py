@@ -0,0 +1,114 @@
+"""
+Conversation I/O for the AutoGen banking bot.
+
+The user and human agents used to call the blocking `input()` inside their async
+message handlers, which froze the whole runtime, and with it every other session,
+until someone typed a line. They now talk through a `SessionIO` adapter instead.
+The adapter reads a session's next line without blocking the event loop, and it
+receives everything the agents show or log. Any number of sessions can then wait
+for input on one runtime at the same time.
+
+- `ConsoleIO` is the interactive terminal session, as before.
+- `QueueIO` drives sessions through asyncio queues. A websocket or HTTP handler
+  can feed it user lines and forward what the agents say.
+
+`replay_sessions.py` has a third adapter that replays recorded conversations.
+"""
+
+import asyncio
+from abc import ABC, abstractmethod
+from collections import defaultdict
+
+USER = "user"
+HUMAN = "human"
+
+
+class SessionEnded(Exception):
+    """Raised by `read` when the session ends while, or before, it waits for a line."""
+
+
+class SessionIO(ABC):
+    """Where the agents of a session read their input from and write their output to."""
+
+    @abstractmethod
+    async def read(self, session_id: str, role: str, prompt: str) -> str:
+        """Returns the next line typed by `role` (USER or HUMAN) in the session; may raise `SessionEnded`."""
+
+    @abstractmethod
+    async def write(self, session_id: str, source: str | None, text: str) -> None:
+        """Shows `text` from `source` (an agent type, or None for a notice) in the session."""
+
+    async def end(self, session_id: str) -> None:
+        """Called once the user has closed the session."""
+
+
+class ConsoleIO(SessionIO):
+    """A single interactive session on the terminal."""
+
+    def __init__(self) -> None:
+        self.ended = asyncio.Event()
+        self._prompt_lock = asyncio.Lock()
+
+    async def read(self, session_id: str, role: str, prompt: str) -> str:
+        # input() runs on a worker thread, so the runtime keeps delivering messages meanwhile.
+        async with self._prompt_lock:
+            return await asyncio.to_thread(input, prompt)
+
+    async def write(self, session_id: str, source: str | None, text: str) -> None:
+        if source is None:
+            print(f"{'-'*80}\n{text}", flush=True)
+        else:
+            print(f"{'-'*80}\n{source}:\n{text}", flush=True)
+
+    async def end(self, session_id: str) -> None:
+        self.ended.set()
+
+
+class QueueIO(SessionIO):
+    """
+    Sessions driven through queues.
+
+    `send` delivers a line typed by the user (or the human agent) of a session, and
+    `receive` returns what the session showed next, or None once it has ended. Lines
+    sent to an ended session are dropped.
+    """
+
+    # Wakes a reader whose session ended; never a line anyone typed.
+    _END = object()
+
+    def __init__(self) -> None:
+        self._inbox: dict[tuple[str, str], asyncio.Queue] = defaultdict(asyncio.Queue)
+        self._outbox: dict[str, asyncio.Queue] = defaultdict(asyncio.Queue)
+        self._ended: set[str] = set()
+
+    def send(self, session_id: str, text: str, role: str = USER) -> None:
+        if session_id not in self._ended:
+            self._inbox[(session_id, role)].put_nowait(text)
+
+    async def receive(self, session_id: str) -> tuple[str | None, str] | None:
+        return await self._outbox[session_id].get()
+
+    async def read(self, session_id: str, role: str, prompt: str) -> str:
+        if session_id in self._ended:
+            raise SessionEnded(session_id)
+        line = await self._inbox[(session_id, role)].get()
+        if line is self._END:
+            raise SessionEnded(session_id)
+        return line
+
+    async def write(self, session_id: str, source: str | None, text: str) -> None:
+        self._outbox[session_id].put_nowait((source, text))
+
+    async def end(self, session_id: str) -> None:
+        self._ended.add(session_id)
+        for role in (USER, HUMAN):
+            inbox = self._inbox.pop((session_id, role), None)
+            if inbox is not None:
+                # A reader may still be waiting on this queue.
+                inbox.put_nowait(self._END)
+        self._outbox[session_id].put_nowait(None)
+
+    def forget(self, session_id: str) -> None:
+        """Drops the session's undelivered output once its consumer is done with it."""
+        self._outbox.pop(session_id, None)
+        self._ended.discard(session_id)
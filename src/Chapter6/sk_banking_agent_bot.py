@@ -9,6 +9,8 @@ from semantic_kernel.functions import kernel_function
 import dotenv, os
 dotenv.load_dotenv()
 
+from intent_router import ADDRESS_CHANGE, CARD_UNLOCK, PIN_RESET, IntentRouter
+
 """
 The following sample demonstrates how to create a handoff orchestration that represents
 a customer support triage system for a Bank. The orchestration consists of 4 agents, each specialized
@@ -17,6 +19,10 @@ in a different area of customer support: triage, card issues, PIN changes, and K
 Depending on the customer's request, agents can hand off the conversation to the appropriate
 agent.
 
+The customer's first message goes to the triage agent, unless a local intent router
+is sure it is a card, PIN or address request: then the specialist starts the
+conversation and no LLM call is spent on triage.
+
 Human in the loop is achieved via a callback function. Note that in the handoff orchestration, all agents have access to the
 human response function.
 
@@ -168,6 +174,15 @@ def get_agents() -> tuple[list[Agent], OrchestrationHandoffs]:
     return [support_agent, pin_agent, card_agent, address_update_agent], handoffs
 
 
+# Specialist agent for each intent the router recognizes.
+intent_router = IntentRouter.from_env()
+intent_agents = {
+    CARD_UNLOCK: "CardAgent",
+    PIN_RESET: "PINManagementAgent",
+    ADDRESS_CHANGE: "AddressUpdateAgent",
+}
+
+
 def agent_response_callback(message: ChatMessageContent) -> None:
     """Observer function to print the messages from the agents.
 
@@ -193,6 +208,18 @@ async def main():
     """Main function to run the agents."""
     # 1. Create a handoff orchestration with multiple agents
     agents, handoffs = get_agents()
+
+    # The orchestration gives the task to its first member: put the specialist first
+    # when the router knows which one the customer needs.
+    first_message = input("User: ")
+    if first_message.lower() == 'exit':
+        print("Goodbye!")
+        return
+    route = intent_router.classify(first_message)
+    if route.intent is not None:
+        agents.sort(key=lambda agent: agent.name != intent_agents[route.intent])
+        print(f"Routed to {agents[0].name} by {route.source} ({route.confidence:.2f})")
+
     handoff_orchestration = HandoffOrchestration(
         members=agents,
         handoffs=handoffs,
@@ -206,7 +233,7 @@ async def main():
 
     # 3. Invoke the orchestration with a task and the runtime
     orchestration_result = await handoff_orchestration.invoke(
-        task="Greet the customer who is reaching out for support.",
+        task=first_message,
         runtime=runtime,
     )
 
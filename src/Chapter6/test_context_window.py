@@ -0,0 +1,87 @@
+from autogen_core import FunctionCall
+from autogen_core.models import (
+    AssistantMessage,
+    FunctionExecutionResult,
+    FunctionExecutionResultMessage,
+    UserMessage,
+)
+
+from context_window import OMITTED_NOTE, TRUNCATION_MARK, ContextWindow, estimate_tokens
+
+
+def turn(n, result_chars=0):
+    """One turn: the user's message, an optional tool call and its result, and the answer."""
+    messages = [UserMessage(content=f"question {n}", source="User")]
+    if result_chars:
+        messages += [
+            AssistantMessage(content=[FunctionCall(id=f"call{n}", name="lookup", arguments="{}")], source="Agent"),
+            FunctionExecutionResultMessage(
+                content=[FunctionExecutionResult(call_id=f"call{n}", content="x" * result_chars, is_error=False, name="lookup")]
+            ),
+        ]
+    return messages + [AssistantMessage(content=f"answer {n}", source="Agent")]
+
+
+def tokens(messages):
+    return sum(estimate_tokens(m) for m in messages)
+
+
+def tool_call_ids(messages):
+    calls = [c.id for m in messages if isinstance(m, AssistantMessage) and isinstance(m.content, list) for c in m.content]
+    results = [r.call_id for m in messages if isinstance(m, FunctionExecutionResultMessage) for r in m.content]
+    return calls, results
+
+
+def test_context_within_budget_is_unchanged():
+    messages = turn(1, result_chars=400) + turn(2)
+    assert ContextWindow(token_budget=1000).fit(messages) == messages
+
+
+def test_old_tool_results_are_cut_down_first():
+    messages = turn(1, result_chars=2000) + turn(2) + turn(3)
+    fitted = ContextWindow(token_budget=200, recent_turns=2, tool_result_chars=50).fit(messages)
+    assert len(fitted) == len(messages)
+    assert fitted[2].content[0].content == "x" * 50 + TRUNCATION_MARK
+    assert fitted[4:] == messages[4:]
+    # The original messages are shared, never modified.
+    assert messages[2].content[0].content == "x" * 2000
+
+
+def test_old_tool_calls_are_dropped_with_their_results():
+    messages = turn(1, result_chars=2000) + turn(2, result_chars=2000) + turn(3)
+    fitted = ContextWindow(token_budget=80, recent_turns=1, tool_result_chars=200).fit(messages)
+    assert [m.content for m in fitted] == ["question 1", "answer 1", "question 2", "answer 2", "question 3", "answer 3"]
+
+
+def test_oldest_turns_are_replaced_by_a_note():
+    messages = [m for n in range(10) for m in turn(n)]
+    window = ContextWindow(token_budget=40, recent_turns=2)
+    fitted = window.fit(messages)
+    assert fitted[0] is OMITTED_NOTE
+    assert fitted[-4:] == messages[-4:]
+    assert tokens(fitted) <= window.token_budget
+    # Only whole turns are dropped.
+    assert isinstance(fitted[1], UserMessage)
+
+
+def test_recent_tool_results_are_cut_down_as_a_last_resort():
+    messages = turn(1, result_chars=4000)
+    fitted = ContextWindow(token_budget=100, recent_turns=3, tool_result_chars=100).fit(messages)
+    assert fitted[2].content[0].content == "x" * 100 + TRUNCATION_MARK
+    assert tool_call_ids(fitted) == (["call1"], ["call1"])
+
+
+def test_zero_recent_turns_compacts_every_turn():
+    messages = turn(1, result_chars=2000) + turn(2, result_chars=2000)
+    fitted = ContextWindow(token_budget=60, recent_turns=0).fit(messages)
+    assert tool_call_ids(fitted) == ([], [])
+    assert tokens(fitted) <= 60
+
+
+def test_fitting_twice_is_stable():
+    messages = [m for n in range(6) for m in turn(n, result_chars=1000)]
+    window = ContextWindow(token_budget=300, recent_turns=2, tool_result_chars=100)
+    fitted = window.fit(messages)
+    assert window.fit(fitted) == fitted
+    calls, results = tool_call_ids(fitted)
+    assert calls == results
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from intent_router import (
+    ADDRESS_CHANGE,
+    CARD_UNLOCK,
+    OTHER,
+    PIN_RESET,
+    IntentRouter,
+    NaiveBayesModel,
+    evaluate,
+    load_labeled,
+)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.mark.parametrize(
+    "text, intent",
+    [
+        ("I forgot my PIN", PIN_RESET),
+        ("My card is blocked, can you unblock it?", CARD_UNLOCK),
+        ("Please unlock my debit card", CARD_UNLOCK),
+        ("I've moved house and need to update my address", ADDRESS_CHANGE),
+    ],
+)
+def test_clear_requests_are_routed_by_the_rules(text, intent):
+    route = IntentRouter().classify(text)
+    assert route.intent == intent
+    assert route.source == "rules"
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "I want to change my PIN and my address",
+        "Forgot my PIN and I've also moved house",
+        "Please reset my pin, and the address on file is wrong too",
+        "unblock my card and update my address",
+    ],
+)
+def test_mixed_intent_messages_go_to_triage(text):
+    route = IntentRouter().classify(text)
+    assert route.intent is None
+    assert route.source == "triage"
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "my card was declined, can you tell me why",
+        "Why did my payment get declined?",
+        "What is my account balance?",
+        "Can you update my email address?",
+    ],
+)
+def test_weak_or_no_evidence_goes_to_triage(text):
+    assert IntentRouter().classify(text).intent is None
+
+
+def test_model_is_not_consulted_for_mixed_intents():
+    model = NaiveBayesModel.train([("change my pin", PIN_RESET)] * 5 + [("hello", OTHER)])
+    router = IntentRouter(model=model)
+    assert router.classify("I want to change my PIN and my address").intent is None
+
+
+def test_model_routes_when_the_rules_are_unsure():
+    model = NaiveBayesModel.train(
+        [("my passcode stopped working", PIN_RESET)] * 5 + [("what are your opening hours", OTHER)] * 5
+    )
+    route = IntentRouter(threshold=0.8, model=model).classify("my passcode stopped working")
+    assert route.intent == PIN_RESET
+    assert route.source == "model"
+
+
+def test_disabled_router_sends_everything_to_triage():
+    assert IntentRouter(enabled=False).classify("I forgot my PIN").source == "triage"
+
+
+@pytest.mark.parametrize("labeled", ["intent_labels.jsonl", "intent_holdout.jsonl"])
+def test_labeled_sets_are_routed_accurately(labeled):
+    report = evaluate(IntentRouter(), load_labeled(os.path.join(HERE, labeled)))
+    assert report["routing_accuracy"] >= 0.95
+    assert report["routed"] > 0
@@ -5,6 +5,11 @@ from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.prebuilt import create_react_agent
 from langgraph_swarm import create_handoff_tool, create_swarm
 import os
+import sys
+
+# The intent router is shared with the Chapter 6 bots.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Chapter6"))
+from intent_router import ADDRESS_CHANGE, CARD_UNLOCK, PIN_RESET, IntentRouter
 
 load_dotenv()
 
@@ -156,6 +161,18 @@ with open("swarm.png", "wb") as f:
 # Configuration for the conversation thread
 config = {"configurable": {"thread_id": "1"}}
 
+# A first message whose intent is clear makes its specialist the active agent, instead
+# of spending an LLM round trip on a handoff from the default agent. Once an agent has
+# the conversation it keeps it: a reply such as "my address is ..." while the card
+# agent is verifying the customer belongs to the card agent, and only a handoff by
+# the agents themselves moves the conversation on.
+intent_router = IntentRouter.from_env()
+intent_agents = {
+    CARD_UNLOCK: "card_unlock_agent",
+    PIN_RESET: "pin_reset_agent",
+    ADDRESS_CHANGE: "kyc_agent",
+}
+
 # Main interaction loop
 print("Welcome to the Banking Support Bot!")
 while True:
@@ -165,13 +182,20 @@ while True:
         print("Goodbye!")
         break
 
-    result = app.invoke(
-        {"messages": [{
-            "role": "user",
-            "content": user_input
-        }]},
-        config,
-    )
+    state = {"messages": [{
+        "role": "user",
+        "content": user_input
+    }]}
+    # The checkpointer has no active agent for the thread until the swarm has run once.
+    if not app.get_state(config).values.get("active_agent"):
+        route = intent_router.classify(user_input)
+    else:
+        route = None
+    if route is not None and route.intent is not None:
+        state["active_agent"] = intent_agents[route.intent]
+        print(f"Routed to {state['active_agent']} by {route.source} ({route.confidence:.2f})")
+
+    result = app.invoke(state, config)
 
     # Display the response
     for m in result["messages"]: